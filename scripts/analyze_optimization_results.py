@@ -16,10 +16,19 @@ from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pac
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 
+# Порог std, ниже которого параметр считается стабильным между инструментами/таймфреймами
+STABILITY_THRESHOLDS = {
+    "atr_multiplier": 0.5,
+    "min_adx": 3.0,
+    "risk_reward_ratio": 0.5,
+}
+
 
 def analyze_optimization_results(output_dir: Path = Path("research/configs/optimized")) -> None:
     """Анализирует результаты оптимизации и создает сводную таблицу."""
@@ -96,7 +105,14 @@ def analyze_optimization_results(output_dir: Path = Path("research/configs/optim
     
     # Сохраняем в CSV
     csv_path = output_dir / "optimization_summary.csv"
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    with csv_path.open("wb") as fp:
+        # BOM, чтобы Excel корректно распознавал UTF-8 (как encoding="utf-8-sig")
+        fp.write(b"\xef\xbb\xbf")
+        pac.write_csv(
+            pa.Table.from_pandas(df, preserve_index=False),
+            fp,
+            write_options=pac.WriteOptions(include_header=True),
+        )
     log.info("\nСводная таблица сохранена: %s", csv_path)
     
     # Анализ паттернов
@@ -135,28 +151,21 @@ def analyze_optimization_results(output_dir: Path = Path("research/configs/optim
     log.info("РЕКОМЕНДАЦИИ")
     log.info("=" * 80)
     
-    # Проверяем стабильность параметров
-    atr_std = df["atr_multiplier"].std()
-    adx_std = df["min_adx"].std()
-    rrr_std = df["risk_reward_ratio"].std()
-    
-    if atr_std < 0.5:
-        log.info("✓ atr_multiplier стабилен (std=%.2f), можно использовать универсальное значение: %.2f", 
-                atr_std, df["atr_multiplier"].mean())
-    else:
-        log.info("⚠ atr_multiplier варьируется (std=%.2f), требуется оптимизация для каждого инструмента/таймфрейма", atr_std)
-    
-    if adx_std < 3.0:
-        log.info("✓ min_adx стабилен (std=%.2f), можно использовать универсальное значение: %.2f", 
-                adx_std, df["min_adx"].mean())
-    else:
-        log.info("⚠ min_adx варьируется (std=%.2f), требуется оптимизация для каждого инструмента/таймфрейма", adx_std)
-    
-    if rrr_std < 0.5:
-        log.info("✓ risk_reward_ratio стабилен (std=%.2f), можно использовать универсальное значение: %.2f", 
-                rrr_std, df["risk_reward_ratio"].mean())
-    else:
-        log.info("⚠ risk_reward_ratio варьируется (std=%.2f), требуется оптимизация для каждого инструмента/таймфрейма", rrr_std)
+    # Проверяем стабильность параметров: параметр -> допустимое std
+    stability_table = pd.DataFrame({
+        "std": df[list(STABILITY_THRESHOLDS)].std(),
+        "mean": df[list(STABILITY_THRESHOLDS)].mean(),
+        "threshold": pd.Series(STABILITY_THRESHOLDS),
+    })
+    stability_table["stable"] = stability_table["std"] < stability_table["threshold"]
+    
+    for name, row in stability_table.iterrows():
+        if row["stable"]:
+            log.info("✓ %s стабилен (std=%.2f), можно использовать универсальное значение: %.2f",
+                    name, row["std"], row["mean"])
+        else:
+            log.info("⚠ %s варьируется (std=%.2f), требуется оптимизация для каждого инструмента/таймфрейма",
+                    name, row["std"])
     
     # Проверяем достижение целевых метрик
     log.info("\nДостижение целевых метрик:")
@@ -13,7 +13,7 @@ setup_utf8_encoding()
 
 from dotenv import load_dotenv
 
-from src.data_pipeline.ctrader_backfill import build_raw_path, fetch_range, iso_to_datetime
+from src.data_pipeline.ctrader_backfill import build_raw_path, fetch_range, iso_to_datetime, resume_start
 from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher
 from src.data_pipeline.curation import (
     append_parquet,
@@ -91,8 +91,14 @@ def main() -> None:
     try:
         for symbol in args.symbols:
             for period in args.periods:
-                log.info("Fetching %s %s [%s -> %s]", symbol, period, start.isoformat(), end.isoformat())
-                frame = fetch_range(fetcher, symbol, period, start, end, args.chunk_size)
+                curated_path = Path(args.curated_dir) / f"{symbol}_{period}.parquet"
+                period_start = resume_start(curated_path, period, start)
+                if period_start >= end:
+                    log.info("%s %s already covered up to %s, skipping", symbol, period, end.isoformat())
+                    continue
+
+                log.info("Fetching %s %s [%s -> %s]", symbol, period, period_start.isoformat(), end.isoformat())
+                frame = fetch_range(fetcher, symbol, period, period_start, end, args.chunk_size)
                 summary = validate_continuity(frame, strict=False)
                 log.info(
                     "Fetched %s rows for %s %s (max gap %.2f min)",
@@ -112,11 +118,10 @@ def main() -> None:
                     log.warning("No data received for %s %s", symbol, period)
                     continue
 
-                raw_path = build_raw_path(Path(args.raw_dir), symbol, period, start, end)
+                raw_path = build_raw_path(Path(args.raw_dir), symbol, period, period_start, end)
                 save_jsonl(frame.frame, raw_path)
                 log.info("Saved raw data to %s", raw_path)
 
-                curated_path = Path(args.curated_dir) / f"{symbol}_{period}.parquet"
                 append_parquet(frame, curated_path)
                 log.info("Updated curated dataset %s", curated_path)
     finally:
@@ -3,8 +3,17 @@ from __future__ import annotations
 import argparse
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Optional
+
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
 
 # Настройка UTF-8 кодировки для Windows консоли
 from src.utils.encoding import setup_utf8_encoding
@@ -12,9 +21,15 @@ setup_utf8_encoding()
 
 from dotenv import load_dotenv
 
-from src.data_pipeline.ctrader_backfill import build_raw_path, fetch_range, iso_to_datetime
-from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher
-from src.data_pipeline.curation import append_parquet, save_jsonl, validate_continuity
+from src.data_pipeline.ctrader_backfill import (
+    fetch_range,
+    init_worker_session,
+    iso_to_datetime,
+    persist_frame,
+    resume_start,
+    worker_fetcher,
+)
+from src.data_pipeline.ctrader_client import CTraderCredentials
 
 
 def parse_args() -> argparse.Namespace:
@@ -59,16 +74,59 @@ def parse_args() -> argparse.Namespace:
         choices=("live", "demo"),
         help="Окружение cTrader.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Количество параллельных процессов (у каждого своя сессия cTrader).",
+    )
     return parser.parse_args()
 
 
+def _do_one(
+    symbol: str,
+    period: str,
+    start: datetime,
+    end: datetime,
+    chunk_size: int,
+    raw_dir: str,
+    curated_dir: str,
+) -> Optional[int]:
+    """
+    Загружает и сохраняет одну пару (symbol, period) сессией текущего процесса.
+
+    Каждая пара пишет в собственный parquet, поэтому блокировки не нужны.
+    Возвращает количество строк или None, если данных нет.
+    """
+    curated_path = Path(curated_dir) / f"{symbol}_{period}.parquet"
+    start = resume_start(curated_path, period, start)
+    if start >= end:
+        logging.info("%s %s уже загружен до %s, пропускаем", symbol, period, end.isoformat())
+        return None
+
+    frame = fetch_range(worker_fetcher(), symbol, period, start, end, chunk_size)
+    summary = persist_frame(frame, start, end, Path(raw_dir), Path(curated_dir))
+    if not summary["rows"]:
+        return None
+    logging.info(
+        "Загружено %s строк для %s %s (макс. разрыв %.2f мин), обновлён curated: %s",
+        summary["rows"],
+        symbol,
+        period,
+        summary.get("max_gap_minutes", 0),
+        curated_path,
+    )
+    return summary["rows"]
+
+
 def main() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     args = parse_args()
     load_dotenv()
 
-    end = datetime.utcnow().replace(tzinfo=timezone.utc)
+    end = datetime.now(timezone.utc)
     start = end - timedelta(days=365 * args.years)
+    start_iso, end_iso = start.isoformat(), end.isoformat()
 
     creds = CTraderCredentials(
         client_id=os.environ["CTRADER_CLIENT_ID"],
@@ -78,49 +136,47 @@ def main() -> None:
         environment=args.environment,
     )
 
-    fetcher = CTraderTrendbarFetcher(creds)
-    try:
-        total_combinations = len(args.symbols) * len(args.periods)
-        current = 0
-        for symbol in args.symbols:
-            for period in args.periods:
-                current += 1
-                logging.info(
-                    "[%s/%s] Загрузка %s %s [%s -> %s]",
-                    current,
-                    total_combinations,
-                    symbol,
-                    period,
-                    start.isoformat(),
-                    end.isoformat(),
-                )
-                try:
-                    frame = fetch_range(fetcher, symbol, period, start, end, args.chunk_size)
-                    if frame.frame.empty:
-                        logging.warning("Нет данных для %s %s", symbol, period)
-                        continue
-
-                    summary = validate_continuity(frame, strict=False)  # Не падаем на выходных разрывах
-                    logging.info(
-                        "Загружено %s строк для %s %s (макс. разрыв %.2f мин)",
-                        summary["rows"],
-                        symbol,
-                        period,
-                        summary.get("max_gap_minutes", 0),
-                    )
-
-                    raw_path = build_raw_path(Path(args.raw_dir), symbol, period, start, end)
-                    save_jsonl(frame.frame, raw_path)
-                    logging.info("Сохранено raw: %s", raw_path)
-
-                    curated_path = Path(args.curated_dir) / f"{symbol}_{period}.parquet"
-                    append_parquet(frame, curated_path)
-                    logging.info("Обновлён curated: %s", curated_path)
-                except Exception as e:  # noqa: BLE001
-                    logging.error("Ошибка при загрузке %s %s: %s", symbol, period, e, exc_info=True)
-                    continue
-    finally:
-        fetcher.close()
+    pairs = [(symbol, period) for symbol in args.symbols for period in args.periods]
+    total_combinations = len(pairs)
+    workers = max(1, min(args.workers, total_combinations))
+    logging.info(
+        "Загрузка %s комбинаций [%s -> %s], процессов: %s",
+        total_combinations,
+        start_iso,
+        end_iso,
+        workers,
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker_session,
+        initargs=(asdict(creds),),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _do_one,
+                symbol,
+                period,
+                start,
+                end,
+                args.chunk_size,
+                args.raw_dir,
+                args.curated_dir,
+            ): (symbol, period)
+            for symbol, period in pairs
+        }
+
+        iterator = as_completed(futures)
+        if HAS_TQDM:
+            iterator = tqdm(iterator, total=total_combinations, desc="Загрузка")
+
+        for current, future in enumerate(iterator, start=1):
+            symbol, period = futures[future]
+            try:
+                future.result()
+                logging.info("[%s/%s] Готово %s %s", current, total_combinations, symbol, period)
+            except Exception as e:  # noqa: BLE001
+                logging.error("Ошибка при загрузке %s %s: %s", symbol, period, e, exc_info=True)
     logging.info("Загрузка завершена")
 
 
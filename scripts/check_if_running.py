@@ -1,4 +1,5 @@
 """Скрипт для проверки, действительно ли оптимизация работает или зависла."""
+import os
 import sys
 import time
 from pathlib import Path
@@ -64,15 +65,22 @@ def check_if_optimization_is_running():
     
     # Проверяем файлы результатов
     config_dir = Path("research/configs/optimized")
-    files = list(config_dir.glob("carry_momentum_*_all_results.json"))
+    files = []
+    if config_dir.is_dir():
+        # scandir отдаёт имя и stat за один проход, без отдельного stat() на каждый файл
+        with os.scandir(config_dir) as it:
+            for entry in it:
+                if entry.name.startswith("carry_momentum_") and entry.name.endswith("_all_results.json"):
+                    files.append((entry.name, entry.stat(follow_symlinks=False).st_mtime))
     
     if files:
         print("\nФайлы результатов:")
         sys.stdout.flush()
-        for f in files:
-            mtime = f.stat().st_mtime
-            age_minutes = (time.time() - mtime) / 60
-            print(f"  {f.name}: обновлен {age_minutes:.1f} минут назад")
+        now = time.time()
+        # Сначала самые свежие
+        for name, mtime in sorted(files, key=lambda item: item[1], reverse=True):
+            age_minutes = (now - mtime) / 60
+            print(f"  {name}: обновлен {age_minutes:.1f} минут назад")
             sys.stdout.flush()
     
     print("\n" + "=" * 80)
@@ -1,10 +1,14 @@
 """Скрипт для проверки статуса оптимизации Carry Momentum."""
 from __future__ import annotations
 
-import json
 import logging
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import product
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 # Добавляем корень проекта в sys.path для импорта модулей
 project_root = Path(__file__).parent.parent
@@ -15,10 +19,103 @@ if str(project_root) not in sys.path:
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
+from src.utils.json_io import loads
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 
 
+def _stat_or_none(path: Path) -> Optional[os.stat_result]:
+    """Один stat() вместо пары exists() + stat()."""
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
+
+
+def _read_or_none(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+# Для двухэтапной оптимизации: 432 (этап 1) + ~125 (этап 2) = ~557 комбинаций
+# Для полной оптимизации: 21,504 комбинаций
+# Определяем тип оптимизации по количеству результатов
+TOTAL_COMBINATIONS_FAST = 432  # Быстрая оптимизация (этап 1)
+TOTAL_COMBINATIONS_FULL = 21_504  # Полная оптимизация
+
+
+def _classify(config_dir: Path, instrument: str, period: str) -> Tuple[str, Dict, int]:
+    """
+    Определяет статус оптимизации одной пары инструмент/таймфрейм.
+
+    Возвращает (статус, запись для отчета, число протестированных комбинаций),
+    где статус — "completed", "in_progress" или "not_started". last_update в записи —
+    сырой st_mtime, форматирование выполняет вызывающий код.
+    """
+    best_params_path = config_dir / f"carry_momentum_{instrument}_{period}.json"
+    all_results_path = config_dir / f"carry_momentum_{instrument}_{period}_all_results.json"
+    
+    # Наличие и время последнего изменения файлов (по одному stat на файл)
+    best_params_stat = _stat_or_none(best_params_path)
+    all_results_stat = _stat_or_none(all_results_path)
+    best_exists = best_params_stat is not None
+    all_exists = all_results_stat is not None
+    best_params_time = best_params_stat.st_mtime if best_exists else 0
+    all_results_time = all_results_stat.st_mtime if all_exists else 0
+    last_update = max(best_params_time, all_results_time)
+    
+    if best_exists and all_exists:
+        # Завершено
+        try:
+            all_data = loads(_read_or_none(all_results_path))
+            tested_count = len(all_data.get("all_results", []))
+            total_combinations_in_file = all_data.get("total_combinations", tested_count)
+            
+            # Определяем тип оптимизации по количеству комбинаций
+            if total_combinations_in_file <= 600:
+                opt_type = "быстрая (двухэтапная)"
+                expected_total = TOTAL_COMBINATIONS_FAST
+            else:
+                opt_type = "полная"
+                expected_total = TOTAL_COMBINATIONS_FULL
+            
+            best_data = loads(_read_or_none(best_params_path))
+            
+            return "completed", {
+                "instrument": instrument,
+                "period": period,
+                "tested": tested_count,
+                "expected_total": expected_total,
+                "best_score": best_data.get("best_score", 0.0),
+                "progress_pct": (tested_count / expected_total * 100) if tested_count < expected_total else 100.0,
+                "opt_type": opt_type,
+                "last_update": last_update,
+            }, tested_count
+        except Exception as e:
+            log.warning("Ошибка при чтении результатов для %s %s: %s", instrument, period, e)
+            return "in_progress", {"instrument": instrument, "period": period}, 0
+    elif best_exists or all_exists:
+        # В процессе (есть частичные результаты)
+        try:
+            if all_exists:
+                all_data = loads(_read_or_none(all_results_path))
+                tested_count = len(all_data.get("all_results", []))
+                return "in_progress", {
+                    "instrument": instrument,
+                    "period": period,
+                    "tested": tested_count,
+                    "last_update": all_results_time,
+                }, tested_count
+            return "in_progress", {"instrument": instrument, "period": period}, 0
+        except Exception:
+            return "in_progress", {"instrument": instrument, "period": period}, 0
+    # Не начато
+    return "not_started", {"instrument": instrument, "period": period}, 0
+
+
 def check_optimization_status() -> None:
     """Проверяет статус оптимизации."""
     
@@ -26,90 +123,25 @@ def check_optimization_status() -> None:
     instruments = ["EURUSD", "GBPUSD", "USDJPY"]
     periods = ["m15", "h1", "h4"]
     
-    # Для двухэтапной оптимизации: 432 (этап 1) + ~125 (этап 2) = ~557 комбинаций
-    # Для полной оптимизации: 21,504 комбинаций
-    # Определяем тип оптимизации по количеству результатов
-    total_combinations_fast = 432  # Быстрая оптимизация (этап 1)
-    total_combinations_full = 21_504  # Полная оптимизация
-    
     log.info("=" * 80)
     log.info("СТАТУС ОПТИМИЗАЦИИ CARRY MOMENTUM")
     log.info("=" * 80)
     
-    completed = []
-    in_progress = []
-    not_started = []
-    total_tested = 0
+    # Пары независимы: stat, чтение и разбор JSON идут в потоках (I/O и orjson отпускают GIL)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda pair: _classify(config_dir, *pair), product(instruments, periods)))
     
-    for instrument in instruments:
-        for period in periods:
-            best_params_path = config_dir / f"carry_momentum_{instrument}_{period}.json"
-            all_results_path = config_dir / f"carry_momentum_{instrument}_{period}_all_results.json"
-            
-            # Проверяем время последнего изменения файлов
-            best_params_time = best_params_path.stat().st_mtime if best_params_path.exists() else 0
-            all_results_time = all_results_path.stat().st_mtime if all_results_path.exists() else 0
-            last_update = max(best_params_time, all_results_time)
-            
-            if best_params_path.exists() and all_results_path.exists():
-                # Завершено
-                try:
-                    with all_results_path.open("r", encoding="utf-8") as fp:
-                        all_data = json.load(fp)
-                    tested_count = len(all_data.get("all_results", []))
-                    total_combinations_in_file = all_data.get("total_combinations", tested_count)
-                    total_tested += tested_count
-                    
-                    # Определяем тип оптимизации по количеству комбинаций
-                    if total_combinations_in_file <= 600:
-                        opt_type = "быстрая (двухэтапная)"
-                        expected_total = total_combinations_fast
-                    else:
-                        opt_type = "полная"
-                        expected_total = total_combinations_full
-                    
-                    with best_params_path.open("r", encoding="utf-8") as fp:
-                        best_data = json.load(fp)
-                    
-                    from datetime import datetime
-                    update_time = datetime.fromtimestamp(last_update).strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    completed.append({
-                        "instrument": instrument,
-                        "period": period,
-                        "tested": tested_count,
-                        "expected_total": expected_total,
-                        "best_score": best_data.get("best_score", 0.0),
-                        "progress_pct": (tested_count / expected_total * 100) if tested_count < expected_total else 100.0,
-                        "opt_type": opt_type,
-                        "last_update": update_time,
-                    })
-                except Exception as e:
-                    log.warning("Ошибка при чтении результатов для %s %s: %s", instrument, period, e)
-                    in_progress.append({"instrument": instrument, "period": period})
-            elif best_params_path.exists() or all_results_path.exists():
-                # В процессе (есть частичные результаты)
-                try:
-                    if all_results_path.exists():
-                        with all_results_path.open("r", encoding="utf-8") as fp:
-                            all_data = json.load(fp)
-                        tested_count = len(all_data.get("all_results", []))
-                        total_tested += tested_count
-                        from datetime import datetime
-                        update_time = datetime.fromtimestamp(all_results_time).strftime("%Y-%m-%d %H:%M:%S")
-                        in_progress.append({
-                            "instrument": instrument,
-                            "period": period,
-                            "tested": tested_count,
-                            "last_update": update_time,
-                        })
-                    else:
-                        in_progress.append({"instrument": instrument, "period": period})
-                except Exception:
-                    in_progress.append({"instrument": instrument, "period": period})
-            else:
-                # Не начато
-                not_started.append({"instrument": instrument, "period": period})
+    buckets: Dict[str, List[Dict]] = {"completed": [], "in_progress": [], "not_started": []}
+    total_tested = 0
+    for status, item, tested_count in results:
+        # mtime форматируется один раз здесь, а не в каждой ветке классификации
+        if "last_update" in item:
+            item["last_update"] = datetime.fromtimestamp(item["last_update"]).strftime("%Y-%m-%d %H:%M:%S")
+        buckets[status].append(item)
+        total_tested += tested_count
+    completed = buckets["completed"]
+    in_progress = buckets["in_progress"]
+    not_started = buckets["not_started"]
     
     # Выводим статус
     log.info("\nЗавершено: %s из %s комбинаций инструмент/таймфрейм", len(completed), len(instruments) * len(periods))
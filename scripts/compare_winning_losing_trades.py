@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 from pathlib import Path
 from typing import Dict
@@ -14,7 +13,20 @@ from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
 from src.backtesting.full_backtest import FullBacktestRunner
-from src.signals import FeatureConfig, compute_features
+from src.signals import FeatureConfig
+from src.utils.json_io import write_json
+
+# Категориальные типы: сравнения и группировки идут по целочисленным кодам, а не по строкам
+# Порядок категорий тренда согласован с np.sign(ema_short - ema_long) + 1
+TREND_DIRECTION_DTYPE = pd.CategoricalDtype(["DOWN", "FLAT", "UP"])
+TRADE_DIRECTION_DTYPE = pd.CategoricalDtype(["LONG", "SHORT"])
+
+COMPARISON_FEATURE_CONFIG = FeatureConfig(
+    name="comparison",
+    window_short=20,
+    window_long=50,
+    additional_params={"atr_period": 14, "adx_period": 14, "rsi_period": 14},
+)
 
 
 def _load_market_data(instrument: str, period: str, curated_dir: Path) -> pd.DataFrame:
@@ -29,67 +41,154 @@ def _load_market_data(instrument: str, period: str, curated_dir: Path) -> pd.Dat
     return df
 
 
-def _calculate_entry_indicators(df: pd.DataFrame, entry_time: pd.Timestamp, lookback_bars: int = 50) -> Dict:
-    """Вычисляет индикаторы на момент входа в сделку."""
-    try:
-        # Находим индекс входа
-        entry_idx = df.index.get_indexer([entry_time], method="nearest")[0]
-        if entry_idx < lookback_bars:
-            return {}
-        
-        # Берем данные до входа
-        window_df = df.iloc[entry_idx - lookback_bars:entry_idx + 1]
-        
-        # Вычисляем индикаторы
-        features = compute_features(
-            window_df.tail(100),
-            FeatureConfig(
-                name="comparison",
-                window_short=20,
-                window_long=50,
-                additional_params={"atr_period": 14, "adx_period": 14, "rsi_period": 14},
-            ),
-        )
-        
-        atr = features.get("atr", default=0.0)
-        adx = features.get("adx", default=0.0)
-        rsi = features.get("rsi", default=50.0)
-        ema_short = features.get("ema_short", default=0.0)
-        ema_long = features.get("ema_long", default=0.0)
-        
-        # Вычисляем +DI и -DI (нужно для анализа направления тренда)
-        # Используем упрощенный расчет на основе EMA
-        price_change = window_df["close"].diff()
-        pos_di_signal = (price_change > 0).sum() / len(price_change) * 100 if len(price_change) > 0 else 50.0
-        neg_di_signal = (price_change < 0).sum() / len(price_change) * 100 if len(price_change) > 0 else 50.0
-        
-        # Волатильность
-        volatility_pct = (atr / window_df["close"].iloc[-1]) * 100 if window_df["close"].iloc[-1] > 0 else 0.0
-        
-        # Расстояние от EMA
-        current_price = window_df["close"].iloc[-1]
-        distance_from_ema_short = abs((current_price - ema_short) / current_price * 100) if ema_short > 0 else 0.0
-        distance_from_ema_long = abs((current_price - ema_long) / current_price * 100) if ema_long > 0 else 0.0
-        
-        # Направление тренда
-        trend_direction = "UP" if ema_short > ema_long else "DOWN" if ema_short < ema_long else "FLAT"
-        
-        return {
-            "atr": float(atr),
-            "adx": float(adx),
-            "rsi": float(rsi),
-            "ema_short": float(ema_short),
-            "ema_long": float(ema_long),
-            "volatility_pct": float(volatility_pct),
-            "pos_di_signal": float(pos_di_signal),
-            "neg_di_signal": float(neg_di_signal),
-            "distance_from_ema_short": float(distance_from_ema_short),
-            "distance_from_ema_long": float(distance_from_ema_long),
+def _build_indicator_frame(market_df: pd.DataFrame, cfg: FeatureConfig) -> pd.DataFrame:
+    """
+    Вычисляет индикаторы один раз на всей истории (по тем же формулам, что compute_features).
+
+    Все рекуррентные индикаторы (EMA, RSI, ATR, ADX) считаются одним проходом O(N)
+    по серии. НЕ вызывать внутри цикла по сделкам: сделки присоединяются к результату
+    по времени (_join_entry_indicators).
+
+    Возвращает DataFrame, выровненный по market_df.index: значение в строке i соответствует
+    индикаторам на момент бара i. Производные признаки (волатильность, расстояния до EMA,
+    направление тренда) тоже считаются по всей серии векторными операциями NumPy.
+    """
+    lookback_bars = cfg.window_long
+    atr_period = int(cfg.additional_params.get("atr_period", 14))
+    rsi_period = int(cfg.additional_params.get("rsi_period", 14))
+    adx_period = int(cfg.additional_params.get("adx_period", 14))
+
+    close = market_df["close"]
+    high = market_df["high"]
+    low = market_df["low"]
+
+    ema_short = close.ewm(span=cfg.window_short, adjust=False).mean()
+    ema_long = close.ewm(span=cfg.window_long, adjust=False).mean()
+
+    diff = close.diff()
+    avg_gain = diff.clip(lower=0).rolling(window=rsi_period, min_periods=rsi_period).mean()
+    avg_loss = (-diff.clip(upper=0)).rolling(window=rsi_period, min_periods=rsi_period).mean()
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss.replace(0, np.nan)))
+
+    prev_close = close.shift()
+    tr = pd.Series(
+        np.fmax.reduce([high - low, (high - prev_close).abs(), (low - prev_close).abs()]),
+        index=market_df.index,
+    )
+    atr = tr.rolling(window=atr_period, min_periods=atr_period).mean()
+
+    up_move = high.diff()
+    down_move = -low.diff()
+    pos_dm = pd.Series(np.where((up_move > down_move) & (up_move > 0), up_move, 0.0), index=market_df.index)
+    neg_dm = pd.Series(np.where((down_move > up_move) & (down_move > 0), down_move, 0.0), index=market_df.index)
+    atr_smoothed = tr.rolling(window=adx_period, min_periods=adx_period).mean()
+    atr_valid = atr_smoothed.where(atr_smoothed > 0)
+    pos_di = 100 * pos_dm.rolling(adx_period).mean() / atr_valid
+    neg_di = 100 * neg_dm.rolling(adx_period).mean() / atr_valid
+    di_sum = pos_di + neg_di
+    dx = ((pos_di - neg_di).abs() / di_sum.where(di_sum > 0) * 100).replace([np.inf, -np.inf], np.nan)
+    adx = dx.rolling(window=adx_period, min_periods=adx_period).mean().fillna(0.0)
+
+    # Упрощенные +DI/-DI: доля растущих/падающих баров за lookback_bars
+    pos_di_signal = diff.gt(0).rolling(lookback_bars).sum() / lookback_bars * 100
+    neg_di_signal = diff.lt(0).rolling(lookback_bars).sum() / lookback_bars * 100
+
+    close_v = close.to_numpy(dtype=float)
+    atr_v = atr.to_numpy(dtype=float)
+    ema_short_v = ema_short.to_numpy(dtype=float)
+    ema_long_v = ema_long.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volatility_pct = np.where(close_v > 0, atr_v / close_v * 100, 0.0)
+        distance_from_ema_short = np.where(ema_short_v > 0, np.abs(close_v - ema_short_v) / close_v * 100, 0.0)
+        distance_from_ema_long = np.where(ema_long_v > 0, np.abs(close_v - ema_long_v) / close_v * 100, 0.0)
+    # Без ветвлений: знак разности EMA сразу дает код категории (-1/0/1 -> DOWN/FLAT/UP)
+    trend_sign = np.sign(np.nan_to_num(ema_short_v - ema_long_v)).astype(np.int8)
+    trend_direction = pd.Categorical.from_codes(trend_sign + 1, dtype=TREND_DIRECTION_DTYPE)
+
+    return pd.DataFrame(
+        {
+            "atr": atr,
+            "adx": adx,
+            "rsi": rsi,
+            "ema_short": ema_short,
+            "ema_long": ema_long,
+            "pos_di_signal": pos_di_signal,
+            "neg_di_signal": neg_di_signal,
+            "volatility_pct": volatility_pct,
+            "distance_from_ema_short": distance_from_ema_short,
+            "distance_from_ema_long": distance_from_ema_long,
             "trend_direction": trend_direction,
-        }
-    except Exception as e:
-        logging.debug("Ошибка при вычислении индикаторов: %s", e)
-        return {}
+        },
+        index=market_df.index,
+    )
+
+
+def _join_entry_indicators(
+    trades_df: pd.DataFrame,
+    indicator_df: pd.DataFrame,
+    lookback_bars: int = 50,
+) -> pd.DataFrame:
+    """
+    Присоединяет к сделкам индикаторы ближайшего бара одним merge_asof.
+
+    Джойн выполняется только для уникальных времен входа: сделки на одном баре
+    получают строку по целочисленному коду (gather без повторных вычислений).
+    Сделки без полной истории (меньше lookback_bars баров до входа) получают NaN.
+    """
+    bars = indicator_df.copy()
+    bars.iloc[:lookback_bars] = np.nan
+    bars = bars.rename_axis("bar_time").reset_index()
+
+    entry_times = trades_df["entry_time"].astype(bars["bar_time"].dtype)
+    codes, unique_times = pd.factorize(entry_times, sort=True)
+    at_entry = pd.merge_asof(
+        pd.DataFrame({"entry_time": unique_times}),
+        bars,
+        left_on="entry_time",
+        right_on="bar_time",
+        direction="nearest",
+    ).drop(columns=["entry_time", "bar_time"])
+
+    enriched = trades_df.assign(entry_time=entry_times).reset_index(drop=True)
+    return pd.concat([enriched, at_entry.iloc[codes].reset_index(drop=True)], axis=1)
+
+
+def _welch_ttest(win_stats: pd.DataFrame, lose_stats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Двухвыборочный t-test Уэлча по уже агрегированным mean/std/count.
+
+    Строки — индикаторы; все индикаторы считаются одним набором операций NumPy
+    вместо отдельного вызова stats.ttest_ind на каждый. Возвращает колонки t_statistic, p_value.
+    """
+    n_w = win_stats["count"].to_numpy(dtype=float)
+    n_l = lose_stats["count"].to_numpy(dtype=float)
+    se2_w = win_stats["std"].to_numpy(dtype=float) ** 2 / n_w
+    se2_l = lose_stats["std"].to_numpy(dtype=float) ** 2 / n_l
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se2 = se2_w + se2_l
+        t_stat = (win_stats["mean"].to_numpy(dtype=float) - lose_stats["mean"].to_numpy(dtype=float)) / np.sqrt(se2)
+        dof = se2**2 / (se2_w**2 / (n_w - 1) + se2_l**2 / (n_l - 1))
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    return pd.DataFrame({"t_statistic": t_stat, "p_value": p_value}, index=win_stats.index)
+
+
+def _win_rate_by(trades_df: pd.DataFrame, column: str, values: list) -> Dict:
+    """Считает число прибыльных/убыточных сделок и win rate по значениям колонки одним crosstab."""
+    counts = pd.crosstab(trades_df[column], trades_df["is_winning"]).reindex(columns=[True, False], fill_value=0)
+    result = {}
+    for value in values:
+        if value not in counts.index:
+            continue
+        winning_count = int(counts.at[value, True])
+        losing_count = int(counts.at[value, False])
+        total = winning_count + losing_count
+        if total > 0:
+            result[value] = {
+                "winning_count": winning_count,
+                "losing_count": losing_count,
+                "win_rate": float(winning_count / total * 100),
+            }
+    return result
 
 
 def compare_winning_losing_trades(
@@ -132,31 +231,28 @@ def compare_winning_losing_trades(
         logging.warning("Нет сделок для анализа")
         return {"error": "No trades"}
 
-    # Собираем данные о сделках с индикаторами
-    trades_data = []
-    for t in result.trades:
-        trade_dict = {
-            "entry_time": t.entry_time,
-            "direction": t.direction,
-            "entry_price": t.entry_price,
-            "pnl": t.net_pnl,
-            "pnl_pct": t.pnl_pct,
-            "is_winning": t.net_pnl > 0,
-        }
-        
-        # Добавляем индикаторы на момент входа
-        indicators = _calculate_entry_indicators(market_df, t.entry_time)
-        trade_dict.update(indicators)
-        
-        trades_data.append(trade_dict)
-    
-    trades_df = pd.DataFrame(trades_data)
+    # Собираем данные о сделках одним from_records по кортежам (без промежуточных dict)
+    trades_df = pd.DataFrame.from_records(
+        (
+            (t.entry_time, t.direction, t.entry_price, t.net_pnl, t.pnl_pct, t.net_pnl > 0)
+            for t in result.trades
+        ),
+        columns=["entry_time", "direction", "entry_price", "pnl", "pnl_pct", "is_winning"],
+    )
+    trades_df["entry_time"] = pd.to_datetime(trades_df["entry_time"], utc=True, cache=True)
+    trades_df["direction"] = trades_df["direction"].astype(TRADE_DIRECTION_DTYPE)
+    trades_df["is_winning"] = trades_df["is_winning"].astype(bool)
 
-    # Разделяем на прибыльные и убыточные
-    winning_trades = trades_df[trades_df["is_winning"] == True]
-    losing_trades = trades_df[trades_df["is_winning"] == False]
+    # Индикаторы считаются один раз на всей истории, сделки только выбирают свой бар
+    indicator_df = _build_indicator_frame(market_df, COMPARISON_FEATURE_CONFIG)
+    trades_df = _join_entry_indicators(trades_df, indicator_df, lookback_bars=COMPARISON_FEATURE_CONFIG.window_long)
 
-    if len(winning_trades) == 0 or len(losing_trades) == 0:
+    # Разделяем на прибыльные и убыточные одной маской
+    win_mask = trades_df["is_winning"].to_numpy(dtype=bool)
+    n_winning = int(win_mask.sum())
+    n_losing = int(len(trades_df) - n_winning)
+
+    if n_winning == 0 or n_losing == 0:
         logging.warning("Недостаточно данных для сравнения (нет прибыльных или убыточных сделок)")
         return {"error": "Insufficient data"}
 
@@ -166,96 +262,57 @@ def compare_winning_losing_trades(
         "pos_di_signal", "neg_di_signal",
         "distance_from_ema_short", "distance_from_ema_long",
     ]
+    indicators_to_compare = [c for c in indicators_to_compare if c in trades_df.columns]
 
     comparison = {
         "strategy": strategy_id,
         "instrument": instrument,
         "period": period,
         "total_trades": len(trades_df),
-        "winning_trades": int(len(winning_trades)),
-        "losing_trades": int(len(losing_trades)),
-        "win_rate": float(len(winning_trades) / len(trades_df)) if len(trades_df) > 0 else 0.0,
+        "winning_trades": n_winning,
+        "losing_trades": n_losing,
+        "win_rate": float(n_winning / len(trades_df)) if len(trades_df) > 0 else 0.0,
         "indicator_comparison": {},
         "statistical_tests": {},
         "recommendations": [],
     }
 
-    # Сравнение по каждому индикатору
+    # Описательная статистика по обеим группам за один проход groupby (NaN пропускаются)
+    stats_by_win = trades_df.groupby("is_winning")[indicators_to_compare].agg(
+        ["mean", "median", "std", "min", "max", "count"]
+    )
+    welch = _welch_ttest(stats_by_win.loc[True].unstack(), stats_by_win.loc[False].unstack())
+
     for indicator in indicators_to_compare:
-        if indicator not in winning_trades.columns or indicator not in losing_trades.columns:
+        win_stats = stats_by_win.loc[True, indicator]
+        lose_stats = stats_by_win.loc[False, indicator]
+        if win_stats["count"] == 0 or lose_stats["count"] == 0:
             continue
-        
-        # Удаляем NaN значения
-        winning_values = winning_trades[indicator].dropna()
-        losing_values = losing_trades[indicator].dropna()
-        
-        if len(winning_values) == 0 or len(losing_values) == 0:
-            continue
-        
-        # Описательная статистика
+
         comparison["indicator_comparison"][indicator] = {
-            "winning": {
-                "mean": float(winning_values.mean()),
-                "median": float(winning_values.median()),
-                "std": float(winning_values.std()),
-                "min": float(winning_values.min()),
-                "max": float(winning_values.max()),
-            },
-            "losing": {
-                "mean": float(losing_values.mean()),
-                "median": float(losing_values.median()),
-                "std": float(losing_values.std()),
-                "min": float(losing_values.min()),
-                "max": float(losing_values.max()),
-            },
+            "winning": {k: float(win_stats[k]) for k in ("mean", "median", "std", "min", "max")},
+            "losing": {k: float(lose_stats[k]) for k in ("mean", "median", "std", "min", "max")},
             "difference": {
-                "mean_diff": float(winning_values.mean() - losing_values.mean()),
-                "mean_diff_pct": float((winning_values.mean() - losing_values.mean()) / losing_values.mean() * 100) if losing_values.mean() != 0 else 0.0,
+                "mean_diff": float(win_stats["mean"] - lose_stats["mean"]),
+                "mean_diff_pct": float((win_stats["mean"] - lose_stats["mean"]) / lose_stats["mean"] * 100) if lose_stats["mean"] != 0 else 0.0,
             },
         }
-        
-        # Статистический тест (t-test)
-        try:
-            t_stat, p_value = stats.ttest_ind(winning_values, losing_values)
-            comparison["statistical_tests"][indicator] = {
-                "t_statistic": float(t_stat),
-                "p_value": float(p_value),
-                "significant": p_value < 0.05,
-            }
-        except Exception as e:
-            logging.debug("Ошибка при статистическом тесте для %s: %s", indicator, e)
+
+        # Статистический тест (t-test Уэлча, посчитан векторно для всех индикаторов)
+        t_stat, p_value = welch.loc[indicator]
+        comparison["statistical_tests"][indicator] = {
+            "t_statistic": float(t_stat),
+            "p_value": float(p_value),
+            "significant": bool(p_value < 0.05),
+        }
 
     # Анализ направления тренда
     if "trend_direction" in trades_df.columns:
-        trend_comparison = {}
-        for direction in ["UP", "DOWN", "FLAT"]:
-            winning_with_trend = winning_trades[winning_trades["trend_direction"] == direction]
-            losing_with_trend = losing_trades[losing_trades["trend_direction"] == direction]
-            
-            if len(winning_with_trend) > 0 or len(losing_with_trend) > 0:
-                trend_comparison[direction] = {
-                    "winning_count": int(len(winning_with_trend)),
-                    "losing_count": int(len(losing_with_trend)),
-                    "win_rate": float(len(winning_with_trend) / (len(winning_with_trend) + len(losing_with_trend)) * 100) if (len(winning_with_trend) + len(losing_with_trend)) > 0 else 0.0,
-                }
-        
-        comparison["trend_direction_comparison"] = trend_comparison
+        comparison["trend_direction_comparison"] = _win_rate_by(trades_df, "trend_direction", ["UP", "DOWN", "FLAT"])
 
     # Анализ по направлению сделки
     if "direction" in trades_df.columns:
-        direction_comparison = {}
-        for trade_dir in ["LONG", "SHORT"]:
-            winning_dir = winning_trades[winning_trades["direction"] == trade_dir]
-            losing_dir = losing_trades[losing_trades["direction"] == trade_dir]
-            
-            if len(winning_dir) > 0 or len(losing_dir) > 0:
-                direction_comparison[trade_dir] = {
-                    "winning_count": int(len(winning_dir)),
-                    "losing_count": int(len(losing_dir)),
-                    "win_rate": float(len(winning_dir) / (len(winning_dir) + len(losing_dir)) * 100) if (len(winning_dir) + len(losing_dir)) > 0 else 0.0,
-                }
-        
-        comparison["trade_direction_comparison"] = direction_comparison
+        comparison["trade_direction_comparison"] = _win_rate_by(trades_df, "direction", ["LONG", "SHORT"])
 
     # Генерируем рекомендации на основе сравнения
     recommendations = []
@@ -301,8 +358,7 @@ def compare_winning_losing_trades(
     # Сохраняем сравнение
     output_path.mkdir(parents=True, exist_ok=True)
     report_file = output_path / f"{strategy_id}_{instrument}_{period}_comparison.json"
-    with report_file.open("w", encoding="utf-8") as fp:
-        json.dump(comparison, fp, ensure_ascii=False, indent=2, default=str)
+    write_json(report_file, comparison)
 
     logging.info("Сравнение сохранено в %s", report_file)
     return comparison
@@ -1,41 +1,82 @@
 """Конвертация raw JSONL данных в parquet формат."""
 from __future__ import annotations
 
-import json
+import gc
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List
 
 # Настройка UTF-8 кодировки для Windows консоли
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
-from src.data_pipeline.curation import TrendbarFrame, append_parquet, to_dataframe
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.json as paj
+import pyarrow.parquet as pq
+
+from src.data_pipeline.curation import PARQUET_WRITE_OPTIONS, TrendbarFrame, append_parquet, to_dataframe_from_arrow
+
+# Фиксированная схема raw-баров: парсер сразу пишет в типизированные буферы без вывода типов.
+# symbol/period в raw игнорируются — их проставляет to_dataframe_from_arrow.
+_TRENDBAR_SCHEMA = pa.schema(
+    [
+        ("utc_time", pa.timestamp("ms", tz="UTC")),
+        ("open", pa.float64()),
+        ("high", pa.float64()),
+        ("low", pa.float64()),
+        ("close", pa.float64()),
+        ("volume", pa.int64()),
+    ]
+)
+# Крупные блоки чтения: JSONL-файлы cTrader занимают мегабайты
+_JSON_FORMAT = ds.JsonFileFormat(
+    read_options=paj.ReadOptions(block_size=8 << 20),
+    parse_options=paj.ParseOptions(explicit_schema=_TRENDBAR_SCHEMA, unexpected_field_behavior="ignore"),
+)
+
+
+def _ingest(jsonl_files: List[Path]) -> pa.Table:
+    """Читает все JSONL-файлы символа одной Arrow-таблицей; промежуточные объекты живут только здесь."""
+    # Все файлы символа читаются как один датасет: файлы разбираются параллельно в потоках Arrow
+    dataset = ds.dataset([str(f) for f in jsonl_files], schema=_TRENDBAR_SCHEMA, format=_JSON_FORMAT)
+    return dataset.to_table(use_threads=True)
 
 
 def convert_raw_to_parquet(symbol: str, period: str = "m15") -> None:
     """Конвертирует raw JSONL данные в parquet."""
     raw_path = Path(f"data/v1/raw/ctrader/{symbol}/{period}")
-    jsonl_files = list(raw_path.glob("*.jsonl"))
+    jsonl_files = sorted(raw_path.glob("*.jsonl"))
     
     if not jsonl_files:
         print(f"Нет raw данных для {symbol} {period}")
         return
     
     print(f"Обработка {symbol} {period}...")
-    all_bars = []
-    for jsonl_file in jsonl_files:
-        with jsonl_file.open("r", encoding="utf-8") as fp:
-            for line in fp:
-                all_bars.append(json.loads(line))
-    
-    frame = to_dataframe(symbol, period, all_bars)
+    table = _ingest(jsonl_files)
+    frame = to_dataframe_from_arrow(symbol, period, table, consume=True)
+    # Буферы Arrow уже отданы pandas; освобождаем их до записи, чтобы пик памяти не суммировался
+    del table
+    gc.collect()
     curated_path = Path(f"data/v1/curated/ctrader/{symbol}_{period}.parquet")
     curated_path.parent.mkdir(parents=True, exist_ok=True)
-    append_parquet(frame, curated_path)
+    if curated_path.exists():
+        # Дозапись требует слияния и дедупликации с уже сохраненными барами
+        append_parquet(frame, curated_path)
+    else:
+        # Новый файл пишется напрямую из Arrow, без чтения и перезаписи через pandas
+        pq.write_table(
+            pa.Table.from_pandas(frame.frame, preserve_index=False),
+            curated_path,
+            **PARQUET_WRITE_OPTIONS,
+        )
     print(f"Сохранено {symbol} в {curated_path} ({len(frame.frame)} строк)")
 
 
 if __name__ == "__main__":
-    for symbol in ["EURUSD", "USDJPY", "GBPUSD"]:
-        convert_raw_to_parquet(symbol, "m15")
+    symbols = ["EURUSD", "USDJPY", "GBPUSD"]
+    # Символы независимы (свой каталог raw и свой parquet), блокировки не нужны
+    with ProcessPoolExecutor(max_workers=len(symbols)) as executor:
+        list(executor.map(convert_raw_to_parquet, symbols, ["m15"] * len(symbols)))
 
@@ -1,11 +1,21 @@
 """Расширенный анализ результатов оптимизации с детальной статистикой."""
 from __future__ import annotations
 
+import argparse
 import json
 import logging
 import sys
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 
 # Добавляем корень проекта в sys.path для импорта модулей
 project_root = Path(__file__).parent.parent
@@ -16,9 +26,6 @@ if str(project_root) not in sys.path:
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
-from src.backtesting.full_backtest import FullBacktestRunner
-from src.strategies import CarryMomentumStrategy
-
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(message)s",
@@ -26,108 +33,319 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
+# Ключи best_result.json, нужные для анализа (остальное — массивы результатов испытаний)
+BEST_RESULT_KEYS = ("best_params", "instrument")
+# Небольшие файлы быстрее разобрать целиком, чем поднимать потоковый парсер
+STREAMING_MIN_SIZE = 64 * 1024
+
+# Критерии приемлемости результата: (подпись, ключ stats, порог, строгое сравнение, множитель вывода, формат)
+QUALITY_CRITERIA = (
+    ("Recovery Factor >= 1.5", "recovery_factor", 1.5, False, 1.0, "%.4f"),
+    ("Profit Factor > 1.0", "profit_factor", 1.0, True, 1.0, "%.4f"),
+    ("Win Rate >= 40%", "win_rate", 0.4, False, 100.0, "%.2f%%"),  # Минимум 40% выигрышей
+    ("Sharpe Ratio > 1.0", "sharpe_ratio", 1.0, True, 1.0, "%.4f"),
+    ("Достаточно сделок (>=30)", "total_trades", 30.0, False, 1.0, "%.0f"),  # Статистическая значимость
+)
+_QUALITY_THRESHOLDS = np.array([criterion[2] for criterion in QUALITY_CRITERIA])
+_QUALITY_STRICT = np.array([criterion[3] for criterion in QUALITY_CRITERIA])
+
+@dataclass(slots=True, frozen=True)
+class TrialStats:
+    """Детальная статистика одного запуска стратегии."""
+
+    strategy_id: str
+    instrument: str
+    period: str
+    start_date: str
+    end_date: str
+    total_trades: int
+    winning_trades: int
+    losing_trades: int
+    win_rate: float
+    total_pnl: float
+    total_commission: float
+    total_swap: float
+    net_pnl: float
+    sharpe_ratio: float
+    max_drawdown: float
+    recovery_factor: float
+    profit_factor: float
+    average_win: float
+    average_loss: float
+    average_win_loss_ratio: float
+
+
+# Журнал сделок последнего детального бэктеста: повторный анализ с теми же
+# параметрами пересчитывает статистику по нему, не запуская симуляцию заново
+TRADE_LOG_FILE = Path("research/configs/optimized/best_result_trades.parquet")
+_TRADE_LOG_META_KEY = b"detailed_analysis"
+
+
 def load_best_result(file_path: Path) -> Dict:
-    """Загружает лучший результат из файла."""
-    with file_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Загружает лучший результат из файла.
+
+    Большие файлы читаются потоково через ijson (если установлен): из верхнего
+    уровня берутся только BEST_RESULT_KEYS, чтение прекращается, как только они найдены.
+    """
+    if not HAS_IJSON or file_path.stat().st_size < STREAMING_MIN_SIZE:
+        with file_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    result: Dict = {}
+    with file_path.open("rb") as f:
+        for key, value in ijson.kvitems(f, "", use_float=True):
+            if key in BEST_RESULT_KEYS:
+                result[key] = value
+                if len(result) == len(BEST_RESULT_KEYS):
+                    break
+    return result
+
+
+def trade_log_context(runner, instrument: str, period: str) -> Dict:
+    """
+    Условия бэктеста, при которых журнал сделок остается актуальным: версия данных и издержки runner
+    (как в cache_context оптимизации). После обновления данных или изменения комиссий журнал не используется.
+    """
+    return {
+        "data": runner.data_fingerprint(instrument, period),
+        "initial_capital": runner.initial_capital,
+        "commission_bps": runner.commission_bps,
+        "slippage_bps": runner.slippage_bps,
+    }
+
+
+def save_trade_log(result, params: Dict, context: Dict, path: Path = TRADE_LOG_FILE) -> None:
+    """Сохраняет журнал сделок бэктеста; параметры и условия запуска пишутся в метаданные схемы."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    trades = result.trades
+    table = pa.table(
+        {
+            "entry_time": pa.array([trade.entry_time for trade in trades], type=pa.timestamp("us", tz="UTC")),
+            "exit_time": pa.array([trade.exit_time for trade in trades], type=pa.timestamp("us", tz="UTC")),
+            "direction": pa.array([trade.direction for trade in trades], type=pa.string()),
+            "pnl": pa.array([trade.pnl for trade in trades], type=pa.float64()),
+            "commission": pa.array([trade.commission for trade in trades], type=pa.float64()),
+            "swap": pa.array([trade.swap for trade in trades], type=pa.float64()),
+            "net_pnl": pa.array([trade.net_pnl for trade in trades], type=pa.float64()),
+            "exit_reason": pa.array([trade.exit_reason for trade in trades], type=pa.string()),
+        }
+    )
+    meta = {
+        "params": params,
+        "strategy_id": result.strategy_id,
+        "instrument": result.instrument,
+        "period": result.period,
+        "start_date": result.start_date.isoformat(),
+        "end_date": result.end_date.isoformat(),
+        "initial_capital": context["initial_capital"],
+        "context": context,
+    }
+    table = table.replace_schema_metadata({_TRADE_LOG_META_KEY: json.dumps(meta, ensure_ascii=False).encode("utf-8")})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, path, compression="zstd")
+
+
+def load_cached_stats(
+    params: Dict, instrument: str, period: str, context: Dict, path: Path = TRADE_LOG_FILE
+) -> Optional[TrialStats]:
+    """
+    Пересчитывает статистику по сохраненному журналу сделок.
+
+    Возвращает None, если журнала нет или он записан для других параметров, инструмента,
+    таймфрейма, версии данных или издержек (context из trade_log_context).
+    """
+    if not path.exists():
+        return None
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=["pnl", "commission", "swap", "net_pnl"])
+    raw_meta = (table.schema.metadata or {}).get(_TRADE_LOG_META_KEY)
+    if raw_meta is None:
+        return None
+    meta = json.loads(raw_meta)
+    if (
+        meta["params"] != params
+        or meta["instrument"] != instrument
+        or meta["period"] != period
+        or meta.get("context") != context
+    ):
+        return None
+
+    columns = {name: table.column(name).to_numpy() for name in table.column_names}
+    return _stats_from_trades(meta, columns)
+
+
+def _stats_from_trades(meta: Dict, columns: Dict[str, np.ndarray]) -> TrialStats:
+    """Векторный пересчет метрик FullBacktestRunner._build_result по массивам сделок."""
+    net_pnl = columns["net_pnl"]
+    wins = net_pnl[net_pnl > 0]
+    losses = net_pnl[net_pnl < 0]
+    total_trades = int(net_pnl.size)
+    initial_capital = float(meta["initial_capital"])
+
+    sharpe_ratio = max_drawdown = recovery_factor = profit_factor = 0.0
+    if total_trades:
+        from src.backtesting.metrics import equity_curve, max_drawdown as curve_max_drawdown, sharpe_ratio as curve_sharpe
+
+        # Equity не уходит в минус, как и в FullBacktestRunner.run
+        equity = equity_curve(net_pnl, initial_capital)
+        sharpe_ratio = curve_sharpe(equity)
+        max_drawdown = curve_max_drawdown(equity)
+        recovery_factor = float(net_pnl.sum()) / abs(max_drawdown * initial_capital) if max_drawdown != 0 else float("inf")
+
+        gross_profit = float(wins.sum())
+        gross_loss = abs(float(losses.sum()))
+        profit_factor = gross_profit / gross_loss if gross_loss > 0 else float("inf") if gross_profit > 0 else 0.0
 
+    average_win = float(wins.mean()) if wins.size else 0.0
+    average_loss = float(losses.mean()) if losses.size else 0.0
+    return TrialStats(
+        strategy_id=meta["strategy_id"],
+        instrument=meta["instrument"],
+        period=meta["period"],
+        start_date=meta["start_date"],
+        end_date=meta["end_date"],
+        total_trades=total_trades,
+        winning_trades=int(wins.size),
+        losing_trades=int(losses.size),
+        win_rate=wins.size / total_trades if total_trades else 0.0,
+        total_pnl=float(columns["pnl"].sum()),
+        total_commission=float(columns["commission"].sum()),
+        total_swap=float(columns["swap"].sum()),
+        net_pnl=float(net_pnl.sum()),
+        sharpe_ratio=sharpe_ratio,
+        max_drawdown=max_drawdown,
+        recovery_factor=recovery_factor,
+        profit_factor=profit_factor,
+        average_win=average_win,
+        average_loss=average_loss,
+        average_win_loss_ratio=abs(average_win / average_loss) if average_loss != 0 else float("inf"),
+    )
+
+
+def run_detailed_backtest(params: Dict, instrument: str, period: str, force_rerun: bool = False) -> TrialStats:
+    """
+    Возвращает полную статистику лучшего результата.
+
+    Если журнал сделок уже сохранен для тех же параметров, данных и издержек, статистика
+    пересчитывается по нему; полный бэктест запускается только при его отсутствии или с force_rerun.
+    """
+    # Тяжелые импорты (pandas, стратегии) откладываются до момента, когда бэктест
+    # действительно нужен: при отсутствии best_result.json скрипт завершается сразу
+    from src.backtesting.full_backtest import FullBacktestRunner
 
-def run_detailed_backtest(params: Dict, instrument: str, period: str) -> Dict:
-    """Запускает детальный бэктест и возвращает полную статистику."""
     runner = FullBacktestRunner()
+    context = trade_log_context(runner, instrument, period)
+    if not force_rerun:
+        stats = load_cached_stats(params, instrument, period, context)
+        if stats is not None:
+            log.info("Статистика пересчитана по сохраненному журналу сделок: %s", TRADE_LOG_FILE)
+            return stats
+
+    from src.strategies import CarryMomentumStrategy
     
     # Создаем стратегию с лучшими параметрами
     strategy = CarryMomentumStrategy(**params)
     
     # Запускаем бэктест
     result = runner.run(strategy, instrument, period)
+    save_trade_log(result, params, context)
     
     # Формируем детальную статистику
-    stats = {
-        "strategy_id": result.strategy_id,
-        "instrument": result.instrument,
-        "period": result.period,
-        "start_date": result.start_date.isoformat(),
-        "end_date": result.end_date.isoformat(),
-        "total_trades": result.total_trades,
-        "winning_trades": result.winning_trades,
-        "losing_trades": result.losing_trades,
-        "win_rate": result.win_rate,
-        "total_pnl": result.total_pnl,
-        "total_commission": result.total_commission,
-        "total_swap": result.total_swap,
-        "net_pnl": result.net_pnl,
-        "sharpe_ratio": result.sharpe_ratio,
-        "max_drawdown": result.max_drawdown,
-        "recovery_factor": result.recovery_factor,
-        "profit_factor": result.profit_factor,
-        "average_win": result.average_win,
-        "average_loss": result.average_loss,
-        "average_win_loss_ratio": abs(result.average_win / result.average_loss) if result.average_loss != 0 else float("inf"),
-    }
+    stats = TrialStats(
+        strategy_id=result.strategy_id,
+        instrument=result.instrument,
+        period=result.period,
+        start_date=result.start_date.isoformat(),
+        end_date=result.end_date.isoformat(),
+        total_trades=result.total_trades,
+        winning_trades=result.winning_trades,
+        losing_trades=result.losing_trades,
+        win_rate=result.win_rate,
+        total_pnl=result.total_pnl,
+        total_commission=result.total_commission,
+        total_swap=result.total_swap,
+        net_pnl=result.net_pnl,
+        sharpe_ratio=result.sharpe_ratio,
+        max_drawdown=result.max_drawdown,
+        recovery_factor=result.recovery_factor,
+        profit_factor=result.profit_factor,
+        average_win=result.average_win,
+        average_loss=result.average_loss,
+        average_win_loss_ratio=abs(result.average_win / result.average_loss) if result.average_loss != 0 else float("inf"),
+    )
     
     return stats
 
 
-def print_detailed_analysis(stats: Dict, params: Dict) -> None:
+def print_detailed_analysis(stats: TrialStats, params: Dict) -> None:
     """Выводит детальный анализ результатов."""
     log.info("=" * 80)
     log.info("ДЕТАЛЬНЫЙ АНАЛИЗ ЛУЧШЕГО РЕЗУЛЬТАТА")
     log.info("=" * 80)
     
     log.info("\n📊 ОСНОВНЫЕ ПАРАМЕТРЫ:")
-    log.info("  Инструмент: %s", stats["instrument"])
-    log.info("  Таймфрейм: %s", stats["period"])
-    log.info("  Период тестирования: %s - %s", stats["start_date"][:10], stats["end_date"][:10])
+    log.info("  Инструмент: %s", stats.instrument)
+    log.info("  Таймфрейм: %s", stats.period)
+    log.info("  Период тестирования: %s - %s", stats.start_date[:10], stats.end_date[:10])
     
     log.info("\n⚙️ ПАРАМЕТРЫ СТРАТЕГИИ:")
     for key, value in params.items():
         log.info("  %s: %s", key, value)
     
     log.info("\n📈 СТАТИСТИКА СДЕЛОК:")
-    log.info("  Всего сделок: %s", stats["total_trades"])
-    log.info("  Прибыльных: %s (%.1f%%)", stats["winning_trades"], stats["win_rate"] * 100)
-    log.info("  Убыточных: %s (%.1f%%)", stats["losing_trades"], (1 - stats["win_rate"]) * 100)
-    log.info("  Win Rate: %.2f%%", stats["win_rate"] * 100)
+    log.info("  Всего сделок: %s", stats.total_trades)
+    log.info("  Прибыльных: %s (%.1f%%)", stats.winning_trades, stats.win_rate * 100)
+    log.info("  Убыточных: %s (%.1f%%)", stats.losing_trades, (1 - stats.win_rate) * 100)
+    log.info("  Win Rate: %.2f%%", stats.win_rate * 100)
     
     log.info("\n💰 ФИНАНСОВЫЕ ПОКАЗАТЕЛИ:")
-    log.info("  Общий PnL: %.2f", stats["total_pnl"])
-    log.info("  Комиссии: %.2f", stats["total_commission"])
-    log.info("  Свопы: %.2f", stats["total_swap"])
-    log.info("  Чистый PnL: %.2f", stats["net_pnl"])
-    log.info("  Средний выигрыш: %.2f", stats["average_win"])
-    log.info("  Средний проигрыш: %.2f", stats["average_loss"])
-    log.info("  Соотношение Win/Loss: %.2f", stats["average_win_loss_ratio"])
+    log.info("  Общий PnL: %.2f", stats.total_pnl)
+    log.info("  Комиссии: %.2f", stats.total_commission)
+    log.info("  Свопы: %.2f", stats.total_swap)
+    log.info("  Чистый PnL: %.2f", stats.net_pnl)
+    log.info("  Средний выигрыш: %.2f", stats.average_win)
+    log.info("  Средний проигрыш: %.2f", stats.average_loss)
+    log.info("  Соотношение Win/Loss: %.2f", stats.average_win_loss_ratio)
     
     log.info("\n📊 МЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ:")
-    log.info("  Recovery Factor: %.4f", stats["recovery_factor"])
-    log.info("  Profit Factor: %.4f", stats["profit_factor"])
-    log.info("  Sharpe Ratio: %.4f", stats["sharpe_ratio"])
-    log.info("  Max Drawdown: %.2f%%", stats["max_drawdown"] * 100)
+    log.info("  Recovery Factor: %.4f", stats.recovery_factor)
+    log.info("  Profit Factor: %.4f", stats.profit_factor)
+    log.info("  Sharpe Ratio: %.4f", stats.sharpe_ratio)
+    log.info("  Max Drawdown: %.2f%%", stats.max_drawdown * 100)
     
     log.info("\n✅ ОЦЕНКА РЕЗУЛЬТАТА:")
     
-    # Критерии оценки
-    recovery_ok = stats["recovery_factor"] >= 1.5
-    profit_factor_ok = stats["profit_factor"] > 1.0
-    win_rate_ok = stats["win_rate"] >= 0.4  # Минимум 40% выигрышей
-    sharpe_ok = stats["sharpe_ratio"] > 1.0
-    trades_ok = stats["total_trades"] >= 30  # Минимум 30 сделок для статистической значимости
+    # Критерии оценки: одно векторное сравнение со всеми порогами
+    values = np.array([getattr(stats, criterion[1]) for criterion in QUALITY_CRITERIA], dtype=np.float64)
+    passed = np.where(_QUALITY_STRICT, values > _QUALITY_THRESHOLDS, values >= _QUALITY_THRESHOLDS)
     
-    log.info("  Recovery Factor >= 1.5: %s (%.4f)", "✓" if recovery_ok else "✗", stats["recovery_factor"])
-    log.info("  Profit Factor > 1.0: %s (%.4f)", "✓" if profit_factor_ok else "✗", stats["profit_factor"])
-    log.info("  Win Rate >= 40%%: %s (%.2f%%)", "✓" if win_rate_ok else "✗", stats["win_rate"] * 100)
-    log.info("  Sharpe Ratio > 1.0: %s (%.4f)", "✓" if sharpe_ok else "✗", stats["sharpe_ratio"])
-    log.info("  Достаточно сделок (>=30): %s (%s)", "✓" if trades_ok else "✗", stats["total_trades"])
+    for (label, _, _, _, scale, fmt), value, ok in zip(QUALITY_CRITERIA, values, passed):
+        log.info("  %s: %s (%s)", label, "✓" if ok else "✗", fmt % (value * scale))
     
-    all_ok = recovery_ok and profit_factor_ok and win_rate_ok and sharpe_ok and trades_ok
+    all_ok = bool(passed.all())
     log.info("\n  ОБЩАЯ ОЦЕНКА: %s", "✓ ПРИЕМЛЕМО ДЛЯ ПАПЕР-ТРЕЙДИНГА" if all_ok else "⚠ ТРЕБУЕТСЯ ДОРАБОТКА")
     
     log.info("\n" + "=" * 80)
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Расширенный анализ лучшего результата оптимизации.")
+    parser.add_argument(
+        "--force-rerun",
+        action="store_true",
+        help="Запустить полный бэктест, даже если журнал сделок для этих параметров уже сохранен.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
     """Запускает расширенный анализ результатов оптимизации."""
+    args = parse_args()
     
     best_result_file = Path("research/configs/optimized/best_result.json")
     
@@ -155,7 +373,7 @@ def main() -> None:
     
     # Запускаем детальный бэктест
     try:
-        stats = run_detailed_backtest(params, instrument, period)
+        stats = run_detailed_backtest(params, instrument, period, force_rerun=args.force_rerun)
         
         # Выводим детальный анализ
         print_detailed_analysis(stats, params)
@@ -165,7 +383,7 @@ def main() -> None:
         with stats_file.open("w", encoding="utf-8") as f:
             json.dump({
                 "params": params,
-                "stats": stats,
+                "stats": asdict(stats),
             }, f, ensure_ascii=False, indent=2)
         
         log.info("Детальная статистика сохранена в: %s", stats_file)
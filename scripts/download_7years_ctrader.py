@@ -8,8 +8,11 @@ import argparse
 import logging
 import os
 import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Dict, Tuple
 
 # Добавляем корень проекта в путь
 project_root = Path(__file__).parent.parent
@@ -22,12 +25,11 @@ setup_utf8_encoding()
 
 from dotenv import load_dotenv
 
-from src.data_pipeline.ctrader_backfill import build_raw_path, fetch_range, iso_to_datetime
-from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher
+from src.data_pipeline.ctrader_backfill import fetch_in_worker, init_worker_session, iso_to_datetime, persist_frame
+from src.data_pipeline.ctrader_client import CTraderCredentials
 from src.data_pipeline.curation import (
-    append_parquet,
-    save_jsonl,
-    validate_continuity,
+    Manifest,
+    build_manifest,
 )
 
 
@@ -92,13 +94,22 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Пропускать символы/периоды, для которых уже есть данные",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Количество параллельных процессов (у каждого своя сессия cTrader; уменьшите при лимитах API).",
+    )
     return parser.parse_args()
 
 
-def check_existing_data(curated_dir: Path, symbol: str, period: str) -> bool:
-    """Проверяет, существует ли уже файл с данными."""
-    curated_path = curated_dir / f"{symbol}_{period}.parquet"
-    return curated_path.exists() and curated_path.stat().st_size > 0
+def check_existing_data(manifest: Manifest, symbol: str, period: str, min_days: int = 0) -> bool:
+    """Проверяет по манифесту, есть ли уже непустые данные с покрытием не меньше min_days."""
+    entry = manifest.get((symbol, period))
+    if entry is None:
+        return False
+    first_ts, last_ts, _ = entry
+    return (last_ts - first_ts).days >= min_days
 
 
 def main() -> None:
@@ -125,99 +136,88 @@ def main() -> None:
         environment=args.environment,
     )
 
-    fetcher = CTraderTrendbarFetcher(creds)
     raw_dir = Path(args.raw_dir)
     curated_dir = Path(args.curated_dir)
     
     # Создаем директории если их нет
     raw_dir.mkdir(parents=True, exist_ok=True)
     curated_dir.mkdir(parents=True, exist_ok=True)
+    manifest = build_manifest(curated_dir) if args.skip_existing else {}
 
     total_tasks = len(args.symbols) * len(args.periods)
-    completed = 0
     skipped = 0
     errors = 0
 
-    try:
-        for symbol in args.symbols:
-            for period in args.periods:
-                completed += 1
-                log.info(
-                    "[%d/%d] Обработка %s %s",
-                    completed,
-                    total_tasks,
-                    symbol,
-                    period
-                )
-
-                # Проверяем существующие данные
-                if args.skip_existing and check_existing_data(curated_dir, symbol, period):
-                    log.info("Пропускаем %s %s - данные уже существуют", symbol, period)
-                    skipped += 1
-                    continue
-
-                try:
-                    log.info(
-                        "Загрузка %s %s [%s -> %s]",
-                        symbol,
-                        period,
-                        start.isoformat(),
-                        end.isoformat()
-                    )
-                    frame = fetch_range(fetcher, symbol, period, start, end, args.chunk_size)
-                    summary = validate_continuity(frame, strict=False)
-                    
-                    log.info(
-                        "Загружено %s строк для %s %s (максимальный разрыв %.2f мин)",
-                        summary["rows"],
-                        symbol,
-                        period,
-                        summary["max_gap_minutes"] or 0.0,
-                    )
-                    
-                    if summary.get("gap_violation"):
-                        log.warning(
-                            "Обнаружено нарушение непрерывности для %s %s (максимальный разрыв %.2f мин)",
+    # Проверяем существующие данные до запуска процессов
+    pairs = []
+    for symbol in args.symbols:
+        for period in args.periods:
+            if args.skip_existing and check_existing_data(manifest, symbol, period):
+                log.info("Пропускаем %s %s - данные уже существуют", symbol, period)
+                skipped += 1
+            else:
+                pairs.append((symbol, period))
+
+    if pairs:
+        workers = max(1, min(args.workers, len(pairs)))
+        log.info("Загрузка %d пар, процессов: %d", len(pairs), workers)
+        # Загрузка идет в процессах, запись на диск — в потоках основного процесса:
+        # сеть не простаивает, пока сохраняется предыдущая пара
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker_session,
+            initargs=(asdict(creds), sorted({symbol for symbol, _ in pairs})),
+        ) as executor, ThreadPoolExecutor(max_workers=2) as io_executor:
+            fetches = {
+                executor.submit(fetch_in_worker, symbol, period, start, end, args.chunk_size): (symbol, period)
+                for symbol, period in pairs
+            }
+            writes: Dict[Future, Tuple[str, str]] = {}
+            pending = set(fetches)
+            completed = skipped
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pair = fetches.get(future) or writes[future]
+                    symbol, period = pair
+                    try:
+                        if future in fetches:
+                            write = io_executor.submit(persist_frame, future.result(), start, end, raw_dir, curated_dir)
+                            writes[write] = pair
+                            pending.add(write)
+                            continue
+                        summary = future.result()
+                    except Exception as e:
+                        log.error(
+                            "Ошибка при загрузке %s %s: %s",
                             symbol,
                             period,
-                            summary["max_gap_minutes"] or 0.0,
+                            str(e),
+                            exc_info=True
                         )
-                    
-                    if frame.frame.empty:
-                        log.warning("Нет данных для %s %s", symbol, period)
+                        summary = None
+                    if not summary or not summary["rows"]:
                         errors += 1
-                        continue
-
-                    raw_path = build_raw_path(raw_dir, symbol, period, start, end)
-                    save_jsonl(frame.frame, raw_path)
-                    log.info("Сохранены сырые данные в %s", raw_path)
-
-                    curated_path = curated_dir / f"{symbol}_{period}.parquet"
-                    append_parquet(frame, curated_path)
-                    log.info("Обновлен очищенный датасет %s", curated_path)
-                    
-                except Exception as e:
-                    log.error(
-                        "Ошибка при загрузке %s %s: %s",
+                    completed += 1
+                    # Одна итоговая запись на пару вместо отдельных сообщений о загрузке и сохранении
+                    log.info(
+                        "[%d/%d] %s %s: %d строк, макс. разрыв %.2f мин",
+                        completed,
+                        total_tasks,
                         symbol,
                         period,
-                        str(e),
-                        exc_info=True
+                        summary["rows"] if summary else 0,
+                        (summary["max_gap_minutes"] if summary else None) or 0.0,
                     )
-                    errors += 1
-
-        log.info("=" * 60)
-        log.info("Загрузка завершена!")
-        log.info("Всего задач: %d", total_tasks)
-        log.info("Успешно: %d", total_tasks - skipped - errors)
-        log.info("Пропущено: %d", skipped)
-        log.info("Ошибок: %d", errors)
-        log.info("=" * 60)
 
-    finally:
-        fetcher.close()
+    log.info("=" * 60)
+    log.info("Загрузка завершена!")
+    log.info("Всего задач: %d", total_tasks)
+    log.info("Успешно: %d", total_tasks - skipped - errors)
+    log.info("Пропущено: %d", skipped)
+    log.info("Ошибок: %d", errors)
+    log.info("=" * 60)
 
 
 if __name__ == "__main__":
     main()
-
@@ -7,8 +7,11 @@ from __future__ import annotations
 import logging
 import os
 import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Dict, Tuple
 
 # Настройка UTF-8 кодировки для Windows консоли
 from src.utils.encoding import setup_utf8_encoding
@@ -16,31 +19,24 @@ setup_utf8_encoding()
 
 from dotenv import load_dotenv
 
-from src.data_pipeline.ctrader_backfill import build_raw_path, fetch_range, iso_to_datetime
-from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher
-from src.data_pipeline.curation import append_parquet, save_jsonl, validate_continuity
+from src.data_pipeline.ctrader_backfill import fetch_in_worker, init_worker_session, iso_to_datetime, persist_frame
+from src.data_pipeline.ctrader_client import CTraderCredentials
+from src.data_pipeline.curation import (
+    Manifest,
+    build_manifest,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 
 
-def check_data_exists(symbol: str, period: str, curated_dir: Path, min_days: int = 300) -> bool:
-    """Проверяет наличие данных и их достаточность."""
-    file_path = curated_dir / f"{symbol}_{period}.parquet"
-    if not file_path.exists():
-        return False
-    
-    try:
-        import pandas as pd
-        df = pd.read_parquet(file_path)
-        if df.empty:
-            return False
-        
-        df["utc_time"] = pd.to_datetime(df["utc_time"])
-        days_covered = (df["utc_time"].max() - df["utc_time"].min()).days
-        return days_covered >= min_days
-    except Exception:
+def check_data_exists(manifest: Manifest, symbol: str, period: str, min_days: int = 300) -> bool:
+    """Проверяет по манифесту наличие данных и их достаточность."""
+    entry = manifest.get((symbol, period))
+    if entry is None:
         return False
+    first_ts, last_ts, _ = entry
+    return (last_ts - first_ts).days >= min_days
 
 
 def download_data(
@@ -50,8 +46,14 @@ def download_data(
     curated_dir: Path = Path("data/v1/curated/ctrader"),
     raw_dir: Path = Path("data/v1/raw/ctrader"),
     environment: str = "live",
+    workers: int = 4,
 ) -> None:
-    """Загружает исторические данные из cTrader API."""
+    """
+    Загружает исторические данные из cTrader API.
+
+    Пары (symbol, period) загружаются параллельно в workers процессах,
+    у каждого процесса своя сессия cTrader.
+    """
     load_dotenv()
     
     # Проверяем наличие учетных данных
@@ -77,67 +79,73 @@ def download_data(
         environment=environment,
     )
     
-    fetcher = CTraderTrendbarFetcher(creds)
-    try:
-        total = len(symbols) * len(periods)
-        current = 0
-        
-        for symbol in symbols:
-            for period in periods:
-                current += 1
-                
-                # Проверяем наличие данных
-                if check_data_exists(symbol, period, curated_dir):
-                    log.info(
-                        "[%s/%s] Данные для %s %s уже существуют, пропускаем",
-                        current,
-                        total,
-                        symbol,
-                        period,
-                    )
-                    continue
-                
+    # Диапазоны всех curated-файлов читаются из footer'ов один раз до цикла
+    manifest = build_manifest(curated_dir)
+    total = len(symbols) * len(periods)
+    pairs = []
+    current = 0
+    for symbol in symbols:
+        for period in periods:
+            current += 1
+            
+            # Проверяем наличие данных до запуска процессов
+            if check_data_exists(manifest, symbol, period):
                 log.info(
-                    "[%s/%s] Загрузка %s %s [%s -> %s]",
+                    "[%s/%s] Данные для %s %s уже существуют, пропускаем",
                     current,
                     total,
                     symbol,
                     period,
-                    start.isoformat(),
-                    end.isoformat(),
                 )
-                
-                try:
-                    frame = fetch_range(fetcher, symbol, period, start, end, chunk_size=200)
-                    if frame.frame.empty:
-                        log.warning("Нет данных для %s %s", symbol, period)
-                        continue
-                    
-                    summary = validate_continuity(frame, strict=False)
-                    log.info(
-                        "Загружено %s строк для %s %s (макс. разрыв %.2f мин)",
-                        summary["rows"],
-                        symbol,
-                        period,
-                        summary.get("max_gap_minutes", 0),
-                    )
-                    
-                    # Сохраняем raw данные
-                    raw_path = build_raw_path(raw_dir, symbol, period, start, end)
-                    save_jsonl(frame.frame, raw_path)
-                    log.info("Сохранено raw: %s", raw_path)
-                    
-                    # Сохраняем curated данные
-                    curated_path = curated_dir / f"{symbol}_{period}.parquet"
-                    curated_path.parent.mkdir(parents=True, exist_ok=True)
-                    append_parquet(frame, curated_path)
-                    log.info("Обновлён curated: %s", curated_path)
-                    
-                except Exception as e:
-                    log.error("Ошибка при загрузке %s %s: %s", symbol, period, e, exc_info=True)
-                    continue
-    finally:
-        fetcher.close()
+                continue
+            pairs.append((symbol, period))
+    
+    if pairs:
+        workers = max(1, min(workers, len(pairs)))
+        log.info(
+            "Загрузка %s пар [%s -> %s], процессов: %s",
+            len(pairs),
+            start.isoformat(),
+            end.isoformat(),
+            workers,
+        )
+        # Загрузка идет в процессах, запись на диск — в потоках основного процесса
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker_session,
+            initargs=(asdict(creds), sorted({symbol for symbol, _ in pairs})),
+        ) as executor, ThreadPoolExecutor(max_workers=2) as io_executor:
+            fetches = {
+                executor.submit(fetch_in_worker, symbol, period, start, end, 200): (symbol, period)
+                for symbol, period in pairs
+            }
+            writes: Dict[Future, Tuple[str, str]] = {}
+            pending = set(fetches)
+            current = total - len(pairs)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    symbol, period = fetches.get(future) or writes[future]
+                    try:
+                        if future in fetches:
+                            write = io_executor.submit(persist_frame, future.result(), start, end, raw_dir, curated_dir)
+                            writes[write] = (symbol, period)
+                            pending.add(write)
+                            continue
+                        summary = future.result()
+                        current += 1
+                        log.info(
+                            "[%s/%s] %s %s: %s строк, макс. разрыв %.2f мин",
+                            current,
+                            total,
+                            symbol,
+                            period,
+                            summary["rows"],
+                            summary["max_gap_minutes"] or 0.0,
+                        )
+                    except Exception as e:
+                        current += 1
+                        log.error("Ошибка при загрузке %s %s: %s", symbol, period, e, exc_info=True)
     
     log.info("Загрузка завершена")
 
@@ -170,6 +178,12 @@ if __name__ == "__main__":
         choices=("live", "demo"),
         help="Окружение cTrader",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Количество параллельных процессов (у каждого своя сессия cTrader)",
+    )
     args = parser.parse_args()
     
     download_data(
@@ -177,5 +191,6 @@ if __name__ == "__main__":
         periods=args.periods,
         years=args.years,
         environment=args.environment,
+        workers=args.workers,
     )
 
@@ -1,12 +1,29 @@
 """Скрипт для извлечения промежуточных результатов из логов и анализа лучших результатов."""
 from __future__ import annotations
 
-import json
 import logging
+import mmap
+import os
 import re
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import ijson
+    try:
+        # C-бэкенд на yajl2 в разы быстрее чистого Python, но собирается не везде.
+        # Модуль бэкенда хранится отдельно: исключения (ijson.JSONError) есть только в пакете
+        _ijson_backend = ijson.get_backend("yajl2_c")
+    except ImportError:
+        _ijson_backend = ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 
 # Добавляем корень проекта в sys.path для импорта модулей
 project_root = Path(__file__).parent.parent
@@ -17,6 +34,8 @@ if str(project_root) not in sys.path:
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
+from src.utils.json_io import read_json, write_json
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(message)s",
@@ -24,85 +43,266 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-def extract_results_from_logs(log_path: Path) -> List[Tuple[str, float]]:
-    """Извлекает результаты из логов оптимизации."""
-    results = []
-    
-    if not log_path.exists():
+# Файлы all_results от этого размера читаются потоково (если установлен ijson):
+# orjson быстрее, но держит в памяти весь массив результатов
+STREAMING_MIN_SIZE = 64 * 1024 * 1024
+# Ключи заголовка all_results; оптимизатор пишет их перед массивом all_results
+RESULTS_HEADER_KEYS = ("best_score", "best_params", "total_combinations")
+
+
+# Паттерн для поиска лучших результатов (по байтам, для поиска прямо в mmap)
+RECOVERY_FACTOR_PATTERN = re.compile(rb"recovery_factor = ([\d.]+)")
+
+
+def iter_scores_from_logs(log_path: Path) -> Iterator[float]:
+    """Потоково извлекает значения recovery_factor из логов оптимизации (первое совпадение в строке)."""
+    try:
+        f = log_path.open("rb")
+    except FileNotFoundError:
         log.warning("Файл логов не найден: %s", log_path)
-        return results
-    
-    # Паттерн для поиска лучших результатов
-    pattern = re.compile(r'recovery_factor = ([\d.]+)')
+        return
     
-    with log_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            match = pattern.search(line)
-            if match:
-                score = float(match.group(1))
-                results.append((line.strip(), score))
-    
-    return results
+    with f:
+        try:
+            # Файл отображается в память: поиск идет по всему буферу в C, без
+            # построчного декодирования; страницы подгружаются ядром по мере чтения
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Пустой файл (или mmap недоступен) — читаем обычным способом
+            mm = None
+        if mm is None:
+            for line in f:
+                match = RECOVERY_FACTOR_PATTERN.search(line)
+                if match:
+                    yield float(match.group(1))
+            return
+        
+        try:
+            match = RECOVERY_FACTOR_PATTERN.search(mm)
+            while match:
+                yield float(match.group(1))
+                # Как и при построчном чтении, учитывается только первое совпадение в строке
+                line_end = mm.find(b"\n", match.end())
+                if line_end == -1:
+                    break
+                match = RECOVERY_FACTOR_PATTERN.search(mm, line_end + 1)
+        finally:
+            mm.close()
+
+
+def summarize_scores(scores: Iterable[float], last: int = 5) -> Tuple[int, float, List[float]]:
+    """
+    Сводка по потоку значений за один проход без накопления списка.
+
+    Возвращает (количество, лучшее корректное значение, последние last значений).
+    Значения >= 100.0 означают inf и в максимум не попадают; если корректных нет, максимум равен -inf.
+    """
+    count = 0
+    max_score = float("-inf")
+    tail: Deque[float] = deque(maxlen=last)
+    for score in scores:
+        count += 1
+        if max_score < score < 100.0:
+            max_score = score
+        tail.append(score)
+    return count, max_score, list(tail)
+
+
+def summarize_log(log_path: Path) -> Tuple[int, float, List[float]]:
+    """summarize_scores по логу оптимизации (пустая сводка, если лога нет)."""
+    return summarize_scores(iter_scores_from_logs(log_path))
 
 
 def load_all_results(file_path: Path) -> Dict:
     """Загружает все результаты из JSON файла."""
-    if not file_path.exists():
+    try:
+        return read_json(file_path)
+    except FileNotFoundError:
         return {}
-    
-    with file_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
 
 
-def find_best_result(all_results_files: List[Path], log_path: Path) -> Tuple[Dict, float, str]:
-    """Находит лучший результат из всех доступных источников."""
+def _best_from_all(all_results: List[Dict]) -> Optional[Tuple[Dict, float]]:
+    """
+    Лучший корректный результат из all_results одним векторным проходом.
+
+    Нечисловые и неконечные оценки, а также значения >= 100.0 (означают inf) пропускаются.
+    Возвращает (params, score) или None, если корректных результатов нет.
+    """
+    scores = np.fromiter(
+        (
+            score if isinstance(score, (int, float)) else np.nan
+            for score in (result.get("score") for result in all_results)
+        ),
+        dtype=np.float64,
+        count=len(all_results),
+    )
+    valid = np.isfinite(scores) & (scores < 100.0)
+    if not valid.any():
+        return None
+    index = int(np.where(valid, scores, -np.inf).argmax())
+    return all_results[index]["params"], float(scores[index])
+
+
+def stream_best_from_file(path: Path) -> Tuple[Dict, float, int]:
+    """
+    Потоковый аналог _best_from_all: (params, score, число результатов) без загрузки массива.
+
+    Фильтр тот же — нечисловые оценки и значения >= 100.0 пропускаются; если корректных
+    результатов нет, возвращается ({}, -inf, count).
+    """
+    best_score = float("-inf")
+    best_params: Dict = {}
+    count = 0
+    with path.open("rb") as fp:
+        for result in _ijson_backend.items(fp, "all_results.item", use_float=True):
+            count += 1
+            score = result.get("score")
+            if isinstance(score, (int, float)) and score < 100.0 and score > best_score:
+                best_score = score
+                best_params = result.get("params", {})
+    return best_params, float(best_score), count
+
+
+def _stream_header(path: Path) -> Dict:
+    """Ключи RESULTS_HEADER_KEYS верхнего уровня; чтение прекращается, как только они найдены."""
+    header: Dict = {}
+    with path.open("rb") as fp:
+        for key, value in _ijson_backend.kvitems(fp, "", use_float=True):
+            if key == "all_results":
+                break
+            if key in RESULTS_HEADER_KEYS:
+                header[key] = value
+                if len(header) == len(RESULTS_HEADER_KEYS):
+                    break
+    return header
+
+
+def summarize_results_file(path: Path, size: int) -> Tuple[Dict, Optional[Tuple[Dict, float]], int]:
+    """
+    Заголовок файла all_results, лучший корректный результат и число результатов.
+
+    Файлы от STREAMING_MIN_SIZE разбираются потоково через ijson; файлы меньше, а также
+    файлы, которые ijson не смог разобрать (например, Infinity/NaN в оценках), читаются
+    целиком (orjson, если установлен).
+    """
+    if HAS_IJSON and size >= STREAMING_MIN_SIZE:
+        try:
+            header = _stream_header(path)
+            best_params, best_score, count = stream_best_from_file(path)
+        except ijson.JSONError as exc:
+            log.debug("Потоковый разбор %s не удался (%s), читаем целиком", path.name, exc)
+        else:
+            best_from_all = (best_params, best_score) if best_score != float("-inf") else None
+            return header, best_from_all, count
+
+    data = read_json(path)
+    all_results_list = data.get("all_results", [])
+    best_from_all = _best_from_all(all_results_list) if all_results_list else None
+    return data, best_from_all, len(all_results_list)
+
+
+def find_best_result(all_results_files: List[Path], log_path: Path, force_log_scan: bool = False) -> Tuple[Dict, float, str]:
+    """
+    Находит лучший результат из всех доступных источников.
+
+    Файлы all_results считаются основным источником: оптимизатор пишет в них каждую
+    оцененную комбинацию, а значения в логе — подмножество этих же оценок (и без параметров).
+    Поэтому лог сканируется, только если в файлах не нашлось ни одного результата,
+    либо при force_log_scan=True / переменной окружения FORCE_LOG_SCAN=1.
+    """
     best_score = float("-inf")
     best_params = {}
     best_source = ""
     
     # Проверяем файлы результатов - ищем лучший из всех результатов, а не только best_score
     for result_file in all_results_files:
-        if result_file.exists():
-            data = load_all_results(result_file)
-            
-            # Проверяем best_score
-            file_best_score = data.get("best_score", float("-inf"))
-            
-            # Но также проверяем все результаты в all_results
-            all_results_list = data.get("all_results", [])
-            if all_results_list:
-                # Фильтруем некорректные результаты (>= 100.0 означает inf)
-                valid_results = [(r["params"], r["score"]) for r in all_results_list 
-                                if isinstance(r.get("score"), (int, float)) and r.get("score", 0) < 100.0]
-                
-                if valid_results:
-                    # Находим лучший из валидных результатов
-                    best_from_all = max(valid_results, key=lambda x: x[1])
-                    if best_from_all[1] > best_score:
-                        best_score = best_from_all[1]
-                        best_params = best_from_all[0]
-                        best_source = f"Файл: {result_file.name} (из all_results)"
-                elif file_best_score < 100.0 and file_best_score > best_score:
-                    # Используем best_score если он валидный
-                    best_score = file_best_score
-                    best_params = data.get("best_params", {})
-                    best_source = f"Файл: {result_file.name} (best_score)"
-    
-    # Проверяем логи
-    log_results = extract_results_from_logs(log_path)
-    if log_results:
-        log_scores = [score for _, score in log_results if score < 100.0]  # Фильтруем некорректные
-        if log_scores:
-            max_log_score = max(log_scores)
-            if max_log_score > best_score:
-                best_score = max_log_score
-                best_source = f"Логи: {log_path.name}"
-                # Пытаемся найти параметры из последнего лучшего результата в логах
-                # (это сложно, так как параметры не логируются, но можем использовать последний найденный)
+        try:
+            stat = result_file.stat()
+        except FileNotFoundError:
+            continue
+        # Лучший из валидных результатов all_results (>= 100.0 означает inf)
+        data, best_from_all, count = summarize_results_file(result_file, stat.st_size)
+        if not count:
+            continue
+        
+        # Проверяем best_score
+        file_best_score = data.get("best_score", float("-inf"))
+        
+        if best_from_all is not None:
+            if best_from_all[1] > best_score:
+                best_score = best_from_all[1]
+                best_params = best_from_all[0]
+                best_source = f"Файл: {result_file.name} (из all_results)"
+        elif file_best_score < 100.0 and file_best_score > best_score:
+            # Используем best_score если он валидный
+            best_score = file_best_score
+            best_params = data.get("best_params", {})
+            best_source = f"Файл: {result_file.name} (best_score)"
+    
+    if best_score != float("-inf") and not (force_log_scan or os.getenv("FORCE_LOG_SCAN") == "1"):
+        return best_params, best_score, best_source
+    
+    # Проверяем логи (некорректные значения >= 100.0 отфильтрованы в summarize_scores)
+    _, max_log_score, _ = summarize_log(log_path)
+    if max_log_score > best_score:
+        best_score = max_log_score
+        best_source = f"Логи: {log_path.name}"
+        # Пытаемся найти параметры из последнего лучшего результата в логах
+        # (это сложно, так как параметры не логируются, но можем использовать последний найденный)
     
     return best_params, best_score, best_source
 
 
+def scan_all_results_files(results_dir: Path) -> List[Tuple[Path, int]]:
+    """
+    Находит файлы all_results за один проход os.scandir: [(путь, st_size)].
+
+    stat берется из DirEntry, поэтому при загрузке файл не нужно проверять повторно;
+    пустые файлы пропускаются. Результат отсортирован по имени.
+    """
+    if not results_dir.is_dir():
+        return []
+    found = []
+    with os.scandir(results_dir) as it:
+        for entry in it:
+            if not (entry.name.startswith("carry_momentum_") and entry.name.endswith("_all_results.json")):
+                continue
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if stat.st_size:
+                found.append((Path(entry.path), stat.st_size))
+    found.sort(key=lambda item: item[0].name)
+    return found
+
+
+def _analyze_one(scanned: Tuple[Path, int]) -> Optional[Dict]:
+    """Находит лучший результат одного файла all_results (None, если файл пуст)."""
+    result_file, size = scanned
+    data, best_from_all, count = summarize_results_file(result_file, size)
+    if not data and not count:
+        return None
+    instrument = result_file.stem.replace("carry_momentum_", "").replace("_all_results", "")
+    
+    # Ищем лучший результат из всех результатов, а не только best_score
+    best_score = data.get("best_score", 0.0)
+    best_params = data.get("best_params", {})
+    
+    # Фильтруем некорректные результаты и находим реальный лучший
+    if best_from_all is not None:
+        if best_from_all[1] > best_score or best_score >= 100.0:
+            best_score = best_from_all[1]
+            best_params = best_from_all[0]
+    
+    return {
+        "instrument": instrument,
+        "score": best_score,
+        "params": best_params,
+        "file": result_file,
+        "total_combinations": data.get("total_combinations", count),
+    }
+
+
 def main() -> None:
     """Анализирует результаты оптимизации и находит лучший."""
     
@@ -110,7 +310,7 @@ def main() -> None:
     log_path = Path("research/logs/optimization.log")
     
     # Находим все файлы результатов
-    all_results_files = list(results_dir.glob("carry_momentum_*_all_results.json"))
+    all_results_files = scan_all_results_files(results_dir)
     
     log.info("=" * 80)
     log.info("АНАЛИЗ РЕЗУЛЬТАТОВ ОПТИМИЗАЦИИ")
@@ -119,51 +319,32 @@ def main() -> None:
     if not all_results_files:
         log.warning("Файлы результатов не найдены в %s", results_dir)
     
-    # Анализируем каждый файл
+    # Файлы независимы: разбор и поиск лучшего результата идут в отдельных процессах,
+    # логирование — здесь, в исходном порядке файлов
     all_best_results = []
+    workers = min(len(all_results_files), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            analyzed = list(executor.map(_analyze_one, all_results_files))
+    else:
+        analyzed = [_analyze_one(result_file) for result_file in all_results_files]
     
-    for result_file in all_results_files:
-        data = load_all_results(result_file)
-        if data:
-            instrument = result_file.stem.replace("carry_momentum_", "").replace("_all_results", "")
-            
-            # Ищем лучший результат из всех результатов, а не только best_score
-            all_results_list = data.get("all_results", [])
-            best_score = data.get("best_score", 0.0)
-            best_params = data.get("best_params", {})
-            
-            # Фильтруем некорректные результаты и находим реальный лучший
-            if all_results_list:
-                valid_results = [(r["params"], r["score"]) for r in all_results_list 
-                                if isinstance(r.get("score"), (int, float)) and r.get("score", 0) < 100.0]
-                if valid_results:
-                    best_from_all = max(valid_results, key=lambda x: x[1])
-                    if best_from_all[1] > best_score or best_score >= 100.0:
-                        best_score = best_from_all[1]
-                        best_params = best_from_all[0]
-            
-            total_combinations = data.get("total_combinations", len(all_results_list) if all_results_list else 0)
-            
-            log.info("\n%s:", instrument)
-            log.info("  Лучший Recovery Factor: %.4f", best_score)
-            log.info("  Лучшие параметры: %s", best_params)
-            log.info("  Всего комбинаций: %s", total_combinations)
-            
-            all_best_results.append({
-                "instrument": instrument,
-                "score": best_score,
-                "params": best_params,
-                "file": result_file,
-            })
+    for result in analyzed:
+        if result is None:
+            continue
+        log.info("\n%s:", result["instrument"])
+        log.info("  Лучший Recovery Factor: %.4f", result["score"])
+        log.info("  Лучшие параметры: %s", result["params"])
+        log.info("  Всего комбинаций: %s", result["total_combinations"])
+        all_best_results.append(result)
     
     # Извлекаем результаты из логов
-    log_results = extract_results_from_logs(log_path)
-    if log_results:
+    log_count, max_log_score, last_log_scores = summarize_log(log_path)
+    if log_count:
         log.info("\nРезультаты из логов:")
-        log_scores = [score for _, score in log_results]
-        log.info("  Найдено результатов: %s", len(log_results))
-        log.info("  Лучший Recovery Factor: %.4f", max(log_scores) if log_scores else 0.0)
-        log.info("  Последние 5 результатов: %s", log_scores[-5:] if len(log_scores) >= 5 else log_scores)
+        log.info("  Найдено результатов: %s", log_count)
+        log.info("  Лучший Recovery Factor: %.4f", max_log_score if max_log_score != float("-inf") else 0.0)
+        log.info("  Последние 5 результатов: %s", last_log_scores)
     
     # Находим абсолютно лучший результат
     if all_best_results:
@@ -178,13 +359,12 @@ def main() -> None:
         
         # Сохраняем лучший результат в отдельный файл
         best_file = results_dir / "best_result.json"
-        with best_file.open("w", encoding="utf-8") as f:
-            json.dump({
-                "instrument": best_overall["instrument"],
-                "best_score": best_overall["score"],
-                "best_params": best_overall["params"],
-                "source_file": str(best_overall["file"]),
-            }, f, ensure_ascii=False, indent=2)
+        write_json(best_file, {
+            "instrument": best_overall["instrument"],
+            "best_score": best_overall["score"],
+            "best_params": best_overall["params"],
+            "source_file": str(best_overall["file"]),
+        })
         
         log.info("\nЛучший результат сохранен в: %s", best_file)
         log.info("\nДля визуализации сделок используйте:")
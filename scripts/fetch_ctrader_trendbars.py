@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Настройка UTF-8 кодировки для Windows консоли
@@ -12,7 +12,13 @@ setup_utf8_encoding()
 
 from dotenv import load_dotenv
 
+from src.data_pipeline.ctrader_backfill import iter_trendbars, period_duration
 from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher
+from src.utils.json_io import dumps_line
+
+
+# Размер блока записи JSONL
+WRITE_BUFFER_SIZE = 64 * 1024
 
 
 def parse_args() -> argparse.Namespace:
@@ -20,6 +26,18 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--symbol", required=True, help="Символ, например EURUSD.")
     parser.add_argument("--period", default="m15", help="Период: m1, m5, m15, m30, h1, h4, d1.")
     parser.add_argument("--bars", type=int, default=500, help="Количество баров (по умолчанию 500).")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=500,
+        help="Количество баров за один запрос при постраничной загрузке (500 по умолчанию).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Максимум одновременных запросов страниц (8 по умолчанию).",
+    )
     parser.add_argument(
         "--output",
         default="data/v1/raw/ctrader_trendbars.jsonl",
@@ -50,20 +68,32 @@ def main() -> None:
         environment=args.environment,
     )
 
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    end = datetime.now(timezone.utc)
+    start = end - period_duration(args.period) * args.bars
+    count = 0
     fetcher = CTraderTrendbarFetcher(creds)
     try:
-        bars = fetcher.get_trendbars(symbol=args.symbol, period=args.period, bars=args.bars)
+        # Страницы запрашиваются параллельно через одно соединение и пишутся по мере готовности;
+        # строки JSONL копятся в буфере и сбрасываются на диск блоками по WRITE_BUFFER_SIZE
+        with output_path.open("wb") as fp:
+            buffer = bytearray()
+            bars = iter_trendbars(
+                fetcher, args.symbol, args.period, start, end, args.page_size, max_inflight=args.concurrency
+            )
+            for bar in bars:
+                buffer += dumps_line(bar)
+                count += 1
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    fp.write(buffer)
+                    buffer.clear()
+            fp.write(buffer)
     finally:
         fetcher.close()
 
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as fp:
-        for bar in bars:
-            fp.write(json.dumps(bar, ensure_ascii=False))
-            fp.write("\n")
-
-    print(f"Сохранено {len(bars)} баров в {output_path}")
+    print(f"Сохранено {count} баров в {output_path}")
 
 
 if __name__ == "__main__":
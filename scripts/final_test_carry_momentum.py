@@ -1,11 +1,15 @@
 """Скрипт для финального тестирования Carry Momentum с оптимизированными параметрами."""
 from __future__ import annotations
 
-import json
 import logging
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
+import numpy as np
+
 # Добавляем корень проекта в sys.path для импорта модулей
 project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
@@ -17,6 +21,7 @@ setup_utf8_encoding()
 
 from src.backtesting.full_backtest import FullBacktestRunner
 from src.strategies import CarryMomentumStrategy
+from src.utils.json_io import read_json
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -25,116 +30,188 @@ log = logging.getLogger(__name__)
 def load_optimized_params(instrument: str, period: str, config_dir: Path = Path("research/configs/optimized")) -> dict | None:
     """Загружает оптимизированные параметры для инструмента и таймфрейма."""
     params_path = config_dir / f"carry_momentum_{instrument}_{period}.json"
-    if not params_path.exists():
+    try:
+        return read_json(params_path).get("best_params")
+    except FileNotFoundError:
         return None
+
+
+# Параметры CarryMomentumStrategy, берущиеся из оптимизированного конфига, и их значения
+# по умолчанию для отсутствующих ключей (остальные ключи конфига игнорируются)
+_CARRY_DEFAULTS: dict = {
+    "atr_multiplier": 2.0,
+    "min_adx": 20.0,
+    "risk_reward_ratio": 2.0,
+    "min_pos_di_advantage": 2.0,
+    "trend_confirmation_bars": 3,
+    "max_volatility_pct": 0.15,
+    "min_volatility_pct": 0.08,
+    "min_rsi_long": 50.0,
+    "max_rsi_short": 50.0,
+    "enable_short_trades": False,
+}
+
+
+# Разделители и отметки отчета строятся один раз, в вызовы логирования передаются аргументами
+_SECTION_RULE = "=" * 80
+_RULE = "-" * 80
+_MARKS = {True: "✓", False: "✗"}
+
+
+@dataclass(slots=True)
+class BacktestSummary:
+    """Сводка финального бэктеста одной пары (instrument, period)."""
+
+    instrument: str
+    period: str
+    status: str  # completed / error / skipped
+    total_trades: int = 0
+    winning_trades: int = 0
+    losing_trades: int = 0
+    win_rate: float = 0.0
+    net_pnl: float = 0.0
+    recovery_factor: float = 0.0
+    profit_factor: float = 0.0
+    sharpe_ratio: float = 0.0
+    max_drawdown: float = 0.0
+    recovery_factor_ok: bool = False
+    profit_factor_ok: bool = False
+    reason: str = ""
+    error: str = ""
+
+
+# Runner рабочего процесса: создается один раз в _init_worker (загрузка кеша символов)
+_WORKER_RUNNER: FullBacktestRunner | None = None
+
+
+def _init_worker() -> None:
+    """Инициализирует процесс пула: логирование и собственный FullBacktestRunner."""
+    global _WORKER_RUNNER
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    _WORKER_RUNNER = FullBacktestRunner(verbose_cache_load=False)
+
+
+def _build_strategy(params: dict) -> CarryMomentumStrategy:
+    """Создает стратегию с оптимизированными параметрами (недостающие берутся из _CARRY_DEFAULTS)."""
+    kwargs = {**_CARRY_DEFAULTS, **{key: value for key, value in params.items() if key in _CARRY_DEFAULTS}}
+    return CarryMomentumStrategy(**kwargs)
+
+
+def _run_one(task: tuple[str, str, dict]) -> BacktestSummary:
+    """
+    Выполняет один бэктест в процессе пула.
+
+    Ошибка бэктеста возвращается как сводка со status="error".
+    """
+    instrument, period, params = task
+    try:
+        result = _WORKER_RUNNER.run(_build_strategy(params), instrument, period)
+    except Exception as e:
+        # Трассировка остается в логе процесса; итоговая ошибка выводится в общем порядке пар
+        log.debug("Ошибка при тестировании %s %s", instrument, period, exc_info=True)
+        return BacktestSummary(instrument, period, "error", error=str(e))
     
-    with params_path.open("r", encoding="utf-8") as fp:
-        data = json.load(fp)
-        return data.get("best_params")
+    return BacktestSummary(
+        instrument,
+        period,
+        "completed",
+        total_trades=result.total_trades,
+        winning_trades=result.winning_trades,
+        losing_trades=result.losing_trades,
+        win_rate=result.win_rate,
+        net_pnl=result.net_pnl,
+        recovery_factor=result.recovery_factor,
+        profit_factor=result.profit_factor,
+        sharpe_ratio=result.sharpe_ratio,
+        max_drawdown=result.max_drawdown,
+        # Проверяем целевые метрики
+        recovery_factor_ok=result.recovery_factor >= 1.5,
+        profit_factor_ok=result.profit_factor > 1.0,
+    )
 
 
 def run_final_tests(config_dir: Path = Path("research/configs/optimized")) -> None:
-    """Запускает финальные бэктесты с оптимизированными параметрами."""
+    """
+    Запускает финальные бэктесты с оптимизированными параметрами.
+
+    Пары (instrument, period) независимы и выполняются параллельно в пуле процессов;
+    результаты выводятся в исходном порядке.
+    """
     
     instruments = ["EURUSD", "GBPUSD", "USDJPY"]
     periods = ["m15", "h1", "h4"]
     
-    runner = FullBacktestRunner()
-    
-    results_summary = []
+    # Сводка по каждой паре в порядке instruments × periods: индекс i * len(periods) + j
+    results_summary: list[BacktestSummary | None] = [None] * (len(instruments) * len(periods))
     
-    log.info("=" * 80)
+    log.info(_SECTION_RULE)
     log.info("ФИНАЛЬНОЕ ТЕСТИРОВАНИЕ CARRY MOMENTUM С ОПТИМИЗИРОВАННЫМИ ПАРАМЕТРАМИ")
-    log.info("=" * 80)
+    log.info(_SECTION_RULE)
     
+    # Загружаем оптимизированные параметры
+    tasks = []
     for instrument in instruments:
         for period in periods:
-            log.info("\n" + "-" * 80)
+            params = load_optimized_params(instrument, period, config_dir)
+            if params:
+                tasks.append((instrument, period, params))
+    
+    completed_by_pair = {}
+    if tasks:
+        with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1), initializer=_init_worker) as executor:
+            for summary in executor.map(_run_one, tasks):
+                completed_by_pair[(summary.instrument, summary.period)] = summary
+    
+    for i, instrument in enumerate(instruments):
+        for j, period in enumerate(periods):
+            log.info("\n%s", _RULE)
             log.info("Тестирование: %s %s", instrument, period)
-            log.info("-" * 80)
+            log.info(_RULE)
             
-            # Загружаем оптимизированные параметры
-            params = load_optimized_params(instrument, period, config_dir)
-            if not params:
+            summary = completed_by_pair.get((instrument, period))
+            if summary is None:
                 log.warning("Оптимизированные параметры не найдены для %s %s, пропускаем", instrument, period)
-                results_summary.append({
-                    "instrument": instrument,
-                    "period": period,
-                    "status": "skipped",
-                    "reason": "no_params"
-                })
+                results_summary[i * len(periods) + j] = BacktestSummary(
+                    instrument, period, "skipped", reason="no_params"
+                )
                 continue
             
-            # Создаем стратегию с оптимизированными параметрами
-            strategy = CarryMomentumStrategy(
-                atr_multiplier=params.get("atr_multiplier", 2.0),
-                min_adx=params.get("min_adx", 20.0),
-                risk_reward_ratio=params.get("risk_reward_ratio", 2.0),
-                min_pos_di_advantage=params.get("min_pos_di_advantage", 2.0),
-                trend_confirmation_bars=params.get("trend_confirmation_bars", 3),
-                max_volatility_pct=params.get("max_volatility_pct", 0.15),
-                min_volatility_pct=params.get("min_volatility_pct", 0.08),
-                avoid_hours=params.get("avoid_hours", [8, 9, 16, 17, 21, 22, 23, 0, 1, 2, 3, 4, 5]),
-                min_rsi_long=params.get("min_rsi_long", 50.0),
-                max_rsi_short=params.get("max_rsi_short", 50.0),
-                enable_short_trades=params.get("enable_short_trades", False),
-            )
-            
-            try:
-                # Запускаем бэктест
-                result = runner.run(strategy, instrument, period)
-                
-                # Проверяем целевые метрики
-                recovery_factor_ok = result.recovery_factor >= 1.5
-                profit_factor_ok = result.profit_factor > 1.0
-                
+            if summary.status == "completed":
                 log.info("Результаты:")
-                log.info("  Всего сделок: %s", result.total_trades)
-                log.info("  Прибыльных: %s (%.1f%%)", result.winning_trades, result.win_rate * 100)
-                log.info("  Убыточных: %s", result.losing_trades)
-                log.info("  Net PnL: %.2f", result.net_pnl)
-                log.info("  Recovery Factor: %.4f %s", result.recovery_factor, "✓" if recovery_factor_ok else "✗")
-                log.info("  Profit Factor: %.4f %s", result.profit_factor, "✓" if profit_factor_ok else "✗")
-                log.info("  Sharpe Ratio: %.4f", result.sharpe_ratio)
-                log.info("  Max Drawdown: %.2f%%", result.max_drawdown * 100)
-                
-                results_summary.append({
-                    "instrument": instrument,
-                    "period": period,
-                    "status": "completed",
-                    "total_trades": result.total_trades,
-                    "win_rate": result.win_rate,
-                    "net_pnl": result.net_pnl,
-                    "recovery_factor": result.recovery_factor,
-                    "profit_factor": result.profit_factor,
-                    "sharpe_ratio": result.sharpe_ratio,
-                    "max_drawdown": result.max_drawdown,
-                    "recovery_factor_ok": recovery_factor_ok,
-                    "profit_factor_ok": profit_factor_ok,
-                })
-                
-            except Exception as e:
-                log.error("Ошибка при тестировании %s %s: %s", instrument, period, e, exc_info=True)
-                results_summary.append({
-                    "instrument": instrument,
-                    "period": period,
-                    "status": "error",
-                    "error": str(e)
-                })
+                log.info("  Всего сделок: %s", summary.total_trades)
+                log.info("  Прибыльных: %s (%.1f%%)", summary.winning_trades, summary.win_rate * 100)
+                log.info("  Убыточных: %s", summary.losing_trades)
+                log.info("  Net PnL: %.2f", summary.net_pnl)
+                log.info("  Recovery Factor: %.4f %s", summary.recovery_factor, _MARKS[summary.recovery_factor_ok])
+                log.info("  Profit Factor: %.4f %s", summary.profit_factor, _MARKS[summary.profit_factor_ok])
+                log.info("  Sharpe Ratio: %.4f", summary.sharpe_ratio)
+                log.info("  Max Drawdown: %.2f%%", summary.max_drawdown * 100)
+            else:
+                log.error("Ошибка при тестировании %s %s: %s", instrument, period, summary.error)
+            results_summary[i * len(periods) + j] = summary
     
     # Выводим сводку
-    log.info("\n" + "=" * 80)
+    log.info("\n%s", _SECTION_RULE)
     log.info("СВОДКА ФИНАЛЬНОГО ТЕСТИРОВАНИЯ")
-    log.info("=" * 80)
+    log.info(_SECTION_RULE)
     
-    completed = [r for r in results_summary if r["status"] == "completed"]
+    completed = [r for r in results_summary if r.status == "completed"]
     if completed:
         log.info("\nУспешно протестировано: %s из %s комбинаций", len(completed), len(results_summary))
         
+        # Метрики всех успешных прогонов в одном структурированном массиве
+        metrics = np.array(
+            [
+                (r.recovery_factor, r.profit_factor, r.sharpe_ratio, r.recovery_factor_ok, r.profit_factor_ok)
+                for r in completed
+            ],
+            dtype=[("rf", "f8"), ("pf", "f8"), ("sr", "f8"), ("rok", "?"), ("pok", "?")],
+        )
+        
         # Подсчитываем достижение целевых метрик
-        recovery_ok_count = sum(1 for r in completed if r.get("recovery_factor_ok", False))
-        profit_ok_count = sum(1 for r in completed if r.get("profit_factor_ok", False))
-        both_ok_count = sum(1 for r in completed if r.get("recovery_factor_ok", False) and r.get("profit_factor_ok", False))
+        recovery_ok_count = int(metrics["rok"].sum())
+        profit_ok_count = int(metrics["pok"].sum())
+        both_ok_count = int((metrics["rok"] & metrics["pok"]).sum())
         
         log.info("\nДостижение целевых метрик:")
         log.info("  Recovery Factor ≥ 1.5: %s из %s (%.1f%%)", recovery_ok_count, len(completed), 
@@ -145,9 +222,9 @@ def run_final_tests(config_dir: Path = Path("research/configs/optimized")) -> No
                 both_ok_count / len(completed) * 100 if completed else 0)
         
         # Средние значения метрик
-        avg_recovery = sum(r["recovery_factor"] for r in completed) / len(completed)
-        avg_profit = sum(r["profit_factor"] for r in completed) / len(completed)
-        avg_sharpe = sum(r["sharpe_ratio"] for r in completed) / len(completed)
+        avg_recovery = float(metrics["rf"].mean())
+        avg_profit = float(metrics["pf"].mean())
+        avg_sharpe = float(metrics["sr"].mean())
         
         log.info("\nСредние значения метрик:")
         log.info("  Средний Recovery Factor: %.4f", avg_recovery)
@@ -156,15 +233,15 @@ def run_final_tests(config_dir: Path = Path("research/configs/optimized")) -> No
         
         # Лучшие результаты
         log.info("\nЛучшие результаты:")
-        best_recovery = max(completed, key=lambda r: r["recovery_factor"])
+        best_recovery = completed[int(metrics["rf"].argmax())]
         log.info("  Лучший Recovery Factor: %s %s (%.4f)", 
-                best_recovery["instrument"], best_recovery["period"], best_recovery["recovery_factor"])
+                best_recovery.instrument, best_recovery.period, best_recovery.recovery_factor)
         
-        best_profit = max(completed, key=lambda r: r["profit_factor"])
+        best_profit = completed[int(metrics["pf"].argmax())]
         log.info("  Лучший Profit Factor: %s %s (%.4f)", 
-                best_profit["instrument"], best_profit["period"], best_profit["profit_factor"])
+                best_profit.instrument, best_profit.period, best_profit.profit_factor)
     
-    log.info("\n" + "=" * 80)
+    log.info("\n%s", _SECTION_RULE)
 
 
 if __name__ == "__main__":
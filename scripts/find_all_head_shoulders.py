@@ -3,8 +3,12 @@
 """
 from __future__ import annotations
 
+import math
+import os
 import sys
 import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 project_root = Path(__file__).parent.parent
@@ -14,16 +18,87 @@ if str(project_root) not in sys.path:
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
 from matplotlib.patches import Rectangle
 
-from src.patterns.chart import detect_all_head_shoulders_top, detect_all_head_shoulders_bottom
+from src.patterns.chart import head_shoulders_bottom_positions, head_shoulders_top_positions
+
+
+# Дубликат = голова ближе DUPLICATE_BARS баров m15 по времени и DUPLICATE_PRICE_PCT по цене
+DUPLICATE_BARS = 100
+DUPLICATE_PRICE_PCT = 0.002
+BAR_SECONDS = 900
+# Минимальный интервал между строками прогресса, секунды
+PROGRESS_INTERVAL = 0.1
+# Ширина ценовой ячейки в log-цене: любая цена в пределах DUPLICATE_PRICE_PCT попадает в соседнюю ячейку
+_PRICE_CELL = -math.log1p(-DUPLICATE_PRICE_PCT)
+
+
+def _pattern_positions(df: pd.DataFrame, patterns: list) -> np.ndarray:
+    """Позиции (левое плечо, голова, правое плечо) паттернов в df одним get_indexer; -1 — точки нет в df."""
+    points = [timestamp for pattern in patterns for timestamp in pattern[:3]]
+    return df.index.get_indexer(pd.DatetimeIndex(points)).reshape(-1, 3)
+
+
+def _is_new_head(seen_heads: dict, head_bar: int, head_price: float) -> bool:
+    """
+    Проверяет голову паттерна на дубликат и запоминает ее, если она новая.
+
+    seen_heads — сетка {(ячейка времени, ячейка log-цены): [(бар, цена), ...]}; ячейки
+    не уже порогов дубликата, поэтому достаточно просмотреть ячейку головы и ее соседей.
+    """
+    time_cell = head_bar // DUPLICATE_BARS
+    price_cell = int(math.log(head_price) // _PRICE_CELL)
+    for dt in (-1, 0, 1):
+        for dp in (-1, 0, 1):
+            for existing_bar, existing_price in seen_heads.get((time_cell + dt, price_cell + dp), ()):
+                if (abs(head_bar - existing_bar) < DUPLICATE_BARS
+                        and abs(head_price - existing_price) / head_price < DUPLICATE_PRICE_PCT):
+                    return False
+    seen_heads[(time_cell, price_cell)].append((head_bar, head_price))
+    return True
+
+
+# Массивы high/low процесса пула: передаются один раз в _init_worker, а не с каждым окном
+_WORKER_HIGH: np.ndarray | None = None
+_WORKER_LOW: np.ndarray | None = None
+
+
+def _init_worker(high: np.ndarray, low: np.ndarray) -> None:
+    """Сохраняет массивы датасета в процессе пула."""
+    global _WORKER_HIGH, _WORKER_LOW
+    _WORKER_HIGH = high
+    _WORKER_LOW = low
+
+
+def _scan_window(task: tuple[int, int]) -> tuple[list, list]:
+    """Паттерны HST и HSB окна [start_idx, start_idx + window_size) в позициях внутри окна."""
+    start_idx, window_size = task
+    window_high = _WORKER_HIGH[start_idx:start_idx + window_size]
+    window_low = _WORKER_LOW[start_idx:start_idx + window_size]
+    
+    # Ищем паттерны используя новый алгоритм Patternz
+    hst_positions = head_shoulders_top_positions(
+        window_high,
+        window_low,
+        strict_patterns=False,  # Обычный режим (TradeDays=3)
+        head_shoulder_pct=0.15  # 15% преимущество головы
+    )
+    hsb_positions = head_shoulders_bottom_positions(
+        window_high,
+        window_low,
+        strict_patterns=False,  # Обычный режим (TradeDays=3)
+        head_shoulder_pct=0.15  # 15% преимущество головы
+    )
+    return hst_positions, hsb_positions
 
 
 def find_all_patterns_in_dataset(df: pd.DataFrame, window_size: int = 500, 
-                                 step: int = 400):
+                                 step: int = 400, workers: int | None = None):
     """
     Находит все паттерны Head & Shoulders в датасете, используя скользящее окно.
     
@@ -31,133 +106,135 @@ def find_all_patterns_in_dataset(df: pd.DataFrame, window_size: int = 500,
         df: DataFrame с данными
         window_size: Размер окна для поиска паттернов
         step: Шаг для скользящего окна (увеличен для уменьшения перекрытий)
-        shoulder_tolerance: Допустимое отклонение цен плеч
+        workers: Число процессов для сканирования окон (None = все ядра, 1 = без пула)
     
     Returns:
         Tuple[List[HST], List[HSB]] - списки всех найденных паттернов
     """
     all_hst = []
     all_hsb = []
-    # Улучшенная фильтрация дубликатов: проверяем по индексам и ценам
-    seen_hst = {}  # {(left_idx, head_idx, right_idx): (left_price, head_price, right_price)}
-    seen_hsb = {}
+    # Фильтрация дубликатов по времени и цене головы (см. _is_new_head)
+    seen_hst = defaultdict(list)
+    seen_hsb = defaultdict(list)
     
     print(f"Поиск паттернов в датасете из {len(df)} баров...")
-    sys.stdout.flush()
     print(f"Параметры: window_size={window_size}, step={step}")
-    sys.stdout.flush()
     
     total_windows = (len(df) - window_size) // step + 1
-    print(f"Всего окон для обработки: {total_windows}")
-    sys.stdout.flush()
+    print(f"Всего окон для обработки: {total_windows}", flush=True)
+    
+    # Окна — срезы массивов без построения DataFrame; позиции паттернов окна
+    # переводятся в индексы датасета сдвигом на start_idx
+    index = df.index
+    high = np.ascontiguousarray(df['high'].to_numpy(), dtype=np.float64)
+    low = np.ascontiguousarray(df['low'].to_numpy(), dtype=np.float64)
+    # Номера баров m15 от эпохи (для фильтрации дубликатов): бары m15 выровнены
+    # по 15 минутам, поэтому целочисленное деление точное и разность номеров —
+    # расстояние по времени с учетом выходных, а не число строк между барами
+    bar_numbers = (index.as_unit("s").asi8 // BAR_SECONDS).tolist()
+    
+    tasks = [(start_idx, window_size) for start_idx in range(0, len(df) - window_size, step)]
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
     
     start_time = time.time()
-    window_times = []
+    last_print_time = 0.0
+    
+    # Окна независимы и сканируются в пуле процессов; результаты приходят в порядке окон,
+    # поэтому фильтрация дубликатов дает тот же результат, что и последовательный проход
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(high, low))
+        window_results = executor.map(_scan_window, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+    else:
+        _init_worker(high, low)
+        window_results = map(_scan_window, tasks)
     
     # Используем скользящее окно
     try:
-        for window_num, start_idx in enumerate(range(0, len(df) - window_size, step)):
-            window_start_time = time.time()
-            window_df = df.iloc[start_idx:start_idx + window_size]
-            
-            # Ищем паттерны используя новый алгоритм Patternz
-            hst_patterns = detect_all_head_shoulders_top(
-                window_df, 
-                lookback=window_size,
-                strict_patterns=False,  # Обычный режим (TradeDays=3)
-                head_shoulder_pct=0.15  # 15% преимущество головы
-            )
-            hsb_patterns = detect_all_head_shoulders_bottom(
-                window_df, 
-                lookback=window_size,
-                strict_patterns=False,  # Обычный режим (TradeDays=3)
-                head_shoulder_pct=0.15  # 15% преимущество головы
-            )
-            
+        for window_num, ((start_idx, _), (hst_positions, hsb_positions)) in enumerate(zip(tasks, window_results)):
             # Добавляем паттерны с улучшенной фильтрацией дубликатов
-            for pattern in hst_patterns:
-                left_idx, head_idx, right_idx, neckline = pattern
-                pattern_key = (left_idx, head_idx, right_idx)
-                
-                # Получаем цены для проверки
-                left_price = window_df.loc[left_idx, 'high']
-                head_price = window_df.loc[head_idx, 'high']
-                right_price = window_df.loc[right_idx, 'high']
-                
-                # Проверяем, не является ли это дубликатом
-                # Дубликат = паттерн очень близкий по времени (минимум 100-150 баров между головами) и ценам
-                is_duplicate = False
-                for existing_key, (existing_left, existing_head, existing_right) in seen_hst.items():
-                    # Проверяем временную близость головы (минимум 100 баров)
-                    time_diff_head = abs((head_idx - existing_key[1]).total_seconds() / 900)  # секунды в барах m15
-                    
-                    if time_diff_head < 100:
-                        # Проверяем ценовую близость головы (в пределах 0.2%)
-                        price_diff_head = abs(head_price - existing_head) / head_price
-                        
-                        if price_diff_head < 0.002:
-                            is_duplicate = True
-                            break
-                
-                if not is_duplicate:
-                    seen_hst[pattern_key] = (left_price, head_price, right_price)
-                    all_hst.append(pattern)
-            
-            for pattern in hsb_patterns:
-                left_idx, head_idx, right_idx, neckline = pattern
-                pattern_key = (left_idx, head_idx, right_idx)
-                
-                # Получаем цены для проверки
-                left_price = window_df.loc[left_idx, 'low']
-                head_price = window_df.loc[head_idx, 'low']
-                right_price = window_df.loc[right_idx, 'low']
-                
-                # Проверяем, не является ли это дубликатом
-                # Дубликат = паттерн очень близкий по времени (минимум 100-150 баров между головами) и ценам
-                is_duplicate = False
-                for existing_key, (existing_left, existing_head, existing_right) in seen_hsb.items():
-                    # Проверяем временную близость головы (минимум 100 баров)
-                    time_diff_head = abs((head_idx - existing_key[1]).total_seconds() / 900)
-                    
-                    if time_diff_head < 100:
-                        # Проверяем ценовую близость головы (в пределах 0.2%)
-                        price_diff_head = abs(head_price - existing_head) / head_price
-                        
-                        if price_diff_head < 0.002:
-                            is_duplicate = True
-                            break
-                
-                if not is_duplicate:
-                    seen_hsb[pattern_key] = (left_price, head_price, right_price)
-                    all_hsb.append(pattern)
+            for ls_pos, head_pos, rs_pos, neckline in hst_positions:
+                head_pos += start_idx
+                if _is_new_head(seen_hst, bar_numbers[head_pos], float(high[head_pos])):
+                    all_hst.append((index[start_idx + ls_pos], index[head_pos], index[start_idx + rs_pos], neckline))
             
-            # Отслеживаем время обработки окна
-            window_time = time.time() - window_start_time
-            window_times.append(window_time)
+            for ls_pos, head_pos, rs_pos, neckline in hsb_positions:
+                head_pos += start_idx
+                if _is_new_head(seen_hsb, bar_numbers[head_pos], float(low[head_pos])):
+                    all_hsb.append((index[start_idx + ls_pos], index[head_pos], index[start_idx + rs_pos], neckline))
             
-            # Показываем прогресс после каждого окна
+            # Показываем прогресс не чаще PROGRESS_INTERVAL секунд (и после последнего окна)
+            now = time.time()
+            if now - last_print_time < PROGRESS_INTERVAL and window_num + 1 < len(tasks):
+                continue
+            last_print_time = now
             progress = (window_num + 1) / total_windows * 100
-            elapsed_time = time.time() - start_time
-            avg_window_time = sum(window_times) / len(window_times)
+            elapsed_time = now - start_time
+            avg_window_time = elapsed_time / (window_num + 1)
             remaining_windows = total_windows - (window_num + 1)
             eta_seconds = avg_window_time * remaining_windows
             
             print(f"  Прогресс: {window_num + 1}/{total_windows} окон ({progress:.1f}%) | "
                   f"Найдено: HST={len(all_hst)}, HSB={len(all_hsb)} | "
-                  f"Время: {elapsed_time:.1f}с | Осталось: {eta_seconds:.1f}с")
-            sys.stdout.flush()
+                  f"Время: {elapsed_time:.1f}с | Осталось: {eta_seconds:.1f}с", flush=True)
     
     except KeyboardInterrupt:
-        print("\n\nПрерывание пользователем. Сохраняем найденные паттерны...")
-        sys.stdout.flush()
+        print("\n\nПрерывание пользователем. Сохраняем найденные паттерны...", flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
     
     total_time = time.time() - start_time
-    print(f"\nОбработка завершена за {total_time:.1f} секунд")
-    sys.stdout.flush()
+    print(f"\nОбработка завершена за {total_time:.1f} секунд", flush=True)
     
     return all_hst, all_hsb
 
 
+def _minmax_decimation(values: np.ndarray, max_points: int = 5000) -> np.ndarray:
+    """
+    Позиции точек для прореживания ряда: минимум и максимум каждого участка в порядке времени.
+
+    В отличие от шага [::n], экстремумы цены сохраняются на графике при том же числе точек.
+    """
+    bucket = -(-len(values) // max(1, max_points // 2))
+    if bucket <= 1:
+        return np.arange(len(values))
+    
+    full = len(values) - len(values) % bucket
+    blocks = values[:full].reshape(-1, bucket)
+    starts = np.arange(0, full, bucket)
+    picks = np.stack([starts + blocks.argmin(axis=1), starts + blocks.argmax(axis=1)], axis=1)
+    if full < len(values):
+        tail = values[full:]
+        picks = np.vstack([picks, [full + tail.argmin(), full + tail.argmax()]])
+    return np.sort(picks, axis=1).ravel()
+
+
+def _draw_patterns(ax, df: pd.DataFrame, patterns: list, prices: np.ndarray,
+                   structure_color: str, neckline_color: str, name: str) -> None:
+    """Рисует каркасы и neckline паттернов одной стороны двумя LineCollection и точки одним scatter."""
+    positions = _pattern_positions(df, patterns)
+    valid = (positions >= 0).all(axis=1)
+    if not valid.any():
+        return
+    positions = positions[valid]
+    necklines = np.array([pattern[3] for pattern in patterns], dtype=np.float64)[valid]
+    
+    # Даты переводятся в числа matplotlib один раз для всех точек
+    x = mdates.date2num(df.index[positions.ravel()].to_pydatetime()).reshape(positions.shape)
+    y = prices[positions]
+    
+    ax.add_collection(LineCollection(np.stack([x, y], axis=-1), colors=structure_color, linewidths=2,
+                                     alpha=0.8, label=f'{name} Structure'))
+    ax.scatter(x.ravel(), y.ravel(), color=structure_color, s=36, alpha=0.8)
+    
+    neck_x = x[:, [0, 2]]
+    neck_y = np.repeat(necklines[:, None], 2, axis=1)
+    ax.add_collection(LineCollection(np.stack([neck_x, neck_y], axis=-1), colors=neckline_color,
+                                     linewidths=1.5, linestyles='dashed', alpha=0.7,
+                                     label=f'Neckline ({name})'))
+
+
 def visualize_all_patterns(df: pd.DataFrame, all_hst: list, all_hsb: list, 
                           instrument: str = "EURUSD", period: str = "m15"):
     """
@@ -166,60 +243,18 @@ def visualize_all_patterns(df: pd.DataFrame, all_hst: list, all_hsb: list,
     fig, ax = plt.subplots(figsize=(24, 12))
     
     # Рисуем ценовую линию для контекста
-    # Используем каждую N-ю свечу для производительности
-    sample_rate = max(1, len(df) // 5000)  # Максимум 5000 точек
-    sampled_df = df.iloc[::sample_rate]
-    
-    ax.plot(sampled_df.index, sampled_df['close'], 
+    # Прореживаем до ~5000 точек, сохраняя минимум и максимум каждого участка
+    close = df['close'].to_numpy()
+    picks = _minmax_decimation(close, max_points=5000)
+    ax.plot(mdates.date2num(df.index.values[picks]), close[picks],
            color='lightgray', linewidth=0.5, alpha=0.6, label='Close Price')
     
-    # Рисуем паттерны HST - простой стиль, один цвет для всех
-    hst_count = 0
-    for left_idx, head_idx, right_idx, neckline in all_hst:
-        if left_idx not in df.index or head_idx not in df.index or right_idx not in df.index:
-            continue
-        
-        # Структура паттерна - синий цвет для всех HST
-        left_price = df.loc[left_idx, 'high']
-        head_price = df.loc[head_idx, 'high']
-        right_price = df.loc[right_idx, 'high']
-        
-        ax.plot([left_idx, head_idx, right_idx], 
-               [left_price, head_price, right_price], 
-               color='blue', linewidth=2, alpha=0.8, 
-               marker='o', markersize=6,
-               label='HST Structure' if hst_count == 0 else '')
-        
-        # Neckline - красный пунктир для всех HST
-        ax.plot([left_idx, right_idx], [neckline, neckline], 
-               color='red', linestyle='--', linewidth=1.5, alpha=0.7,
-               label='Neckline (HST)' if hst_count == 0 else '')
-        
-        hst_count += 1
-    
-    # Рисуем паттерны HSB - простой стиль, один цвет для всех
-    hsb_count = 0
-    for left_idx, head_idx, right_idx, neckline in all_hsb:
-        if left_idx not in df.index or head_idx not in df.index or right_idx not in df.index:
-            continue
-        
-        # Структура паттерна - зеленый цвет для всех HSB
-        left_price = df.loc[left_idx, 'low']
-        head_price = df.loc[head_idx, 'low']
-        right_price = df.loc[right_idx, 'low']
-        
-        ax.plot([left_idx, head_idx, right_idx], 
-               [left_price, head_price, right_price], 
-               color='green', linewidth=2, alpha=0.8, 
-               marker='o', markersize=6,
-               label='HSB Structure' if hsb_count == 0 else '')
-        
-        # Neckline - оранжевый пунктир для всех HSB
-        ax.plot([left_idx, right_idx], [neckline, neckline], 
-               color='orange', linestyle='--', linewidth=1.5, alpha=0.7,
-               label='Neckline (HSB)' if hsb_count == 0 else '')
-        
-        hsb_count += 1
+    # Паттерны рисуются коллекциями линий (одна на тип элемента), а не отдельным ax.plot на паттерн
+    # HST - синий каркас и красная пунктирная neckline
+    _draw_patterns(ax, df, all_hst, df['high'].to_numpy(), 'blue', 'red', 'HST')
+    # HSB - зеленый каркас и оранжевая пунктирная neckline
+    _draw_patterns(ax, df, all_hsb, df['low'].to_numpy(), 'green', 'orange', 'HSB')
+    ax.autoscale_view()
     
     # Настройка графика
     ax.set_title(f'{instrument} {period} - Все паттерны Head & Shoulders\n'
@@ -244,8 +279,7 @@ def visualize_all_patterns(df: pd.DataFrame, all_hst: list, all_hsb: list,
     output_dir.mkdir(exist_ok=True)
     output_path = output_dir / f"head_shoulders_all_{instrument}_{period}.png"
     plt.savefig(output_path, dpi=200, bbox_inches='tight')
-    print(f"\n✓ График сохранен: {output_path}")
-    sys.stdout.flush()
+    print(f"\n✓ График сохранен: {output_path}", flush=True)
     
     plt.show()
 
@@ -260,8 +294,7 @@ def main():
     data_path = curated_dir / f"{instrument}_{period}.parquet"
     
     if not data_path.exists():
-        print(f"Ошибка: Данные не найдены: {data_path}")
-        sys.stdout.flush()
+        print(f"Ошибка: Данные не найдены: {data_path}", flush=True)
         return
     
     df = pd.read_parquet(data_path)
@@ -269,34 +302,24 @@ def main():
     df = df.set_index("utc_time").sort_index()
     
     print(f"Загружено {len(df)} баров для {instrument} {period}")
-    sys.stdout.flush()
-    print(f"Период: {df.index[0]} - {df.index[-1]}")
-    sys.stdout.flush()
+    print(f"Период: {df.index[0]} - {df.index[-1]}", flush=True)
     
     # Находим все паттерны используя новый алгоритм Patternz
     all_hst, all_hsb = find_all_patterns_in_dataset(df, window_size=500, step=400)
     
     print(f"\n{'='*60}")
-    sys.stdout.flush()
     print(f"ИТОГОВЫЕ РЕЗУЛЬТАТЫ:")
-    sys.stdout.flush()
     print(f"{'='*60}")
-    sys.stdout.flush()
     print(f"Head & Shoulders Top (HST): {len(all_hst)} паттернов")
-    sys.stdout.flush()
     print(f"Head & Shoulders Bottom (HSB): {len(all_hsb)} паттернов")
-    sys.stdout.flush()
     print(f"Всего найдено: {len(all_hst) + len(all_hsb)} паттернов")
-    sys.stdout.flush()
-    print(f"{'='*60}\n")
-    sys.stdout.flush()
+    print(f"{'='*60}\n", flush=True)
     
     # Визуализируем
     if all_hst or all_hsb:
         visualize_all_patterns(df, all_hst, all_hsb, instrument, period)
     else:
-        print("Паттерны не найдены.")
-        sys.stdout.flush()
+        print("Паттерны не найдены.", flush=True)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 """Скрипт для мониторинга оптимизации в реальном времени."""
-import json
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Tuple
 
 # Добавляем корень проекта в sys.path
 project_root = Path(__file__).parent.parent
@@ -12,6 +13,25 @@ if str(project_root) not in sys.path:
 from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
+from src.utils.json_io import read_json
+
+
+def _read_summary(path: Path) -> Tuple[int, float]:
+    """
+    Число протестированных комбинаций и best_score для файла all_results.
+
+    Берутся из небольшой сводки *_all_results_summary.json (HyperparameterOptimizer.save_all_results
+    пишет ее до JSON, поэтому при изменившемся JSON она уже актуальна); без сводки
+    (результаты старых запусков) разбирается сам файл all_results.
+    """
+    try:
+        summary = read_json(path.with_name(path.stem + "_summary.json"))
+    except FileNotFoundError:
+        data = read_json(path)
+        return len(data.get("all_results", [])), data.get("best_score", 0.0)
+    return summary["total_combinations"], summary.get("best_score", 0.0)
+
+
 def monitor_optimization(interval: int = 5):
     """Мониторит прогресс оптимизации в реальном времени."""
     config_dir = Path("research/configs/optimized")
@@ -25,6 +45,9 @@ def monitor_optimization(interval: int = 5):
     print()
     
     previous_counts = {}
+    # {путь: (st_mtime_ns, st_size, (count, best_score))} — неизменившиеся файлы не перечитываются
+    summaries: Dict[Path, Tuple[int, int, Tuple[int, float]]] = {}
+    executor = ThreadPoolExecutor(max_workers=8)
     
     try:
         while True:
@@ -34,20 +57,37 @@ def monitor_optimization(interval: int = 5):
             print(f"\n[{current_time}] Проверка прогресса...")
             print("-" * 80)
             
+            # Один stat на файл; измененные файлы читаются параллельно (I/O и orjson отпускают GIL)
+            stats = {}
             for instrument in instruments:
                 for period in periods:
                     all_results_path = config_dir / f"carry_momentum_{instrument}_{period}_all_results.json"
+                    try:
+                        stats[all_results_path] = all_results_path.stat()
+                    except FileNotFoundError:
+                        stats[all_results_path] = None
+            pending = {
+                path: executor.submit(_read_summary, path)
+                for path, stat in stats.items()
+                if stat is not None and summaries.get(path, (None, None))[:2] != (stat.st_mtime_ns, stat.st_size)
+            }
+            
+            for instrument in instruments:
+                for period in periods:
+                    all_results_path = config_dir / f"carry_momentum_{instrument}_{period}_all_results.json"
+                    stat = stats[all_results_path]
                     
-                    if all_results_path.exists():
+                    if stat is not None:
                         try:
                             # Проверяем время изменения файла
-                            mtime = all_results_path.stat().st_mtime
-                            file_time = time.strftime("%H:%M:%S", time.localtime(mtime))
-                            
-                            with all_results_path.open("r", encoding="utf-8") as fp:
-                                data = json.load(fp)
+                            file_time = time.strftime("%H:%M:%S", time.localtime(stat.st_mtime))
                             
-                            count = len(data.get("all_results", []))
+                            if all_results_path in pending:
+                                summary = pending[all_results_path].result()
+                                summaries[all_results_path] = (stat.st_mtime_ns, stat.st_size, summary)
+                            else:
+                                summary = summaries[all_results_path][2]
+                            count, best_score = summary
                             total_tested += count
                             
                             # Проверяем изменение
@@ -60,7 +100,6 @@ def monitor_optimization(interval: int = 5):
                             if change > 0:
                                 status = f" (+{change} новых)"
                             
-                            best_score = data.get("best_score", 0.0)
                             print(f"  {instrument} {period}: {count} комбинаций, лучший RF = {best_score:.4f}, обновлено: {file_time}{status}")
                             
                         except Exception as e:
@@ -83,6 +122,8 @@ def monitor_optimization(interval: int = 5):
             
     except KeyboardInterrupt:
         print("\n\nМониторинг остановлен.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     import argparse
@@ -2,9 +2,14 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
+import os
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+import pyarrow.parquet as pq
+
 # Добавляем корень проекта в sys.path для импорта модулей
 project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
@@ -15,21 +20,55 @@ from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
 from src.backtesting.full_backtest import FullBacktestRunner
-from scripts.optimize_strategy import optimize_carry_momentum_two_stage, optimize_carry_momentum_fast, optimize_carry_momentum_genetic
+from src.backtesting.optimization import save_all_results, save_best_params
+from scripts.optimize_strategy import optimize_carry_momentum, optimize_carry_momentum_two_stage, optimize_carry_momentum_genetic
+
+log = logging.getLogger(__name__)
+
 
-# Создаем директорию для логов перед настройкой логирования
-log_dir = Path("research/logs")
-log_dir.mkdir(parents=True, exist_ok=True)
+def _log_handlers() -> list[logging.Handler]:
+    """Обработчики лога: research/logs/optimization.log и консоль."""
+    # Создаем директорию для логов перед настройкой логирования
+    log_dir = Path("research/logs")
+    log_dir.mkdir(parents=True, exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    handlers = [
         logging.FileHandler(log_dir / "optimization.log", encoding="utf-8"),
         logging.StreamHandler(),  # Также выводим в консоль
     ]
-)
-log = logging.getLogger(__name__)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging() -> QueueListener:
+    """
+    Настраивает лог в research/logs/optimization.log и консоль через очередь.
+
+    Корневой логгер только кладет записи в очередь, а запись в файл и консоль
+    выполняет фоновый поток QueueListener, так что log.info в цикле оптимизации
+    не ждет файлового ввода-вывода. Очередь межпроцессная: процессы пула оптимизации,
+    созданные через fork, наследуют QueueHandler, и их записи тоже доходят до listener.
+    Listener нужно остановить (stop) перед выходом, чтобы дописать оставшиеся записи.
+    """
+    log_queue = multiprocessing.Queue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *_log_handlers())
+    listener.start()
+    return listener
+
+
+def setup_worker_logging() -> None:
+    """Лог процесса пула, запущенного через spawn: очередь главного процесса ему недоступна, пишем напрямую."""
+    logging.basicConfig(level=logging.INFO, handlers=_log_handlers())
+
+
+if __name__ == "__mp_main__":
+    # При spawn процесс пула повторно импортирует скрипт под именем __mp_main__
+    setup_worker_logging()
 
 
 def main() -> None:
@@ -40,6 +79,7 @@ def main() -> None:
     n_jobs = 12  # Параллелизация (12 ядер для ускорения)
     use_genetic = False  # Использовать генетический алгоритм (быстрее для больших пространств параметров)
     use_two_stage = True  # Использовать двухэтапную оптимизацию (быстрее и эффективнее, только если use_genetic=False)
+    sobol_m = 9  # Без двухэтапной: 2**sobol_m комбинаций полной сетки по Соболю (None — полный перебор)
     
     runner = FullBacktestRunner()
     output_dir = Path("research/configs/optimized")
@@ -57,10 +97,17 @@ def main() -> None:
     log.info("Таймфреймы: %s", ", ".join(periods))
     log.info("Всего комбинаций: %s", total_combinations)
     log.info("Параллелизация: %s процессов", n_jobs)
-    log.info("Режим оптимизации: %s", "Генетический алгоритм" if use_genetic else ("Двухэтапная (быстрая)" if use_two_stage else "Полная"))
+    full_mode = "Полная" if sobol_m is None else f"Выборка Соболя ({2 ** sobol_m} комбинаций)"
+    log.info("Режим оптимизации: %s", "Генетический алгоритм" if use_genetic else ("Двухэтапная (быстрая)" if use_two_stage else full_mode))
     
     results_summary = []
     
+    # Имена файлов curated-каталога одним проходом вместо exists() на каждую комбинацию
+    curated_files = set()
+    if runner.curated_dir.is_dir():
+        with os.scandir(runner.curated_dir) as entries:
+            curated_files = {entry.name for entry in entries if entry.is_file()}
+    
     for instrument in instruments:
         for period in periods:
             current += 1
@@ -71,7 +118,7 @@ def main() -> None:
             try:
                 # Проверяем наличие данных
                 data_path = runner.curated_dir / f"{instrument}_{period}.parquet"
-                if not data_path.exists():
+                if data_path.name not in curated_files:
                     log.warning("Данные не найдены: %s, пропускаем", data_path)
                     results_summary.append({
                         "instrument": instrument,
@@ -81,11 +128,9 @@ def main() -> None:
                     })
                     continue
                 
-                # Проверяем что файл не пустой
-                import pandas as pd
+                # Проверяем что файл не пустой (число строк берется из footer, без чтения данных)
                 try:
-                    test_df = pd.read_parquet(data_path)
-                    if test_df.empty:
+                    if pq.ParquetFile(data_path).metadata.num_rows == 0:
                         log.warning("Файл данных пуст: %s, пропускаем", data_path)
                         results_summary.append({
                             "instrument": instrument,
@@ -120,25 +165,22 @@ def main() -> None:
                         n_jobs=n_jobs,
                     )
                 else:
-                    result = optimize_carry_momentum_fast(
+                    result = optimize_carry_momentum(
                         runner=runner,
                         instrument=instrument,
                         period=period,
                         n_jobs=n_jobs,
                         early_stopping_threshold=0.1,  # Агрессивный early stopping
+                        sobol_m=sobol_m,
                     )
                 
-                # Сохраняем результаты
-                from src.backtesting.optimization import HyperparameterOptimizer
-                optimizer = HyperparameterOptimizer(runner)
-                
                 # Сохраняем лучшие параметры
                 best_params_path = output_dir / f"carry_momentum_{instrument}_{period}.json"
-                optimizer.save_best_params(result, best_params_path)
+                save_best_params(result, best_params_path)
                 
                 # Сохраняем все результаты
                 all_results_path = output_dir / f"carry_momentum_{instrument}_{period}_all_results.json"
-                optimizer.save_all_results(result, all_results_path)
+                save_all_results(result, all_results_path)
                 
                 log.info("Результаты сохранены:")
                 log.info("  Лучшие параметры: %s", best_params_path)
@@ -185,5 +227,9 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    listener = setup_logging()
+    try:
+        main()
+    finally:
+        listener.stop()
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import argparse
 import json
 import logging
 import sys
@@ -11,20 +12,31 @@ from src.utils.encoding import setup_utf8_encoding
 setup_utf8_encoding()
 
 from src.backtesting.full_backtest import FullBacktestRunner
-from src.backtesting.optimization import HyperparameterOptimizer, OptimizationResult
-from src.backtesting.genetic_optimization import GeneticOptimizer
-from src.strategies import (
-    BollingerReversionStrategy,
-    CarryMomentumStrategy,
-    CombinedMomentumStrategy,
-    MACDTrendStrategy,
-    MeanReversionStrategy,
-    MomentumBreakoutStrategy,
+from src.backtesting.optimization import (
+    HyperparameterOptimizer,
+    OptimizationResult,
+    save_all_results,
+    save_best_params,
+    sobol_param_list,
 )
+from src.backtesting.genetic_optimization import GeneticOptimizer
 
 log = logging.getLogger(__name__)
 
 
+class _LazyJson:
+    """Значение для %s в логе: сериализуется в JSON, только если запись действительно выводится."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj) -> None:
+        self.obj = obj
+
+    def __str__(self) -> str:
+        # Скаляры NumPy в параметрах сетки приводятся к числам Python
+        return json.dumps(self.obj, ensure_ascii=False, indent=2, default=lambda value: value.item())
+
+
 def check_running_optimization() -> bool:
     """Проверяет, запущена ли уже оптимизация."""
     import subprocess
@@ -46,11 +58,35 @@ def check_running_optimization() -> bool:
         return False
 
 
+def _run_search(optimizer: HyperparameterOptimizer, search: str, n_trials: int, **kwargs) -> OptimizationResult:
+    """
+    Поиск по param_grid: полный перебор (search="grid"), TPE на n_trials испытаний (search="tpe")
+    или successive halving на укороченной истории (search="halving").
+
+    Аргументы kwargs — как у HyperparameterOptimizer.optimize; параметры, которых нет
+    у optimize_tpe/optimize_halving (ранняя остановка, этап и т.п.), для них не используются.
+    """
+    if search == "tpe":
+        for key in ("early_stopping_threshold", "stage_info", "param_list"):
+            kwargs.pop(key, None)
+        return optimizer.optimize_tpe(n_trials=n_trials, **kwargs)
+    if search == "halving":
+        for key in ("early_stopping_threshold", "stage_info"):
+            kwargs.pop(key, None)
+        return optimizer.optimize_halving(**kwargs)
+    if search != "grid":
+        raise ValueError(f"Неизвестный способ поиска: {search}")
+    return optimizer.optimize(**kwargs)
+
+
 def optimize_momentum_breakout(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
     """Оптимизация параметров Momentum Breakout стратегии (улучшенная версия)."""
 
+    from src.strategies import MomentumBreakoutStrategy
+
     def strategy_factory(params: Dict) -> MomentumBreakoutStrategy:
         return MomentumBreakoutStrategy(
             atr_multiplier=params.get("atr_multiplier", 2.0),
@@ -72,7 +108,10 @@ def optimize_momentum_breakout(
     }
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -84,9 +123,13 @@ def optimize_momentum_breakout(
 
 
 def optimize_mean_reversion(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    sobol_m: Optional[int] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
-    """Оптимизация параметров Mean Reversion стратегии."""
+    """Оптимизация параметров Mean Reversion стратегии (sobol_m — выборка 2**sobol_m комбинаций вместо сетки)."""
+
+    from src.strategies import MeanReversionStrategy
 
     def strategy_factory(params: Dict) -> MeanReversionStrategy:
         return MeanReversionStrategy(
@@ -102,7 +145,10 @@ def optimize_mean_reversion(
     }
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -110,6 +156,7 @@ def optimize_mean_reversion(
         optimization_metric="sharpe_ratio",
         n_jobs=n_jobs,
         early_stopping_threshold=early_stopping_threshold,
+        param_list=sobol_param_list(param_grid, sobol_m) if sobol_m is not None else None,
     )
 
 
@@ -118,6 +165,8 @@ def optimize_carry_momentum_fast(
 ) -> OptimizationResult:
     """Быстрая оптимизация параметров Carry Momentum с уменьшенной сеткой."""
     
+    from src.strategies import CarryMomentumStrategy
+
     def strategy_factory(params: Dict) -> CarryMomentumStrategy:
         return CarryMomentumStrategy(
             atr_multiplier=params.get("atr_multiplier", 2.0),
@@ -161,6 +210,8 @@ def optimize_carry_momentum_genetic(
 ) -> OptimizationResult:
     """Генетическая оптимизация параметров Carry Momentum стратегии."""
     
+    from src.strategies import CarryMomentumStrategy
+
     def strategy_factory(params: Dict) -> CarryMomentumStrategy:
         return CarryMomentumStrategy(
             atr_multiplier=params.get("atr_multiplier", 2.0),
@@ -263,6 +314,8 @@ def optimize_carry_momentum_two_stage(
         "risk_reward_ratio": _create_fine_grid(best.get("risk_reward_ratio", 2.0), step=0.3, count=5),
     }
     
+    from src.strategies import CarryMomentumStrategy
+
     def strategy_factory(params: Dict) -> CarryMomentumStrategy:
         return CarryMomentumStrategy(
             atr_multiplier=params.get("atr_multiplier", 2.0),
@@ -325,9 +378,18 @@ def _create_fine_grid(center: float, step: float, count: int, is_int: bool = Fal
 
 
 def optimize_carry_momentum(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    sobol_m: Optional[int] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
-    """Оптимизация параметров Carry Momentum стратегии с расширенными диапазонами."""
+    """
+    Оптимизация параметров Carry Momentum стратегии с расширенными диапазонами.
+
+    sobol_m: проверять 2**sobol_m комбинаций из последовательности Соболя вместо
+    полной сетки (None — полный перебор).
+    """
+
+    from src.strategies import CarryMomentumStrategy
 
     def strategy_factory(params: Dict) -> CarryMomentumStrategy:
         return CarryMomentumStrategy(
@@ -355,7 +417,10 @@ def optimize_carry_momentum(
     # Всего комбинаций: 7 × 8 × 8 × 6 × 8 = 21,504
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -363,14 +428,18 @@ def optimize_carry_momentum(
         optimization_metric="recovery_factor",  # Изменено на Recovery Factor
         n_jobs=n_jobs,
         early_stopping_threshold=early_stopping_threshold,
+        param_list=sobol_param_list(param_grid, sobol_m) if sobol_m is not None else None,
     )
 
 
 def optimize_combined_momentum(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
     """Оптимизация параметров Combined Momentum стратегии."""
 
+    from src.strategies import CombinedMomentumStrategy
+
     def strategy_factory(params: Dict) -> CombinedMomentumStrategy:
         return CombinedMomentumStrategy(
             atr_multiplier=params.get("atr_multiplier", 2.0),
@@ -390,7 +459,10 @@ def optimize_combined_momentum(
     }
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -401,10 +473,13 @@ def optimize_combined_momentum(
 
 
 def optimize_macd_trend(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
     """Оптимизация параметров MACD Trend стратегии."""
 
+    from src.strategies import MACDTrendStrategy
+
     def strategy_factory(params: Dict) -> MACDTrendStrategy:
         return MACDTrendStrategy(
             macd_fast=params.get("macd_fast", 12),
@@ -422,7 +497,10 @@ def optimize_macd_trend(
     }
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -433,10 +511,13 @@ def optimize_macd_trend(
 
 
 def optimize_bollinger_reversion(
-    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None
+    runner: FullBacktestRunner, instrument: str, period: str, n_jobs: int = 12, early_stopping_threshold: Optional[float] = None,
+    search: str = "grid", n_trials: int = 50,
 ) -> OptimizationResult:
     """Оптимизация параметров Bollinger Reversion стратегии."""
 
+    from src.strategies import BollingerReversionStrategy
+
     def strategy_factory(params: Dict) -> BollingerReversionStrategy:
         return BollingerReversionStrategy(
             bb_period=params.get("bb_period", 20),
@@ -457,7 +538,10 @@ def optimize_bollinger_reversion(
     }
 
     optimizer = HyperparameterOptimizer(runner)
-    return optimizer.optimize(
+    return _run_search(
+        optimizer,
+        search,
+        n_trials,
         strategy_factory=strategy_factory,
         param_grid=param_grid,
         instrument=instrument,
@@ -467,14 +551,50 @@ def optimize_bollinger_reversion(
     )
 
 
-def main() -> None:
-    import argparse
+def _sobol_m(args: argparse.Namespace) -> Optional[int]:
+    return None if args.full_grid else args.sobol_m
+
+
+def _run_carry_momentum(runner: FullBacktestRunner, args: argparse.Namespace) -> OptimizationResult:
+    if args.use_genetic:
+        return optimize_carry_momentum_genetic(runner, args.instrument, args.period, args.n_jobs, args.fast_mode)
+    return optimize_carry_momentum(
+        runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold, _sobol_m(args),
+        search=args.search, n_trials=args.n_trials,
+    )
 
+
+def _grid_optimizer(optimize_func: Callable[..., OptimizationResult], with_sobol: bool = False):
+    """Запуск optimize_* с аргументами командной строки (sobol_m — только для функций, которые его принимают)."""
+
+    def run(runner: FullBacktestRunner, args: argparse.Namespace) -> OptimizationResult:
+        extra = (_sobol_m(args),) if with_sobol else ()
+        return optimize_func(
+            runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold, *extra,
+            search=args.search, n_trials=args.n_trials,
+        )
+
+    return run
+
+
+# Стратегия из --strategy -> запуск оптимизации; классы стратегий импортируются внутри optimize_*,
+# поэтому загружается только модуль выбранной стратегии
+_OPTIMIZERS: Dict[str, Callable[[FullBacktestRunner, argparse.Namespace], OptimizationResult]] = {
+    "mean_reversion": _grid_optimizer(optimize_mean_reversion, with_sobol=True),
+    "carry_momentum": _run_carry_momentum,
+    "momentum_breakout": _grid_optimizer(optimize_momentum_breakout),
+    "combined_momentum": _grid_optimizer(optimize_combined_momentum),
+    "macd_trend": _grid_optimizer(optimize_macd_trend),
+    "bollinger_reversion": _grid_optimizer(optimize_bollinger_reversion),
+}
+
+
+def main() -> None:
     parser = argparse.ArgumentParser(description="Оптимизация параметров стратегий.")
     parser.add_argument(
         "--strategy",
         required=True,
-        choices=["mean_reversion", "carry_momentum", "momentum_breakout", "combined_momentum", "macd_trend", "bollinger_reversion"],
+        choices=list(_OPTIMIZERS),
         help="Стратегия для оптимизации.",
     )
     parser.add_argument(
@@ -496,7 +616,7 @@ def main() -> None:
         "--n-jobs",
         type=int,
         default=12,
-        help="Количество параллельных процессов для оптимизации (по умолчанию 12 для ускорения).",
+        help="Количество параллельных процессов для оптимизации (по умолчанию 12 для ускорения, -1 = все ядра).",
     )
     parser.add_argument(
         "--save-all-results",
@@ -519,6 +639,30 @@ def main() -> None:
         action="store_true",
         help="Использовать быстрый режим генетической оптимизации (меньше поколений и популяция, только с --use-genetic).",
     )
+    parser.add_argument(
+        "--sobol-m",
+        type=int,
+        default=9,
+        help="Проверять 2**m комбинаций сетки из последовательности Соболя (mean_reversion, carry_momentum; по умолчанию 9 = 512).",
+    )
+    parser.add_argument(
+        "--full-grid",
+        action="store_true",
+        help="Полный перебор сетки вместо выборки Соболя (mean_reversion, carry_momentum).",
+    )
+    parser.add_argument(
+        "--search",
+        choices=["grid", "tpe", "halving"],
+        default="grid",
+        help="Способ поиска по сетке: grid — перебор (или выборка Соболя), tpe — сэмплер TPE из Optuna, "
+             "halving — отсев на укороченной истории (successive halving); кроме --use-genetic.",
+    )
+    parser.add_argument(
+        "--n-trials",
+        type=int,
+        default=50,
+        help="Количество испытаний для --search tpe.",
+    )
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -531,38 +675,21 @@ def main() -> None:
 
     runner = FullBacktestRunner()
 
-    if args.strategy == "mean_reversion":
-        result = optimize_mean_reversion(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    elif args.strategy == "carry_momentum":
-        if args.use_genetic:
-            result = optimize_carry_momentum_genetic(runner, args.instrument, args.period, args.n_jobs, args.fast_mode)
-        else:
-            result = optimize_carry_momentum(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    elif args.strategy == "momentum_breakout":
-        result = optimize_momentum_breakout(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    elif args.strategy == "combined_momentum":
-        result = optimize_combined_momentum(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    elif args.strategy == "macd_trend":
-        result = optimize_macd_trend(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    elif args.strategy == "bollinger_reversion":
-        result = optimize_bollinger_reversion(runner, args.instrument, args.period, args.n_jobs, args.early_stopping_threshold)
-    else:
-        raise ValueError(f"Неизвестная стратегия: {args.strategy}")
+    result = _OPTIMIZERS[args.strategy](runner, args)
 
     # Сохраняем результаты
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / f"{args.strategy}_{args.instrument}_{args.period}.json"
-    optimizer = HyperparameterOptimizer(runner)
-    optimizer.save_best_params(result, output_path)
+    save_best_params(result, output_path)
     
     # Сохраняем все результаты если запрошено
     if args.save_all_results:
         all_results_path = output_dir / f"{args.strategy}_{args.instrument}_{args.period}_all_results.json"
-        optimizer.save_all_results(result, all_results_path)
+        save_all_results(result, all_results_path)
 
     logging.info("Оптимизация завершена. Лучшие параметры:")
-    logging.info("  %s", json.dumps(result.best_params, indent=2))
+    logging.info("  %s", _LazyJson(result.best_params))
     logging.info("  Score (%s): %.4f", result.optimization_metric, result.best_score)
     logging.info("  Всего протестировано комбинаций: %s", len(result.all_results))
 
@@ -4,7 +4,7 @@ import logging
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -12,9 +12,130 @@ import pandas as pd
 from src.data_pipeline.symbol_info import SymbolInfoCache
 from src.strategies import Signal, Strategy
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 log = logging.getLogger(__name__)
 
 
+# Коды причин, которые возвращает _trade_exit_loop (индексы в _EXIT_REASONS)
+_EXIT_REASONS = ("partial_close", "trailing_stop", "stop_loss", "take_profit")
+_PARTIAL_CLOSE, _TRAILING_STOP, _STOP_LOSS, _TAKE_PROFIT = range(4)
+
+
+def _trade_exit_loop(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    entry_price: float,
+    stop_loss: float,
+    take_profit: float,
+    is_long: bool,
+    initial_notional: float,
+    use_trailing_stop: bool,
+    trailing_stop_pct: float,
+    use_partial_close: bool,
+    partial_close_pct: float,
+    partial_close_at_pct: float,
+):
+    """
+    Проход по барам после входа до стопа или тейка (логика FullBacktestRunner._simulate_trade).
+
+    Возвращает (бар выхода или -1, цена выхода, код причины, финальный стоп, оставшийся
+    notional, бары / стопы / notional / коды изменений стопа для истории).
+    """
+    size = high.size
+    event_bars = np.empty(2 * size, dtype=np.int64)
+    event_stops = np.empty(2 * size)
+    event_notionals = np.empty(2 * size)
+    event_codes = np.empty(2 * size, dtype=np.int64)
+    events = 0
+
+    current_stop_loss = stop_loss
+    remaining_notional = initial_notional
+    partial_closed = False
+    trailing_stop_activated = False
+    exit_bar = -1
+    exit_price = 0.0
+    exit_code = -1
+
+    for index in range(size):
+        # Вычисляем текущую прибыль
+        if is_long:
+            current_profit_pct = (close[index] - entry_price) / entry_price
+            profit_to_take_pct = (take_profit - entry_price) / entry_price
+        else:
+            current_profit_pct = (entry_price - close[index]) / entry_price
+            profit_to_take_pct = (entry_price - take_profit) / entry_price
+
+        # Частичное закрытие при достижении partial_close_at_pct тейк-профита, стоп в безубыток
+        if use_partial_close and not partial_closed and profit_to_take_pct > 0:
+            if current_profit_pct >= profit_to_take_pct * partial_close_at_pct:
+                remaining_notional = initial_notional * (1 - partial_close_pct)
+                partial_closed = True
+                current_stop_loss = entry_price
+                event_bars[events] = index
+                event_stops[events] = current_stop_loss
+                event_notionals[events] = remaining_notional
+                event_codes[events] = _PARTIAL_CLOSE
+                events += 1
+
+        # Trailing stop: перемещаем стоп при движении в прибыль
+        if use_trailing_stop and current_profit_pct > 0:
+            if current_profit_pct >= profit_to_take_pct * trailing_stop_pct:
+                trailing_stop_activated = True
+                if is_long:
+                    trailing_stop_distance = (close[index] - entry_price) * (1 - trailing_stop_pct)
+                    new_stop = entry_price + trailing_stop_distance
+                    moved = new_stop > current_stop_loss
+                else:
+                    trailing_stop_distance = (entry_price - close[index]) * (1 - trailing_stop_pct)
+                    new_stop = entry_price - trailing_stop_distance
+                    moved = new_stop < current_stop_loss
+                if moved:
+                    current_stop_loss = new_stop
+                    event_bars[events] = index
+                    event_stops[events] = current_stop_loss
+                    event_notionals[events] = remaining_notional
+                    event_codes[events] = _TRAILING_STOP
+                    events += 1
+
+        # Проверяем стоп-лосс (включая trailing stop), затем тейк-профит
+        if (low[index] <= current_stop_loss) if is_long else (high[index] >= current_stop_loss):
+            exit_bar = index
+            exit_price = current_stop_loss
+            exit_code = _TRAILING_STOP if trailing_stop_activated else _STOP_LOSS
+            break
+        if (high[index] >= take_profit) if is_long else (low[index] <= take_profit):
+            exit_bar = index
+            exit_price = take_profit
+            exit_code = _TAKE_PROFIT
+            break
+
+    return (
+        exit_bar,
+        exit_price,
+        exit_code,
+        current_stop_loss,
+        remaining_notional,
+        event_bars[:events],
+        event_stops[:events],
+        event_notionals[:events],
+        event_codes[:events],
+    )
+
+
+if HAS_NUMBA:
+    # Цикл выхода проходит до 200 баров на каждую сделку каждого прогона оптимизации.
+    # error_model="numpy": деление как в NumPy-скалярах исходного цикла по строкам
+    _trade_exit = njit(cache=True, error_model="numpy")(_trade_exit_loop)
+else:
+    _trade_exit = _trade_exit_loop
+
+
 @dataclass(slots=True)
 class StopTakeHistoryEntry:
     """Запись истории изменения стоп-лосса или тейк-профита."""
@@ -92,9 +213,21 @@ class FullBacktestRunner:
         self.initial_capital = initial_capital
         self.commission_bps = commission_bps
         self.slippage_bps = slippage_bps
+        # Загруженные бары по (instrument, period): повторные run() на тех же данных
+        # (перебор параметров, визуализация после бэктеста) не читают parquet заново
+        self._data_cache: Dict[Tuple[str, str], pd.DataFrame] = {}
 
     def _load_data(self, instrument: str, period: str = "m15") -> pd.DataFrame:
-        """Загружает данные для инструмента."""
+        """
+        Загружает данные для инструмента (с кешированием в пределах runner).
+
+        Возвращаемый DataFrame общий для всех вызовов и не должен изменяться на месте.
+        """
+        key = (instrument, period)
+        cached = self._data_cache.get(key)
+        if cached is not None:
+            return cached
+        
         data_path = self.curated_dir / f"{instrument}_{period}.parquet"
         if not data_path.exists():
             raise FileNotFoundError(f"Данные не найдены: {data_path}")
@@ -102,8 +235,14 @@ class FullBacktestRunner:
         df = pd.read_parquet(data_path)
         df["utc_time"] = pd.to_datetime(df["utc_time"])
         df = df.set_index("utc_time").sort_index()
+        self._data_cache[key] = df
         return df
 
+    def data_fingerprint(self, instrument: str, period: str = "m15") -> str:
+        """Версия данных инструмента: число баров и время последнего бара (меняется при обновлении данных)."""
+        df = self._load_data(instrument, period)
+        return f"{len(df)}:{df.index[-1].isoformat()}"
+
     def run(
         self,
         strategy: Strategy,
@@ -116,13 +255,7 @@ class FullBacktestRunner:
         Запускает полный бэктест стратегии на исторических данных.
         """
         # Загружаем данные
-        data_path = self.curated_dir / f"{instrument}_{period}.parquet"
-        if not data_path.exists():
-            raise FileNotFoundError(f"Данные не найдены: {data_path}")
-
-        df = pd.read_parquet(data_path)
-        df["utc_time"] = pd.to_datetime(df["utc_time"])
-        df = df.set_index("utc_time").sort_index()
+        df = self._load_data(instrument, period)
 
         # Фильтруем по датам
         if start_date:
@@ -141,20 +274,19 @@ class FullBacktestRunner:
         window_size = 500
         step_size = 50  # Шаг для генерации сигналов
 
+        # Колонку instrument и индекс по времени готовим один раз на весь прогон, а не на каждое окно:
+        # окна ниже — срезы без копирования (стратегии не изменяют переданный DataFrame).
+        # Индикаторы окна при этом считаются один раз на настройку индикаторов: compute_features
+        # кэширует их по содержимому окна, так что варианты порогов в оптимизации переиспользуют расчет
+        frame = df
+        if "instrument" not in frame.columns:
+            frame = frame.assign(instrument=frame["symbol"] if "symbol" in frame.columns else instrument)
+        if not isinstance(frame.index, pd.DatetimeIndex) and "utc_time" in frame.columns:
+            frame = frame.set_index("utc_time")
+
         i = window_size
         while i < len(df):
-            window_df = df.iloc[i - window_size : i].copy()
-            # Убеждаемся, что есть колонка instrument
-            if "instrument" not in window_df.columns:
-                if "symbol" in window_df.columns:
-                    window_df["instrument"] = window_df["symbol"]
-                else:
-                    window_df["instrument"] = instrument
-            
-            # Убеждаемся, что индекс - это время
-            if not isinstance(window_df.index, pd.DatetimeIndex):
-                if "utc_time" in window_df.columns:
-                    window_df = window_df.set_index("utc_time")
+            window_df = frame.iloc[i - window_size : i]
 
             try:
                 signals = strategy.generate_signals(window_df)
@@ -203,12 +335,6 @@ class FullBacktestRunner:
         direction = signal.direction
         initial_notional = signal.notional
         
-        # Текущие значения для trailing stop и partial close
-        current_stop_loss = initial_stop_loss
-        remaining_notional = initial_notional
-        partial_closed = False
-        trailing_stop_activated = False
-        
         # История изменений стоп-лоссов и тейк-профитов
         stop_take_history: List[StopTakeHistoryEntry] = []
         # Добавляем начальное состояние
@@ -220,130 +346,52 @@ class FullBacktestRunner:
             reason="entry"
         ))
 
-        # Ищем точку выхода (стоп или тейк)
-        exit_time = None
-        exit_price = None
-        exit_reason = None
-
-        for idx, row in search_data.iterrows():
-            high = row["high"]
-            low = row["low"]
-            close = row["close"]
-
-            if direction == "LONG":
-                # Вычисляем текущую прибыль
-                current_profit_pct = (close - entry_price) / entry_price
-                profit_to_take_pct = (take_profit - entry_price) / entry_price
-                
-                # Частичное закрытие при достижении 50% тейк-профита
-                if use_partial_close and not partial_closed and profit_to_take_pct > 0:
-                    if current_profit_pct >= profit_to_take_pct * partial_close_at_pct:
-                        # Закрываем часть позиции
-                        remaining_notional = initial_notional * (1 - partial_close_pct)
-                        partial_closed = True
-                        # Перемещаем стоп в безубыток после частичного закрытия
-                        current_stop_loss = entry_price
-                        # Сохраняем изменение в историю
-                        stop_take_history.append(StopTakeHistoryEntry(
-                            timestamp=idx,
-                            stop_loss=current_stop_loss,
-                            take_profit=take_profit,
-                            notional=remaining_notional,
-                            reason="partial_close"
-                        ))
-                
-                # Trailing stop: перемещаем стоп при движении в прибыль
-                if use_trailing_stop:
-                    if current_profit_pct > 0:
-                        # Активируем trailing stop при достижении определенного процента прибыли
-                        if current_profit_pct >= profit_to_take_pct * trailing_stop_pct:
-                            trailing_stop_activated = True
-                            # Перемещаем стоп на определенный процент от текущей прибыли
-                            trailing_stop_distance = (close - entry_price) * (1 - trailing_stop_pct)
-                            new_stop = entry_price + trailing_stop_distance
-                            if new_stop > current_stop_loss:
-                                current_stop_loss = new_stop
-                                # Сохраняем изменение в историю
-                                stop_take_history.append(StopTakeHistoryEntry(
-                                    timestamp=idx,
-                                    stop_loss=current_stop_loss,
-                                    take_profit=take_profit,
-                                    notional=remaining_notional,
-                                    reason="trailing_stop"
-                                ))
-                
-                # Проверяем стоп-лосс (включая trailing stop)
-                if low <= current_stop_loss:
-                    exit_time = idx
-                    exit_price = current_stop_loss
-                    exit_reason = "stop_loss" if not trailing_stop_activated else "trailing_stop"
-                    break
-                # Проверяем тейк-профит
-                if high >= take_profit:
-                    exit_time = idx
-                    exit_price = take_profit
-                    exit_reason = "take_profit"
-                    break
-            else:  # SHORT
-                # Вычисляем текущую прибыль
-                current_profit_pct = (entry_price - close) / entry_price
-                profit_to_take_pct = (entry_price - take_profit) / entry_price
-                
-                # Частичное закрытие при достижении 50% тейк-профита
-                if use_partial_close and not partial_closed and profit_to_take_pct > 0:
-                    if current_profit_pct >= profit_to_take_pct * partial_close_at_pct:
-                        # Закрываем часть позиции
-                        remaining_notional = initial_notional * (1 - partial_close_pct)
-                        partial_closed = True
-                        # Перемещаем стоп в безубыток после частичного закрытия
-                        current_stop_loss = entry_price
-                        # Сохраняем изменение в историю
-                        stop_take_history.append(StopTakeHistoryEntry(
-                            timestamp=idx,
-                            stop_loss=current_stop_loss,
-                            take_profit=take_profit,
-                            notional=remaining_notional,
-                            reason="partial_close"
-                        ))
-                
-                # Trailing stop: перемещаем стоп при движении в прибыль
-                if use_trailing_stop:
-                    if current_profit_pct > 0:
-                        # Активируем trailing stop при достижении определенного процента прибыли
-                        if current_profit_pct >= profit_to_take_pct * trailing_stop_pct:
-                            trailing_stop_activated = True
-                            # Перемещаем стоп на определенный процент от текущей прибыли
-                            trailing_stop_distance = (entry_price - close) * (1 - trailing_stop_pct)
-                            new_stop = entry_price - trailing_stop_distance
-                            if new_stop < current_stop_loss:
-                                current_stop_loss = new_stop
-                                # Сохраняем изменение в историю
-                                stop_take_history.append(StopTakeHistoryEntry(
-                                    timestamp=idx,
-                                    stop_loss=current_stop_loss,
-                                    take_profit=take_profit,
-                                    notional=remaining_notional,
-                                    reason="trailing_stop"
-                                ))
-                
-                # Проверяем стоп-лосс (включая trailing stop)
-                if high >= current_stop_loss:
-                    exit_time = idx
-                    exit_price = current_stop_loss
-                    exit_reason = "stop_loss" if not trailing_stop_activated else "trailing_stop"
-                    break
-                # Проверяем тейк-профит
-                if low <= take_profit:
-                    exit_time = idx
-                    exit_price = take_profit
-                    exit_reason = "take_profit"
-                    break
+        # Ищем точку выхода (стоп или тейк) по массивам баров (см. _trade_exit_loop)
+        (
+            exit_bar,
+            exit_price,
+            exit_code,
+            current_stop_loss,
+            remaining_notional,
+            event_bars,
+            event_stops,
+            event_notionals,
+            event_codes,
+        ) = _trade_exit(
+            np.ascontiguousarray(search_data["high"].to_numpy(), dtype=np.float64),
+            np.ascontiguousarray(search_data["low"].to_numpy(), dtype=np.float64),
+            np.ascontiguousarray(search_data["close"].to_numpy(), dtype=np.float64),
+            float(entry_price),
+            float(initial_stop_loss),
+            float(take_profit),
+            direction == "LONG",
+            float(initial_notional),
+            use_trailing_stop,
+            float(trailing_stop_pct),
+            use_partial_close,
+            float(partial_close_pct),
+            float(partial_close_at_pct),
+        )
+        partial_closed = bool((event_codes == _PARTIAL_CLOSE).any())
+
+        for bar, stop, notional, code in zip(event_bars.tolist(), event_stops.tolist(), event_notionals.tolist(), event_codes.tolist()):
+            # Сохраняем изменение в историю
+            stop_take_history.append(StopTakeHistoryEntry(
+                timestamp=search_data.index[bar],
+                stop_loss=stop,
+                take_profit=take_profit,
+                notional=notional,
+                reason=_EXIT_REASONS[code]
+            ))
 
         # Если не нашли выхода, используем последнюю цену
-        if exit_time is None:
+        if exit_bar < 0:
             exit_time = search_data.index[-1]
             exit_price = search_data.iloc[-1]["close"]
             exit_reason = "timeout"
+        else:
+            exit_time = search_data.index[exit_bar]
+            exit_reason = _EXIT_REASONS[exit_code]
         
         # Добавляем финальное состояние в историю
         stop_take_history.append(StopTakeHistoryEntry(
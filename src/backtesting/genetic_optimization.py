@@ -19,7 +19,7 @@ except ImportError:
     HAS_DEAP = False
 
 from src.backtesting.full_backtest import FullBacktestRunner
-from src.backtesting.optimization import OptimizationResult, _evaluate_params, _hash_params
+from src.backtesting.optimization import OptimizationResult, _evaluate_params, _hash_params, cache_context, resolve_n_jobs
 from src.strategies import Strategy
 
 log = logging.getLogger(__name__)
@@ -35,6 +35,7 @@ def _evaluate_individual_parallel(
     start_date: Optional[str],
     end_date: Optional[str],
     cache_dir: str,
+    cache_context: Optional[Dict] = None,
 ) -> tuple[List, float]:
     """
     Вспомогательная функция для параллельной оценки индивида.
@@ -50,6 +51,7 @@ def _evaluate_individual_parallel(
         start_date: Начальная дата (строка)
         end_date: Конечная дата (строка)
         cache_dir: Путь к директории кэша (строка)
+        cache_context: Общая часть ключа кэша (см. optimization.cache_context)
     
     Returns:
         (individual_list, score)
@@ -57,7 +59,7 @@ def _evaluate_individual_parallel(
     individual_list, params = individual_data
     
     # Проверяем кэш
-    cache_path = Path(cache_dir) / f"{_hash_params(params, instrument, period, optimization_metric)}.json"
+    cache_path = Path(cache_dir) / f"{_hash_params(params, instrument, period, optimization_metric, start_date, end_date, cache_context)}.json"
     if cache_path.exists():
         try:
             with cache_path.open("r", encoding="utf-8") as fp:
@@ -96,6 +98,7 @@ def _evaluate_wrapper_for_deap(
     start_date_str: Optional[str],
     end_date_str: Optional[str],
     cache_dir_str: str,
+    cache_context: Optional[Dict] = None,
 ) -> tuple[float]:
     """
     Обертка для параллельной оценки индивида в DEAP.
@@ -115,6 +118,7 @@ def _evaluate_wrapper_for_deap(
         start_date=start_date_str,
         end_date=end_date_str,
         cache_dir=cache_dir_str,
+        cache_context=cache_context,
     )
     return (score,)
 
@@ -237,12 +241,21 @@ class GeneticOptimizer:
         optimization_metric: str,
         start_date: Optional[datetime],
         end_date: Optional[datetime],
+        cache_context: Optional[Dict] = None,
     ) -> tuple[float]:
         """Оценивает фитнес индивида."""
         params = self._individual_to_params(individual)
         
         # Проверяем in-memory кэш сначала (быстрее чем файловый)
-        cache_key = _hash_params(params, instrument, period, optimization_metric)
+        cache_key = _hash_params(
+            params,
+            instrument,
+            period,
+            optimization_metric,
+            start_date.isoformat() if start_date else None,
+            end_date.isoformat() if end_date else None,
+            cache_context,
+        )
         if cache_key in self._memory_cache:
             return (self._memory_cache[cache_key],)
         
@@ -322,12 +335,13 @@ class GeneticOptimizer:
             optimization_metric: Метрика для оптимизации
             start_date: Начальная дата
             end_date: Конечная дата
-            n_jobs: Количество параллельных процессов (12 по умолчанию для ускорения)
+            n_jobs: Количество параллельных процессов (12 по умолчанию для ускорения, -1 = все ядра)
             strategy_factory_name: Имя стратегии для сериализации (если None, будет определено автоматически)
         
         Returns:
             OptimizationResult с лучшими параметрами и всеми результатами
         """
+        n_jobs = resolve_n_jobs(n_jobs)
         # Очищаем in-memory кэш перед началом оптимизации
         self._memory_cache.clear()
         
@@ -338,6 +352,9 @@ class GeneticOptimizer:
             test_strategy = strategy_factory(test_params)
             strategy_factory_name = test_strategy.strategy_id
         
+        # Общая часть ключей кэша оценок (стратегия, версия данных, издержки)
+        context = cache_context(self.runner, strategy_factory_name, instrument, period)
+        
         # Вычисляем даты для быстрой оценки если нужно
         fast_start_date = None
         fast_end_date = end_date
@@ -389,6 +406,7 @@ class GeneticOptimizer:
                 start_date_str=start_date_str,
                 end_date_str=end_date_str,
                 cache_dir_str=cache_dir_str,
+                cache_context=context,
             )
             
             # Используем ProcessPoolExecutor для параллельной оценки
@@ -458,15 +476,14 @@ class GeneticOptimizer:
                     # Промежуточное сохранение результатов после каждого поколения
                     if intermediate_save_path:
                         try:
-                            from src.backtesting.optimization import HyperparameterOptimizer
+                            from src.backtesting.optimization import save_all_results
                             temp_result = OptimizationResult(
                                 best_params=best_params or {},
                                 best_score=best_score if best_score != float("-inf") else 0.0,
                                 all_results=all_results.copy(),
                                 optimization_metric=optimization_metric,
                             )
-                            optimizer_temp = HyperparameterOptimizer(self.runner)
-                            optimizer_temp.save_all_results(temp_result, intermediate_save_path)
+                            save_all_results(temp_result, intermediate_save_path)
                             log.debug("Промежуточные результаты сохранены: поколение %s/%s, комбинаций: %s", 
                                     gen + 1, self.n_generations, len(all_results))
                         except Exception as e:
@@ -520,6 +537,7 @@ class GeneticOptimizer:
                                 start_date_str=eval_start_date_str,
                                 end_date_str=end_date_str,
                                 cache_dir_str=cache_dir_str,
+                                cache_context=context,
                             )
                         fitnesses = list(self.toolbox.map(self.toolbox.evaluate, invalid_ind))
                         for ind, fit in zip(invalid_ind, fitnesses):
@@ -544,6 +562,7 @@ class GeneticOptimizer:
                 optimization_metric=optimization_metric,
                 start_date=start_date,
                 end_date=end_date,
+                cache_context=context,
             )
             self.toolbox.register("map", map)
             
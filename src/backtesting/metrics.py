@@ -0,0 +1,120 @@
+"""
+Метрики бэктеста по массивам PnL сделок.
+
+Формулы совпадают с FullBacktestRunner._build_result. Если установлена numba,
+циклические версии компилируются в машинный код (cache=True сохраняет результат
+компиляции между запусками); без нее используются эквивалентные версии на NumPy.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _equity_curve_loop(net_pnl: np.ndarray, initial_capital: float) -> np.ndarray:
+    equity = np.empty(net_pnl.size + 1)
+    equity[0] = initial_capital
+    for index in range(net_pnl.size):
+        balance = equity[index] + net_pnl[index]
+        equity[index + 1] = balance if balance > 0.0 else 0.0
+    return equity
+
+
+def _max_drawdown_loop(equity: np.ndarray) -> float:
+    peak = equity[0]
+    max_drawdown = 0.0
+    for value in equity:
+        if value > peak:
+            peak = value
+        drawdown = (value - peak) / peak
+        if drawdown < max_drawdown:
+            max_drawdown = drawdown
+    return max_drawdown
+
+
+def _sharpe_ratio_loop(equity: np.ndarray, periods: float) -> float:
+    # Доходности как в pct_change().dropna(): nan пропускаются, inf делает std неопределенным
+    count = 0
+    total = 0.0
+    for index in range(equity.size - 1):
+        value = (equity[index + 1] - equity[index]) / equity[index]
+        if np.isnan(value):
+            continue
+        if np.isinf(value):
+            return 0.0
+        count += 1
+        total += value
+    if count < 2:
+        return 0.0
+    mean = total / count
+    squares = 0.0
+    for index in range(equity.size - 1):
+        value = (equity[index + 1] - equity[index]) / equity[index]
+        if not np.isnan(value):
+            squares += (value - mean) ** 2
+    std = np.sqrt(squares / (count - 1))
+    if std <= 0.0:
+        return 0.0
+    return np.sqrt(periods) * mean / std
+
+
+def _equity_curve_numpy(net_pnl: np.ndarray, initial_capital: float) -> np.ndarray:
+    equity = initial_capital + np.concatenate(([0.0], np.cumsum(net_pnl)))
+    if (equity < 0).any():
+        # Баланс обнулялся: дальнейшая кривая зависит от пола в 0, считаем последовательно
+        return _equity_curve_loop(net_pnl, initial_capital)
+    return equity
+
+
+def _max_drawdown_numpy(equity: np.ndarray) -> float:
+    peak = np.maximum.accumulate(equity)
+    return float(((equity - peak) / peak).min())
+
+
+def _sharpe_ratio_numpy(equity: np.ndarray, periods: float) -> float:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(equity) / equity[:-1]
+        returns = returns[~np.isnan(returns)]
+        std = returns.std(ddof=1) if returns.size > 1 else 0.0
+    if not std > 0:
+        return 0.0
+    return float(np.sqrt(periods) * returns.mean() / std)
+
+
+if HAS_NUMBA:
+    # fastmath не используется: nan/inf в доходностях должны обрабатываться как в pandas,
+    # а error_model="numpy" дает nan/inf при делении на нулевой баланс вместо ZeroDivisionError.
+    # Явные сигнатуры компилируют функции при импорте (из кэша, если он есть), а не
+    # при первом вызове; обертки ниже всегда передают float64 C-contiguous массивы
+    # (read-only — при copy-on-write в pandas)
+    _ARRAY = "Array(float64, 1, 'C', readonly=True)"
+    _equity_curve = njit(["f8[:](f8[::1], f8)", f"f8[:]({_ARRAY}, f8)"],
+                         cache=True, error_model="numpy")(_equity_curve_loop)
+    _max_drawdown = njit(["f8(f8[::1])", f"f8({_ARRAY})"],
+                         cache=True, error_model="numpy")(_max_drawdown_loop)
+    _sharpe_ratio = njit(["f8(f8[::1], f8)", f"f8({_ARRAY}, f8)"],
+                         cache=True, error_model="numpy")(_sharpe_ratio_loop)
+else:
+    _equity_curve = _equity_curve_numpy
+    _max_drawdown = _max_drawdown_numpy
+    _sharpe_ratio = _sharpe_ratio_numpy
+
+
+def equity_curve(net_pnl: np.ndarray, initial_capital: float) -> np.ndarray:
+    """Кривая капитала после каждой сделки (баланс не уходит ниже нуля)."""
+    return _equity_curve(np.ascontiguousarray(net_pnl, dtype=np.float64), float(initial_capital))
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Максимальная просадка кривой капитала (отрицательная доля от пика)."""
+    return float(_max_drawdown(np.ascontiguousarray(equity, dtype=np.float64)))
+
+
+def sharpe_ratio(equity: np.ndarray, periods: float = 252.0) -> float:
+    """Годовой Sharpe по доходностям кривой капитала между сделками."""
+    return float(_sharpe_ratio(np.ascontiguousarray(equity, dtype=np.float64), float(periods)))
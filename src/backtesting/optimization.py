@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import atexit
 import logging
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field
 from datetime import datetime
 from hashlib import md5
@@ -9,29 +11,208 @@ from itertools import product
 from typing import Callable, Dict, List, Optional
 
 import json
+import math
+import os
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
 try:
     from tqdm import tqdm
     HAS_TQDM = True
 except ImportError:
     HAS_TQDM = False
 
+try:
+    import optuna
+    HAS_OPTUNA = True
+except ImportError:
+    HAS_OPTUNA = False
+
 from src.backtesting.full_backtest import FullBacktestResult, FullBacktestRunner
+from src import strategies
 from src.strategies import Strategy
+from src.utils.json_io import write_json
 
 log = logging.getLogger(__name__)
 
 
-def _hash_params(params: Dict, instrument: str, period: str, optimization_metric: str) -> str:
-    """Создает хэш для комбинации параметров."""
-    key = json.dumps({
+# Стратегии, которые воркеры создают по имени (имя класса в src.strategies)
+STRATEGY_CLASSES: Dict[str, str] = {
+    "momentum_breakout": "MomentumBreakoutStrategy",
+    "carry_momentum": "CarryMomentumStrategy",
+    "mean_reversion": "MeanReversionStrategy",
+    "combined_momentum": "CombinedMomentumStrategy",
+    "macd_trend": "MACDTrendStrategy",
+    "bollinger_reversion": "BollingerReversionStrategy",
+}
+
+
+def strategy_class(strategy_name: str) -> type:
+    """Класс стратегии по имени из STRATEGY_CLASSES; импортирует только модуль этой стратегии."""
+    class_name = STRATEGY_CLASSES.get(strategy_name)
+    if class_name is None:
+        raise ValueError(f"Неизвестная стратегия: {strategy_name}")
+    return getattr(strategies, class_name)
+
+
+def _hash_params(
+    params: Dict,
+    instrument: str,
+    period: str,
+    optimization_metric: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    context: Optional[Dict] = None,
+) -> str:
+    """
+    Создает хэш для комбинации параметров.
+
+    Границы периода (ISO-строки) входят в ключ, только если заданы, поэтому оценки
+    на части истории не подменяют оценки на всех данных. context — общая для всех
+    комбинаций часть ключа (см. cache_context).
+    """
+    key = {
         "params": params,
         "instrument": instrument,
         "period": period,
         "optimization_metric": optimization_metric,
-    }, sort_keys=True)
-    return md5(key.encode("utf-8")).hexdigest()
+    }
+    if start_date is not None:
+        key["start_date"] = start_date
+    if end_date is not None:
+        key["end_date"] = end_date
+    if context is not None:
+        key["context"] = context
+    return md5(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cache_context(runner: FullBacktestRunner, strategy_name: str, instrument: str, period: str) -> Dict:
+    """
+    Часть ключа кэша оценок, не зависящая от параметров: стратегия, версия данных и издержки runner.
+
+    Без нее одинаковые параметры разных стратегий делили бы запись кэша, а после
+    обновления данных или изменения комиссий использовались бы устаревшие оценки.
+    """
+    return {
+        "strategy": strategy_name,
+        "data": runner.data_fingerprint(instrument, period),
+        "initial_capital": runner.initial_capital,
+        "commission_bps": runner.commission_bps,
+        "slippage_bps": runner.slippage_bps,
+    }
+
+
+def results_summary_path(all_results_path: Path) -> Path:
+    """Путь сводки (без массива all_results) рядом с файлом all_results."""
+    return all_results_path.with_name(all_results_path.stem + "_summary.json")
+
+
+def results_table_path(all_results_path: Path) -> Path:
+    """Путь колоночной таблицы результатов (параметры + score) рядом с файлом all_results."""
+    return all_results_path.with_suffix(".parquet")
+
+
+# Runner'ы рабочего процесса по конфигурации: задачи одного процесса переиспользуют
+# загруженный кеш символов и бары (FullBacktestRunner кеширует данные по инструменту/периоду)
+_WORKER_RUNNERS: Dict[str, FullBacktestRunner] = {}
+
+
+def _worker_runner(runner_config: Dict) -> FullBacktestRunner:
+    """Возвращает runner текущего процесса для runner_config, создавая его при первом обращении."""
+    key = json.dumps(runner_config, sort_keys=True)
+    runner = _WORKER_RUNNERS.get(key)
+    if runner is None:
+        # verbose_cache_load=False чтобы не засорять логи при параллельной обработке
+        runner = FullBacktestRunner(
+            curated_dir=Path(runner_config["curated_dir"]),
+            symbol_info_path=Path(runner_config["symbol_info_path"]),
+            initial_capital=runner_config["initial_capital"],
+            commission_bps=runner_config["commission_bps"],
+            slippage_bps=runner_config["slippage_bps"],
+            verbose_cache_load=False,  # Отключаем логирование загрузки кэша в параллельных процессах
+        )
+        _WORKER_RUNNERS[key] = runner
+    return runner
+
+
+def sobol_param_list(param_grid: Dict[str, List], m: int, seed: int = 0) -> List[Dict]:
+    """
+    Квазислучайная выборка из 2**m комбинаций сетки param_grid (последовательность Соболя).
+
+    Каждая координата точки выбирает одно из значений параметра, поэтому комбинации
+    остаются узлами сетки (целые параметры не становятся дробными), но равномерно
+    покрывают ее без перебора всех произведений. Повторы отбрасываются; если сетка
+    не больше выборки, возвращается вся сетка.
+    """
+    param_names = list(param_grid.keys())
+    param_values = list(param_grid.values())
+    sizes = np.array([len(values) for values in param_values])
+    if math.prod(sizes.tolist()) <= 2 ** m:
+        return [dict(zip(param_names, combo)) for combo in product(*param_values)]
+
+    from scipy.stats.qmc import Sobol
+
+    points = Sobol(d=len(param_names), seed=seed).random_base2(m=m)
+    levels = np.minimum((points * sizes).astype(np.int64), sizes - 1)
+    return [
+        {name: values[level] for name, values, level in zip(param_names, param_values, row)}
+        for row in dict.fromkeys(map(tuple, levels.tolist()))
+    ]
+
+
+def _suggest_grid_value(trial, name: str, values: List):
+    """
+    Значение параметра name из сетки values для испытания Optuna.
+
+    Для упорядоченной числовой сетки TPE выбирает индекс узла (suggest_int), а не само
+    значение: suggest_float со шагом из np.diff (0.30000000000000004 и т.п.) отрезал бы
+    верхние узлы диапазона. Так достижим каждый узел и сохраняется порядок значений.
+    """
+    numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+    if numeric and len(values) > 2 and (np.diff(values) > 0).all():
+        return values[trial.suggest_int(name, 0, len(values) - 1)]
+    return trial.suggest_categorical(name, values)
+
+
+# Минимальная длина укороченного этапа successive halving, баров (окно сигналов runner — 500 баров)
+HALVING_MIN_BARS = 2000
+
+
+# Пул процессов, общий для всех вызовов optimize(): этапы двухэтапной оптимизации и
+# оптимизации подряд на тех же данных попадают в уже запущенные процессы, где
+# runner из _WORKER_RUNNERS хранит загруженные бары, вместо запуска новых процессов
+# и повторного чтения parquet
+_SHARED_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_SHARED_EXECUTOR_JOBS = 0
+
+
+def resolve_n_jobs(n_jobs: int) -> int:
+    """Число процессов для n_jobs: значения < 1 (например, -1, как в joblib) — все ядра."""
+    if n_jobs < 1:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def shared_executor(n_jobs: int) -> ProcessPoolExecutor:
+    """Возвращает общий пул из n_jobs процессов, создавая его при первом обращении."""
+    global _SHARED_EXECUTOR, _SHARED_EXECUTOR_JOBS
+    if _SHARED_EXECUTOR is None or _SHARED_EXECUTOR_JOBS != n_jobs:
+        shutdown_shared_executor()
+        _SHARED_EXECUTOR = ProcessPoolExecutor(max_workers=n_jobs)
+        _SHARED_EXECUTOR_JOBS = n_jobs
+    return _SHARED_EXECUTOR
+
+
+@atexit.register
+def shutdown_shared_executor() -> None:
+    """Останавливает общий пул процессов (следующий shared_executor создаст новый)."""
+    global _SHARED_EXECUTOR, _SHARED_EXECUTOR_JOBS
+    if _SHARED_EXECUTOR is not None:
+        _SHARED_EXECUTOR.shutdown(wait=True)
+        _SHARED_EXECUTOR = None
+        _SHARED_EXECUTOR_JOBS = 0
 
 
 def _evaluate_params(
@@ -57,42 +238,11 @@ def _evaluate_params(
         start_dt = dt.fromisoformat(start_date) if start_date else None
         end_dt = dt.fromisoformat(end_date) if end_date else None
         
-        # Создаем runner в каждом процессе
-        # verbose_cache_load=False чтобы не засорять логи при параллельной обработке
-        runner = FullBacktestRunner(
-            curated_dir=Path(runner_config["curated_dir"]),
-            symbol_info_path=Path(runner_config["symbol_info_path"]),
-            initial_capital=runner_config["initial_capital"],
-            commission_bps=runner_config["commission_bps"],
-            slippage_bps=runner_config["slippage_bps"],
-            verbose_cache_load=False,  # Отключаем логирование загрузки кэша в параллельных процессах
-        )
-        
-        # Импортируем стратегии
-        from src.strategies import (
-            BollingerReversionStrategy,
-            CarryMomentumStrategy,
-            CombinedMomentumStrategy,
-            MACDTrendStrategy,
-            MeanReversionStrategy,
-            MomentumBreakoutStrategy,
-        )
+        # Runner создается один раз на процесс и переиспользуется между задачами
+        runner = _worker_runner(runner_config)
         
         # Создаем стратегию на основе имени
-        strategy_map = {
-            "momentum_breakout": MomentumBreakoutStrategy,
-            "carry_momentum": CarryMomentumStrategy,
-            "mean_reversion": MeanReversionStrategy,
-            "combined_momentum": CombinedMomentumStrategy,
-            "macd_trend": MACDTrendStrategy,
-            "bollinger_reversion": BollingerReversionStrategy,
-        }
-        
-        strategy_class = strategy_map.get(strategy_factory_name)
-        if strategy_class is None:
-            raise ValueError(f"Неизвестная стратегия: {strategy_factory_name}")
-        
-        strategy = strategy_class(**params)
+        strategy = strategy_class(strategy_factory_name)(**params)
         result = runner.run(strategy, instrument, period, start_dt, end_dt)
         
         # Проверяем валидность результата перед использованием Recovery Factor
@@ -159,6 +309,7 @@ class HyperparameterOptimizer:
         n_jobs: int = 1,
         early_stopping_threshold: Optional[float] = None,
         stage_info: Optional[str] = None,  # Информация об этапе для логирования (например, "Этап 1/2")
+        param_list: Optional[List[Dict]] = None,
     ) -> OptimizationResult:
         """
         Выполняет grid search оптимизацию параметров.
@@ -171,13 +322,19 @@ class HyperparameterOptimizer:
             optimization_metric: Метрика для оптимизации (sharpe_ratio, recovery_factor, net_pnl, profit_factor)
             start_date: Начальная дата
             end_date: Конечная дата
-            n_jobs: Количество параллельных процессов (1 = последовательное выполнение)
+            n_jobs: Количество параллельных процессов (1 = последовательное выполнение, -1 = все ядра)
             early_stopping_threshold: Порог для раннего прекращения (если результат < threshold * best_score, пропускаем)
+            param_list: Комбинации для проверки вместо полного перебора param_grid
+                (например, sobol_param_list); ключи — параметры param_grid
         """
-        # Генерируем все комбинации параметров
+        n_jobs = resolve_n_jobs(n_jobs)
         param_names = list(param_grid.keys())
-        param_values = list(param_grid.values())
-        param_combinations = list(product(*param_values))
+        if param_list is not None:
+            param_combinations = [tuple(params[name] for name in param_names) for params in param_list]
+        else:
+            # Генерируем все комбинации параметров
+            param_values = list(param_grid.values())
+            param_combinations = list(product(*param_values))
 
         log.info("Начинаем оптимизацию: %s комбинаций параметров (n_jobs=%s)", len(param_combinations), n_jobs)
 
@@ -196,6 +353,9 @@ class HyperparameterOptimizer:
                 log.warning("Не удалось определить имя стратегии, используем 'unknown'")
                 strategy_name = "unknown"
         
+        # Общая часть ключей кэша оценок (стратегия, версия данных, издержки)
+        context = cache_context(self.runner, strategy_name, instrument, period)
+
         # Подготавливаем конфигурацию runner для передачи в процессы
         runner_config = {
             "curated_dir": str(self.runner.curated_dir),
@@ -205,6 +365,10 @@ class HyperparameterOptimizer:
             "slippage_bps": self.runner.slippage_bps,
         }
 
+        # Даты строками: для ключа кэша и для передачи в процессы
+        start_date_str = start_date.isoformat() if start_date else None
+        end_date_str = end_date.isoformat() if end_date else None
+
         all_results: List[tuple[Dict, float]] = []
         best_score = float("-inf")
         best_params = None
@@ -220,7 +384,9 @@ class HyperparameterOptimizer:
                 params = dict(zip(param_names, param_combo))
                 
                 # Проверяем кэш
-                cache_key = _hash_params(params, instrument, period, optimization_metric)
+                cache_key = _hash_params(
+                    params, instrument, period, optimization_metric, start_date_str, end_date_str, context
+                )
                 cache_path = self.cache_dir / f"{cache_key}.json" if self.cache_dir else None
                 
                 score = None
@@ -286,97 +452,99 @@ class HyperparameterOptimizer:
                     best_params = params
                     log.info("Новый лучший результат: %s = %.4f", optimization_metric, score)
         else:
-            # Параллельное выполнение
-            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
-                # Отправляем все задачи
-                futures = {}
-                for param_combo in param_combinations:
-                    params = dict(zip(param_names, param_combo))
-                    
-                    # Проверяем кэш перед отправкой задачи
-                    cache_key = _hash_params(params, instrument, period, optimization_metric)
-                    cache_path = self.cache_dir / f"{cache_key}.json" if self.cache_dir else None
-                    
-                    cached_score = None
-                    if cache_path and cache_path.exists():
-                        try:
-                            with cache_path.open("r", encoding="utf-8") as fp:
-                                cached_data = json.load(fp)
-                                cached_score = cached_data.get("score")
-                                if cached_score is not None:
-                                    cache_hits += 1
-                                    log.debug("Кэш попадание для параметров: %s (score=%.4f)", params, cached_score)
-                                    # Добавляем кэшированный результат сразу
-                                    all_results.append((params, cached_score))
-                                    if cached_score > best_score:
-                                        best_score = cached_score
-                                        best_params = params
-                                    continue
-                        except Exception:
-                            pass
-                    
-                    # Преобразуем datetime в строки для сериализации
-                    start_date_str = start_date.isoformat() if start_date else None
-                    end_date_str = end_date.isoformat() if end_date else None
-                    future = executor.submit(
-                        _evaluate_params,
-                        params,
-                        strategy_name,
-                        runner_config,
-                        instrument,
-                        period,
-                        optimization_metric,
-                        start_date_str,
-                        end_date_str,
-                    )
-                    futures[future] = (params, cache_path)
-
-                # Собираем результаты с прогресс-баром
-                iterator = as_completed(futures)
-                if HAS_TQDM:
-                    iterator = tqdm(iterator, total=len(futures), desc="Оптимизация")
+            # Параллельное выполнение в общем пуле процессов (см. shared_executor)
+            executor = shared_executor(n_jobs)
+            # Отправляем все задачи
+            futures = {}
+            for param_combo in param_combinations:
+                params = dict(zip(param_names, param_combo))
+                
+                # Проверяем кэш перед отправкой задачи
+                cache_key = _hash_params(
+                    params, instrument, period, optimization_metric, start_date_str, end_date_str, context
+                )
+                cache_path = self.cache_dir / f"{cache_key}.json" if self.cache_dir else None
                 
-                for future in iterator:
-                    params, cache_path = futures[future]
+                cached_score = None
+                if cache_path and cache_path.exists():
                     try:
-                        # Добавляем timeout чтобы процессы не зависали бесконечно
-                        result_params, score, error = future.result(timeout=300)  # 5 минут на одну комбинацию
-                    except TimeoutError:
-                        log.error("Таймаут при тестировании параметров %s (превышено 5 минут)", params)
-                        # Отменяем задачу и продолжаем
-                        future.cancel()
-                        continue
-                    except Exception as e:
-                        log.error("Ошибка при получении результата для параметров %s: %s", params, e)
-                        continue
-                    
-                    # Сохраняем в кэш
-                    if cache_path:
-                        try:
-                            with cache_path.open("w", encoding="utf-8") as fp:
-                                json.dump({"params": params, "score": float(score)}, fp, ensure_ascii=False, indent=2)
-                        except Exception:
-                            pass
-                    
-                    # Применяем раннее прекращение
-                    if early_stopping_threshold and best_score != float("-inf") and score < early_stopping_threshold * best_score:
-                        log.debug("Пропущен результат ниже порога: %.4f < %.4f * %.4f", 
-                                 score, early_stopping_threshold, best_score)
-                        continue
-                    
-                    all_results.append((params, score))
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_params = params
-                        log.info("Новый лучший результат: %s = %.4f", optimization_metric, score)
-                    
-                    # Промежуточное сохранение каждые 50 комбинаций (только для параллельного режима)
-                    if len(all_results) % 50 == 0:
-                        stage_prefix = f"{stage_info} - " if stage_info else ""
-                        log.info("%sПромежуточный прогресс: протестировано %s из %s комбинаций (%.1f%%)", 
-                                stage_prefix, len(all_results), len(futures), 
-                                len(all_results) / len(futures) * 100 if len(futures) > 0 else 0)
+                        with cache_path.open("r", encoding="utf-8") as fp:
+                            cached_data = json.load(fp)
+                            cached_score = cached_data.get("score")
+                            if cached_score is not None:
+                                cache_hits += 1
+                                log.debug("Кэш попадание для параметров: %s (score=%.4f)", params, cached_score)
+                                # Добавляем кэшированный результат сразу
+                                all_results.append((params, cached_score))
+                                if cached_score > best_score:
+                                    best_score = cached_score
+                                    best_params = params
+                                continue
+                    except Exception:
+                        pass
+                
+                future = executor.submit(
+                    _evaluate_params,
+                    params,
+                    strategy_name,
+                    runner_config,
+                    instrument,
+                    period,
+                    optimization_metric,
+                    start_date_str,
+                    end_date_str,
+                )
+                futures[future] = (params, cache_path)
+
+            # Собираем результаты с прогресс-баром
+            iterator = as_completed(futures)
+            if HAS_TQDM:
+                iterator = tqdm(iterator, total=len(futures), desc="Оптимизация")
+            
+            for future in iterator:
+                params, cache_path = futures[future]
+                try:
+                    # Добавляем timeout чтобы процессы не зависали бесконечно
+                    result_params, score, error = future.result(timeout=300)  # 5 минут на одну комбинацию
+                except TimeoutError:
+                    log.error("Таймаут при тестировании параметров %s (превышено 5 минут)", params)
+                    # Отменяем задачу и продолжаем
+                    future.cancel()
+                    continue
+                except Exception as e:
+                    log.error("Ошибка при получении результата для параметров %s: %s", params, e)
+                    if isinstance(e, BrokenProcessPool):
+                        # Процесс пула упал — следующая оптимизация запустит новый пул
+                        shutdown_shared_executor()
+                    continue
+                
+                # Сохраняем в кэш
+                if cache_path:
+                    try:
+                        with cache_path.open("w", encoding="utf-8") as fp:
+                            json.dump({"params": params, "score": float(score)}, fp, ensure_ascii=False, indent=2)
+                    except Exception:
+                        pass
+                
+                # Применяем раннее прекращение
+                if early_stopping_threshold and best_score != float("-inf") and score < early_stopping_threshold * best_score:
+                    log.debug("Пропущен результат ниже порога: %.4f < %.4f * %.4f", 
+                             score, early_stopping_threshold, best_score)
+                    continue
+                
+                all_results.append((params, score))
+                
+                if score > best_score:
+                    best_score = score
+                    best_params = params
+                    log.info("Новый лучший результат: %s = %.4f", optimization_metric, score)
+                
+                # Промежуточное сохранение каждые 50 комбинаций (только для параллельного режима)
+                if len(all_results) % 50 == 0:
+                    stage_prefix = f"{stage_info} - " if stage_info else ""
+                    log.info("%sПромежуточный прогресс: протестировано %s из %s комбинаций (%.1f%%)", 
+                            stage_prefix, len(all_results), len(futures), 
+                            len(all_results) / len(futures) * 100 if len(futures) > 0 else 0)
 
         if cache_hits > 0:
             log.info("Кэш попаданий: %s из %s комбинаций", cache_hits, len(param_combinations))
@@ -390,34 +558,214 @@ class HyperparameterOptimizer:
             optimization_metric=optimization_metric,
         )
 
+    def optimize_tpe(
+        self,
+        strategy_factory: Callable[[Dict], Strategy],
+        param_grid: Dict[str, List],
+        instrument: str,
+        period: str = "m15",
+        optimization_metric: str = "sharpe_ratio",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        n_jobs: int = 1,
+        n_trials: int = 50,
+        seed: int = 0,
+    ) -> OptimizationResult:
+        """
+        Поиск параметров по сетке param_grid сэмплером TPE (Optuna) вместо полного перебора.
+
+        Optuna предлагает комбинации пачками по n_jobs, каждая пачка считается через
+        optimize(param_list=...) — с тем же кэшем результатов, пулом процессов и метриками,
+        что и grid search, — и оценки возвращаются в исследование. Значения параметров
+        остаются узлами сетки: равномерные числовые сетки задаются как диапазон с шагом
+        (TPE учитывает порядок значений), остальные — как категории.
+        """
+        if not HAS_OPTUNA:
+            raise ImportError("Optuna не установлена. Установите: pip install optuna")
+
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        sampler = optuna.samplers.TPESampler(multivariate=True, group=True, constant_liar=True, seed=seed)
+        study = optuna.create_study(direction="maximize", sampler=sampler)
+        param_names = list(param_grid.keys())
+        n_jobs = resolve_n_jobs(n_jobs)
+        batch_size = n_jobs
+
+        log.info("Начинаем TPE-оптимизацию: %s испытаний (n_jobs=%s)", n_trials, n_jobs)
+
+        all_results: List[tuple[Dict, float]] = []
+        while len(study.trials) < n_trials:
+            trials = [study.ask() for _ in range(min(batch_size, n_trials - len(study.trials)))]
+            param_list = [
+                {name: _suggest_grid_value(trial, name, param_grid[name]) for name in param_names}
+                for trial in trials
+            ]
+            batch = self.optimize(
+                strategy_factory=strategy_factory,
+                param_grid=param_grid,
+                instrument=instrument,
+                period=period,
+                optimization_metric=optimization_metric,
+                start_date=start_date,
+                end_date=end_date,
+                n_jobs=n_jobs,
+                stage_info=f"TPE {len(study.trials)}/{n_trials}",
+                param_list=param_list,
+            )
+            scores = {tuple(params[name] for name in param_names): score for params, score in batch.all_results}
+            for trial, params in zip(trials, param_list):
+                score = scores.get(tuple(params[name] for name in param_names))
+                if score is None or not math.isfinite(score):
+                    # Ошибка бэктеста: испытание не учитывается моделью TPE
+                    study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                    continue
+                study.tell(trial, score)
+                all_results.append((params, score))
+
+        best_params, best_score = max(all_results, key=lambda item: item[1], default=({}, float("-inf")))
+        log.info("TPE-оптимизация завершена. Лучшие параметры: %s (score=%.4f)", best_params, best_score)
+
+        return OptimizationResult(
+            best_params=best_params,
+            best_score=best_score,
+            all_results=all_results,
+            optimization_metric=optimization_metric,
+        )
+
+    def optimize_halving(
+        self,
+        strategy_factory: Callable[[Dict], Strategy],
+        param_grid: Dict[str, List],
+        instrument: str,
+        period: str = "m15",
+        optimization_metric: str = "sharpe_ratio",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        n_jobs: int = 1,
+        eta: int = 3,
+        param_list: Optional[List[Dict]] = None,
+    ) -> OptimizationResult:
+        """
+        Successive halving: отсев комбинаций на укороченной истории.
+
+        Все комбинации (param_list или полная сетка) проверяются на последних 1/eta**2
+        баров периода, лучшая 1/eta проходит на последние 1/eta баров, а ее лучшая
+        1/eta — на весь период. Этапы короче HALVING_MIN_BARS баров пропускаются
+        (на них runner почти не успевает дать сделок). Каждый этап — обычный
+        optimize(param_list=...), результат — результат полного этапа.
+
+        Если на этапе не осталось ни одной успешной комбинации (все упали с ошибкой),
+        следующие этапы не запускаются: возвращается результат предыдущего этапа,
+        а если его нет — результат этого этапа (без лучших параметров).
+        """
+        bars = self.runner._load_data(instrument, period).index
+        if start_date:
+            bars = bars[bars >= start_date]
+        if end_date:
+            bars = bars[bars <= end_date]
+
+        if param_list is None:
+            param_names = list(param_grid.keys())
+            param_list = [dict(zip(param_names, combo)) for combo in product(*param_grid.values())]
+
+        previous_result: Optional[OptimizationResult] = None
+        for stage, fraction in enumerate((eta ** -2, eta ** -1)):
+            budget_bars = int(len(bars) * fraction)
+            if budget_bars < HALVING_MIN_BARS or len(param_list) <= 1:
+                continue
+            stage_result = self.optimize(
+                strategy_factory=strategy_factory,
+                param_grid=param_grid,
+                instrument=instrument,
+                period=period,
+                optimization_metric=optimization_metric,
+                start_date=bars[-budget_bars].to_pydatetime(),
+                end_date=end_date,
+                n_jobs=n_jobs,
+                stage_info=f"Halving {stage + 1}/3",
+                param_list=param_list,
+            )
+            # Упавшие комбинации (-inf) не проходят дальше
+            ranked = sorted(
+                (item for item in stage_result.all_results if math.isfinite(item[1])),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+            if not ranked:
+                log.warning("Halving %s/3: нет успешных комбинаций, следующие этапы не запускаются", stage + 1)
+                return previous_result if previous_result is not None else stage_result
+            previous_result = stage_result
+            param_list = [params for params, _ in ranked[:max(1, math.ceil(len(ranked) / eta))]]
+            log.info("Halving %s/3: на следующий этап проходят %s из %s комбинаций (последние %s баров)",
+                     stage + 1, len(param_list), len(ranked), budget_bars)
+
+        return self.optimize(
+            strategy_factory=strategy_factory,
+            param_grid=param_grid,
+            instrument=instrument,
+            period=period,
+            optimization_metric=optimization_metric,
+            start_date=start_date,
+            end_date=end_date,
+            n_jobs=n_jobs,
+            stage_info="Halving 3/3",
+            param_list=param_list,
+        )
+
     def save_best_params(self, result: OptimizationResult, output_path: Path) -> None:
-        """Сохраняет лучшие параметры в JSON файл."""
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        data = {
-            "optimization_metric": result.optimization_metric,
-            "best_score": result.best_score,
-            "best_params": result.best_params,
-            "optimized_at": datetime.now().isoformat(),
-        }
-        with output_path.open("w", encoding="utf-8") as fp:
-            json.dump(data, fp, ensure_ascii=False, indent=2)
-        log.info("Лучшие параметры сохранены в %s", output_path)
+        """Сохраняет лучшие параметры в JSON файл (см. save_best_params)."""
+        save_best_params(result, output_path)
 
     def save_all_results(self, result: OptimizationResult, output_path: Path) -> None:
-        """Сохраняет все результаты оптимизации в JSON файл для анализа."""
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        data = {
-            "optimization_metric": result.optimization_metric,
-            "best_score": result.best_score,
-            "best_params": result.best_params,
-            "total_combinations": len(result.all_results),
-            "optimized_at": datetime.now().isoformat(),
-            "all_results": [
-                {"params": params, "score": float(score)} 
-                for params, score in result.all_results
-            ],
-        }
-        with output_path.open("w", encoding="utf-8") as fp:
-            json.dump(data, fp, ensure_ascii=False, indent=2)
-        log.info("Все результаты оптимизации сохранены в %s (%s комбинаций)", output_path, len(result.all_results))
+        """Сохраняет все результаты оптимизации (см. save_all_results)."""
+        save_all_results(result, output_path)
+
 
+def save_best_params(result: OptimizationResult, output_path: Path) -> None:
+    """Сохраняет лучшие параметры в JSON файл."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "optimization_metric": result.optimization_metric,
+        "best_score": result.best_score,
+        "best_params": result.best_params,
+        "optimized_at": datetime.now().isoformat(),
+    }
+    write_json(output_path, data)
+    log.info("Лучшие параметры сохранены в %s", output_path)
+
+
+def save_all_results(result: OptimizationResult, output_path: Path) -> None:
+    """
+    Сохраняет все результаты оптимизации для анализа.
+
+    Кроме JSON (формат, который читают существующие скрипты) пишутся:
+    - таблица results_table_path: по колонке на параметр и колонка score (parquet, snappy);
+    - сводка results_summary_path: всё, кроме массива all_results, — для частого опроса.
+    JSON пишется последним: если он изменился, таблица и сводка уже обновлены.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "optimization_metric": result.optimization_metric,
+        "best_score": result.best_score,
+        "best_params": result.best_params,
+        "total_combinations": len(result.all_results),
+        "optimized_at": datetime.now().isoformat(),
+        "all_results": [
+            {"params": params, "score": float(score)} 
+            for params, score in result.all_results
+        ],
+    }
+    # Неконечные оценки (например, -inf у упавших комбинаций) write_json сохраняет литералами Infinity/NaN
+    _save_results_table(result, results_table_path(output_path))
+    summary = {key: value for key, value in data.items() if key != "all_results"}
+    write_json(results_summary_path(output_path), summary)
+    write_json(output_path, data)
+    log.info("Все результаты оптимизации сохранены в %s (%s комбинаций)", output_path, len(result.all_results))
+
+
+def _save_results_table(result: OptimizationResult, path: Path) -> None:
+    """Пишет all_results таблицей (параметры по колонкам + score) атомарно через временный файл."""
+    table = pd.DataFrame.from_records([params for params, _ in result.all_results])
+    table["score"] = [float(score) for _, score in result.all_results]
+    tmp_path = path.with_name(path.name + ".tmp")
+    table.to_parquet(tmp_path, compression="snappy", index=False)
+    os.replace(tmp_path, path)
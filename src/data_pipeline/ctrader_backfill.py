@@ -1,11 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
+from multiprocessing.util import Finalize
 from pathlib import Path
-from typing import Dict, List
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
-from src.data_pipeline.ctrader_client import CTraderTrendbarFetcher, TREND_BAR_PERIODS
-from src.data_pipeline.curation import TrendbarFrame, to_dataframe
+from src.data_pipeline.ctrader_client import CTraderCredentials, CTraderTrendbarFetcher, TREND_BAR_PERIODS
+from src.data_pipeline.curation import (
+    PERIOD_SECONDS,
+    TrendbarFrame,
+    append_parquet,
+    parquet_time_range,
+    save_jsonl,
+    to_dataframe,
+    validate_continuity,
+)
+
+log = logging.getLogger(__name__)
+
+_PERIOD_DURATIONS: Dict[str, timedelta] = {period: timedelta(seconds=seconds) for period, seconds in PERIOD_SECONDS.items()}
 
 
 def iso_to_datetime(value: str) -> datetime:
@@ -18,21 +35,30 @@ def iso_to_datetime(value: str) -> datetime:
 
 
 def period_duration(period: str) -> timedelta:
-    mapping = {
-        "m1": timedelta(minutes=1),
-        "m5": timedelta(minutes=5),
-        "m15": timedelta(minutes=15),
-        "m30": timedelta(minutes=30),
-        "h1": timedelta(hours=1),
-        "h4": timedelta(hours=4),
-        "d1": timedelta(days=1),
-    }
     try:
-        return mapping[period.lower()]
+        return _PERIOD_DURATIONS[period.lower()]
     except KeyError as exc:
         raise ValueError(f"Unsupported period '{period}'.") from exc
 
 
+def resume_start(curated_path: Path, period: str, requested_start: datetime) -> datetime:
+    """
+    Сдвигает начало загрузки за последний бар, уже сохранённый в curated parquet.
+
+    Сдвиг выполняется только если файл покрывает начало запрошенного диапазона,
+    чтобы не пропустить более ранние незагруженные участки.
+    """
+    if not curated_path.exists():
+        return requested_start
+    time_range = parquet_time_range(curated_path)
+    if time_range is None:
+        return requested_start
+    first_ts, last_ts = time_range
+    if first_ts > requested_start:
+        return requested_start
+    return max(requested_start, (last_ts + period_duration(period)).to_pydatetime())
+
+
 def fetch_range(
     fetcher: CTraderTrendbarFetcher,
     symbol: str,
@@ -46,6 +72,7 @@ def fetch_range(
 
     all_bars: List[Dict[str, object]] = []
     to_time = end
+    step = period_duration(period)
 
     while to_time > start:
         bars = fetcher.get_trendbars(symbol=symbol, period=period, bars=chunk_size, to_time=to_time)
@@ -57,7 +84,7 @@ def fetch_range(
         oldest_dt = iso_to_datetime(oldest)
         if oldest_dt <= start:
             break
-        to_time = oldest_dt - period_duration(period)
+        to_time = oldest_dt - step
         if to_time <= start:
             break
 
@@ -66,8 +93,170 @@ def fetch_range(
     return frame
 
 
+def _split_windows(start: datetime, end: datetime, period: str, chunk_size: int) -> List[Tuple[datetime, datetime]]:
+    """Делит [start, end] на окна по chunk_size баров, от конца к началу."""
+    span = period_duration(period) * chunk_size
+    windows: List[Tuple[datetime, datetime]] = []
+    to_time = end
+    while to_time > start:
+        from_time = max(start, to_time - span)
+        windows.append((from_time, to_time))
+        to_time = from_time
+    return windows
+
+
+def iter_trendbars(
+    fetcher: CTraderTrendbarFetcher,
+    symbol: str,
+    period: str,
+    start: datetime,
+    end: datetime,
+    chunk_size: int,
+    *,
+    max_inflight: int = 5,
+) -> Iterator[Dict[str, float]]:
+    """
+    Потоково отдаёт бары [start, end] по возрастанию времени, без повторов на границах окон.
+
+    Окна запрашиваются от старых к новым, вперёд держится не более max_inflight запросов;
+    бары окна отдаются, как только готово это окно и все предыдущие. В памяти
+    одновременно не более max_inflight окон.
+    """
+    if period.lower() not in TREND_BAR_PERIODS:
+        raise ValueError(f"Unsupported period {period}")
+
+    windows = iter(reversed(_split_windows(start, end, period, chunk_size)))
+    inflight: Deque[Future] = deque()
+    last_time = ""
+    while True:
+        for window in windows:
+            inflight.append(fetcher.fetch_window(symbol, period, *window))
+            if len(inflight) >= max_inflight:
+                break
+        if not inflight:
+            return
+        for bar in sorted(inflight.popleft().result(), key=lambda bar: bar["utc_time"]):
+            if bar["utc_time"] > last_time:
+                last_time = bar["utc_time"]
+                yield bar
+
+
+async def fetch_bars_async(
+    fetcher: CTraderTrendbarFetcher,
+    symbol: str,
+    period: str,
+    start: datetime,
+    end: datetime,
+    chunk_size: int,
+    *,
+    max_inflight: int = 5,
+) -> List[Dict[str, float]]:
+    """
+    Запрашивает окна [start, end] по chunk_size баров параллельно и возвращает бары как есть.
+
+    Окна заранее считаются по длительности бара, поэтому не зависят от ответов друг
+    друга; все запросы идут через одно соединение клиента, одновременно в полёте не
+    более max_inflight. Бары на границах окон могут повторяться.
+    """
+    if period.lower() not in TREND_BAR_PERIODS:
+        raise ValueError(f"Unsupported period {period}")
+
+    semaphore = asyncio.Semaphore(max_inflight)
+
+    async def _one(window: Tuple[datetime, datetime]) -> List[Dict[str, float]]:
+        async with semaphore:
+            return await fetcher.afetch(symbol, period, *window)
+
+    chunks = await asyncio.gather(*(_one(window) for window in _split_windows(start, end, period, chunk_size)))
+    return [bar for chunk in chunks for bar in chunk]
+
+
+async def fetch_range_async(
+    fetcher: CTraderTrendbarFetcher,
+    symbol: str,
+    period: str,
+    start: datetime,
+    end: datetime,
+    chunk_size: int,
+    *,
+    max_inflight: int = 5,
+) -> TrendbarFrame:
+    """
+    Аналог fetch_range, запрашивающий окна диапазона параллельно (см. fetch_bars_async).
+
+    Бары на границах окон дедуплицируются в to_dataframe.
+    """
+    bars = await fetch_bars_async(fetcher, symbol, period, start, end, chunk_size, max_inflight=max_inflight)
+    frame = to_dataframe(symbol, period, bars)
+    frame.frame = frame.frame[frame.frame["utc_time"].between(start, end)]
+    return frame
+
+
 def build_raw_path(root: Path, symbol: str, period: str, start: datetime, end: datetime) -> Path:
     root = root / symbol / period
     filename = f"{symbol}_{period}_{start:%Y%m%d}_{end:%Y%m%d}.jsonl"
     return root / filename
 
+
+# Сессия cTrader текущего рабочего процесса (reactor twisted нельзя перезапустить,
+# поэтому один fetcher живёт всё время жизни процесса)
+_WORKER_FETCHER: Optional[CTraderTrendbarFetcher] = None
+
+
+def init_worker_session(creds_dict: Dict[str, Optional[str]], symbols: Optional[List[str]] = None) -> None:
+    """
+    Инициализатор процессов ProcessPoolExecutor загрузчиков: настраивает лог (при spawn
+    процесс не наследует обработчики), авторизуется в cTrader, регистрирует закрытие
+    сессии и, если переданы symbols, прогревает кеш symbolId для всех планируемых символов.
+    """
+    global _WORKER_FETCHER
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    _WORKER_FETCHER = CTraderTrendbarFetcher(CTraderCredentials(**creds_dict))
+    Finalize(_WORKER_FETCHER, _WORKER_FETCHER.close, exitpriority=10)
+    if symbols:
+        _WORKER_FETCHER.prefetch_symbol_ids(symbols)
+
+
+def worker_fetcher() -> CTraderTrendbarFetcher:
+    """Сессия cTrader текущего процесса, созданная init_worker_session."""
+    if _WORKER_FETCHER is None:
+        raise RuntimeError("Сессия cTrader не создана: процесс должен запускаться с initializer=init_worker_session")
+    return _WORKER_FETCHER
+
+
+def fetch_in_worker(symbol: str, period: str, start: datetime, end: datetime, chunk_size: int) -> TrendbarFrame:
+    """Загружает одну пару (symbol, period) сессией текущего процесса; запись на диск — persist_frame."""
+    log.debug("Загрузка %s %s [%s -> %s]", symbol, period, start, end)
+    return asyncio.run(fetch_range_async(worker_fetcher(), symbol, period, start, end, chunk_size))
+
+
+def persist_frame(frame: TrendbarFrame, start: datetime, end: datetime, raw_dir: Path, curated_dir: Path) -> Dict[str, object]:
+    """
+    Проверяет непрерывность и сохраняет загруженную пару в raw JSONL и curated parquet.
+
+    Каждая пара пишет в собственные файлы, поэтому вызовы для разных пар можно
+    выполнять параллельно без блокировок. Возвращает сводку validate_continuity
+    (rows == 0 — нет данных, ничего не записано).
+    """
+    symbol, period = frame.symbol, frame.period
+    summary = validate_continuity(frame, strict=False)  # Не падаем на выходных разрывах
+
+    if summary.get("gap_violation"):
+        log.warning(
+            "Обнаружено нарушение непрерывности для %s %s (максимальный разрыв %.2f мин)",
+            symbol,
+            period,
+            summary["max_gap_minutes"] or 0.0,
+        )
+
+    if frame.frame.empty:
+        log.warning("Нет данных для %s %s", symbol, period)
+        return summary
+
+    raw_path = build_raw_path(raw_dir, symbol, period, start, end)
+    save_jsonl(frame.frame, raw_path)
+    curated_path = curated_dir / f"{symbol}_{period}.parquet"
+    curated_path.parent.mkdir(parents=True, exist_ok=True)
+    append_parquet(frame, curated_path)
+    log.debug("Сохранены %s и %s", raw_path, curated_path)
+    return summary
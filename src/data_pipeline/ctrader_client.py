@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
 import logging
 import threading
 import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Iterable, List, Optional
@@ -42,6 +45,17 @@ TREND_BAR_PERIODS = {
 }
 
 
+_PERIOD_DURATIONS = {
+    ProtoOATrendbarPeriod.M1: timedelta(minutes=1),
+    ProtoOATrendbarPeriod.M5: timedelta(minutes=5),
+    ProtoOATrendbarPeriod.M15: timedelta(minutes=15),
+    ProtoOATrendbarPeriod.M30: timedelta(minutes=30),
+    ProtoOATrendbarPeriod.H1: timedelta(hours=1),
+    ProtoOATrendbarPeriod.H4: timedelta(hours=4),
+    ProtoOATrendbarPeriod.D1: timedelta(days=1),
+}
+
+
 @dataclass(slots=True)
 class CTraderCredentials:
     client_id: str
@@ -76,6 +90,10 @@ class CTraderTrendbarFetcher:
         self._symbol_info_cache = SymbolInfoCache()
 
         self._pending_trendbars: Optional[Dict[str, object]] = None
+        # clientMsgId запросов, ответы на которые разбираются через Deferred (fetch_window),
+        # а не через единственный слот _pending_trendbars. Доступ только из потока reactor.
+        self._window_msg_ids: set[str] = set()
+        self._window_msg_counter = itertools.count()
 
         self._start_client()
         self._await_events()
@@ -93,36 +111,12 @@ class CTraderTrendbarFetcher:
     ) -> List[Dict[str, float]]:
         if period.lower() not in TREND_BAR_PERIODS:
             raise ValueError(f"Unsupported period '{period}'. Available: {list(TREND_BAR_PERIODS)}")
-        if symbol not in self._symbols_by_name:
-            log.info("Symbol %s not in cache, refreshing symbol list", symbol)
-            self._request_symbols()
-            self._symbols_ready.wait(timeout=10)
-            if symbol not in self._symbols_by_name:
-                raise ValueError(f"Symbol '{symbol}' not found in cTrader account instruments.")
-
-        symbol_id = self._symbols_by_name[symbol]
-        period_enum = TREND_BAR_PERIODS[period.lower()]
 
         to_dt = to_time or datetime.utcnow().replace(tzinfo=timezone.utc)
-        duration_map = {
-            ProtoOATrendbarPeriod.M1: timedelta(minutes=1),
-            ProtoOATrendbarPeriod.M5: timedelta(minutes=5),
-            ProtoOATrendbarPeriod.M15: timedelta(minutes=15),
-            ProtoOATrendbarPeriod.M30: timedelta(minutes=30),
-            ProtoOATrendbarPeriod.H1: timedelta(hours=1),
-            ProtoOATrendbarPeriod.H4: timedelta(hours=4),
-            ProtoOATrendbarPeriod.D1: timedelta(days=1),
-        }
-        delta = duration_map[period_enum] * bars
+        delta = _PERIOD_DURATIONS[TREND_BAR_PERIODS[period.lower()]] * bars
         from_dt = to_dt - delta
 
-        request = ProtoOAGetTrendbarsReq()
-        request.payloadType = ProtoOAGetTrendbarsReq().payloadType
-        request.ctidTraderAccountId = self._account_id
-        request.symbolId = symbol_id
-        request.period = period_enum
-        request.fromTimestamp = int(from_dt.timestamp() * 1000)
-        request.toTimestamp = int(to_dt.timestamp() * 1000)
+        request = self._build_trendbars_request(symbol, period, from_dt, to_dt)
         pending = {"event": threading.Event(), "result": None, "error": None}
         self._pending_trendbars = pending
 
@@ -141,6 +135,67 @@ class CTraderTrendbarFetcher:
 
         return result
 
+    def fetch_window(self, symbol: str, period: str, from_dt: datetime, to_dt: datetime) -> Future:
+        """
+        Запрашивает бары за окно [from_dt, to_dt], не дожидаясь ответа.
+
+        Ответ сопоставляется по clientMsgId, поэтому несколько окон могут быть в полёте
+        одновременно (в отличие от get_trendbars). Возвращает Future со списком баров.
+        """
+        if period.lower() not in TREND_BAR_PERIODS:
+            raise ValueError(f"Unsupported period '{period}'. Available: {list(TREND_BAR_PERIODS)}")
+        request = self._build_trendbars_request(symbol, period, from_dt, to_dt)
+        future: Future = Future()
+
+        def on_response(message) -> None:  # noqa: ANN001
+            if message.payloadType != ProtoOAGetTrendbarsRes().payloadType:
+                future.set_exception(RuntimeError(f"cTrader trendbars error: {Protobuf.extract(message)}"))
+            else:
+                future.set_result(self._parse_trendbars(Protobuf.extract(message).trendbar))
+
+        def on_failure(failure) -> None:  # noqa: ANN001
+            future.set_exception(RuntimeError(f"cTrader trendbars error: {failure.getErrorMessage()}"))
+
+        def send() -> None:
+            msg_id = f"trendbars-{next(self._window_msg_counter)}"
+            self._window_msg_ids.add(msg_id)
+            deferred = self._client.send(request, clientMsgId=msg_id, responseTimeoutInSeconds=20)
+
+            def release(result):  # noqa: ANN001
+                self._window_msg_ids.discard(msg_id)
+                return result
+
+            deferred.addBoth(release)
+            deferred.addCallbacks(on_response, on_failure)
+
+        reactor.callFromThread(send)
+        return future
+
+    async def afetch(self, symbol: str, period: str, from_dt: datetime, to_dt: datetime) -> List[Dict[str, float]]:
+        """Асинхронная обёртка над fetch_window для использования в asyncio."""
+        return await asyncio.wrap_future(self.fetch_window(symbol, period, from_dt, to_dt))
+
+    def prefetch_symbol_ids(self, symbols: Iterable[str]) -> Dict[str, int]:
+        """
+        Прогревает кеш symbolId для планируемых символов.
+
+        Весь список символов счёта приходит одним ProtoOASymbolsListReq, поэтому повторный
+        запрос делается только если каких-то символов ещё нет в кеше.
+        """
+        started = time.perf_counter()
+        wanted = list(dict.fromkeys(symbols))
+        if any(symbol not in self._symbols_by_name for symbol in wanted):
+            self._refresh_symbols()
+        unknown = [symbol for symbol in wanted if symbol not in self._symbols_by_name]
+        if unknown:
+            log.warning("Symbols not found in cTrader account instruments: %s", ", ".join(unknown))
+        log.info(
+            "Symbol ids warmed up for %s symbols in %.2fs",
+            len(wanted) - len(unknown),
+            time.perf_counter() - started,
+        )
+        return {symbol: self._symbols_by_name[symbol] for symbol in wanted if symbol not in unknown}
+
     def close(self) -> None:
         if self._shutdown.is_set():
             return
@@ -224,6 +279,9 @@ class CTraderTrendbarFetcher:
         elif payload_type == ProtoOASymbolsListRes().payloadType:
             self._handle_symbols_list(message)
         elif payload_type == ProtoOAGetTrendbarsRes().payloadType:
+            if message.clientMsgId in self._window_msg_ids:
+                # Ответ на fetch_window разбирается его Deferred
+                return
             self._handle_trendbars(message)
         elif payload_type in (
             ProtoOASubscribeSpotsRes().payloadType,
@@ -273,6 +331,36 @@ class CTraderTrendbarFetcher:
         self._account_ready.set()
         self._request_symbols()
 
+    def _symbol_id(self, symbol: str) -> int:
+        if symbol not in self._symbols_by_name:
+            log.info("Symbol %s not in cache, refreshing symbol list", symbol)
+            self._refresh_symbols()
+            if symbol not in self._symbols_by_name:
+                raise ValueError(f"Symbol '{symbol}' not found in cTrader account instruments.")
+        return self._symbols_by_name[symbol]
+
+    def _build_trendbars_request(
+        self,
+        symbol: str,
+        period: str,
+        from_dt: datetime,
+        to_dt: datetime,
+    ) -> ProtoOAGetTrendbarsReq:
+        request = ProtoOAGetTrendbarsReq()
+        request.payloadType = ProtoOAGetTrendbarsReq().payloadType
+        request.ctidTraderAccountId = self._account_id
+        request.symbolId = self._symbol_id(symbol)
+        request.period = TREND_BAR_PERIODS[period.lower()]
+        request.fromTimestamp = int(from_dt.timestamp() * 1000)
+        request.toTimestamp = int(to_dt.timestamp() * 1000)
+        return request
+
+    def _refresh_symbols(self, timeout: float = 10) -> None:
+        # Сбрасываем событие, иначе wait вернётся сразу по результату прошлой загрузки
+        self._symbols_ready.clear()
+        self._request_symbols()
+        self._symbols_ready.wait(timeout=timeout)
+
     def _request_symbols(self) -> None:
         if not self._account_id:
             return
@@ -293,7 +381,18 @@ class CTraderTrendbarFetcher:
 
     def _handle_trendbars(self, message) -> None:  # noqa: ANN001
         extracted = Protobuf.extract(message)
-        trendbars = extracted.trendbar
+        result = self._parse_trendbars(extracted.trendbar)
+
+        if self._pending_trendbars:
+            pending = self._pending_trendbars
+            pending["result"] = result
+            pending["event"].set()
+            self._pending_trendbars = None
+        else:
+            log.warning("Received trendbars without matching request id.")
+
+    @staticmethod
+    def _parse_trendbars(trendbars) -> List[Dict[str, float]]:  # noqa: ANN001
         result = []
         for bar in trendbars:
             low_price = bar.low / 100000.0
@@ -313,14 +412,7 @@ class CTraderTrendbarFetcher:
                     "utc_time": utc_ts.isoformat(),
                 }
             )
-
-        if self._pending_trendbars:
-            pending = self._pending_trendbars
-            pending["result"] = result
-            pending["event"].set()
-            self._pending_trendbars = None
-        else:
-            log.warning("Received trendbars without matching request id.")
+        return result
 
 
 __all__ = ["CTraderCredentials", "CTraderTrendbarFetcher"]
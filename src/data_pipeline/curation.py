@@ -1,11 +1,50 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Mapping, MutableMapping
+from typing import Dict, Iterable, Mapping, MutableMapping, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.json_io import HAS_ORJSON, dumps_line
+
+# Параметры записи curated parquet (pyarrow): ZSTD со словарями для symbol/period,
+# страницы v2 и статистика row group'ов для чтения диапазона времени из footer
+PARQUET_WRITE_OPTIONS: Dict[str, object] = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "data_page_version": "2.0",
+    "write_statistics": True,
+    "row_group_size": 64_000,
+}
+
+
+# Явные типы колонок баров: без вывода типов по значениям и без object-колонок при записи
+TRENDBAR_DTYPES: Dict[str, str] = {
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "int64",
+}
+TRENDBAR_COLUMNS = ["utc_time", "open", "high", "low", "close", "volume"]
+
+# Длительность бара по периоду, в секундах (разбирается один раз при импорте)
+PERIOD_SECONDS: Dict[str, int] = {
+    "m1": 60,
+    "m5": 300,
+    "m15": 900,
+    "m30": 1800,
+    "h1": 3600,
+    "h4": 14400,
+    "d1": 86400,
+}
 
 
 @dataclass(slots=True)
@@ -16,11 +55,34 @@ class TrendbarFrame:
 
 
 def to_dataframe(symbol: str, period: str, bars: Iterable[Mapping[str, object]]) -> TrendbarFrame:
-    df = pd.DataFrame(bars)
+    records = bars if isinstance(bars, list) else list(bars)
+    # from_records с явными columns создает utc_time даже без такого поля в барах, поэтому
+    # наличие поля проверяется по записям (как раньше по колонкам pd.DataFrame(bars))
+    if records and not any("utc_time" in bar for bar in records):
+        raise ValueError("Bars payload must include 'utc_time' field.")
+    return _to_trendbar_frame(symbol, period, pd.DataFrame.from_records(records, columns=TRENDBAR_COLUMNS))
+
+
+def to_dataframe_from_arrow(symbol: str, period: str, table: pa.Table, *, consume: bool = False) -> TrendbarFrame:
+    """
+    Аналог to_dataframe для уже разобранной Arrow-таблицы (без промежуточных dict).
+
+    Колонки передаются в pandas по одной (split_blocks), без склейки в общий 2D-блок.
+    consume=True освобождает буферы Arrow по ходу конвертации, так что пик памяти не
+    удваивается; использовать table после этого нельзя.
+    """
+    return _to_trendbar_frame(symbol, period, table.to_pandas(split_blocks=True, self_destruct=consume))
+
+
+def _to_trendbar_frame(symbol: str, period: str, df: pd.DataFrame) -> TrendbarFrame:
     if df.empty:
-        df = pd.DataFrame(columns=["utc_time", "open", "high", "low", "close", "volume"])
+        df = pd.DataFrame(columns=TRENDBAR_COLUMNS)
     if "utc_time" not in df.columns:
         raise ValueError("Bars payload must include 'utc_time' field.")
+    if "volume" in df.columns:
+        # Бары без объема (пропуск или null) получают 0: int64 не допускает NaN
+        df["volume"] = df["volume"].fillna(0)
+    df = df.astype({column: dtype for column, dtype in TRENDBAR_DTYPES.items() if column in df.columns})
     df["utc_time"] = pd.to_datetime(df["utc_time"], utc=True)
     df = df.sort_values("utc_time").drop_duplicates(subset="utc_time")
     df["symbol"] = symbol
@@ -50,15 +112,17 @@ def validate_continuity(
     if df.empty:
         return result
 
-    duplicates = df["utc_time"].duplicated().any()
-    result["duplicates"] = bool(duplicates)
+    # Разрывы считаются на int64-секундах одним np.diff, без pandas Timedelta-серий
+    seconds = df["utc_time"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    deltas = np.diff(seconds)
+    duplicates = bool((np.diff(np.sort(seconds)) == 0).any())
+    result["duplicates"] = duplicates
 
-    deltas = df["utc_time"].diff().dropna().dt.total_seconds().div(60)
-    result["max_gap_minutes"] = float(deltas.max()) if not deltas.empty else 0.0
+    result["max_gap_minutes"] = float(deltas.max()) / 60 if deltas.size else 0.0
     if duplicates:
         raise ValueError(f"Duplicate timestamps found for {trendbars.symbol} {trendbars.period}.")
-    gap_limit = max_gap * _period_to_minutes(trendbars.period)
-    if deltas.gt(gap_limit).any():
+    gap_limit = max_gap * period_seconds(trendbars.period)
+    if (deltas > gap_limit).any():
         result["gap_violation"] = True
         if strict:
             raise ValueError(
@@ -68,31 +132,152 @@ def validate_continuity(
     return result
 
 
+# Строк на один блок записи save_jsonl: память ограничена блоком, а не всем файлом
+JSONL_CHUNK_ROWS = 100_000
+
+
 def save_jsonl(df: pd.DataFrame, path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_json(path, orient="records", lines=True, force_ascii=False, date_format="iso")
+    if not HAS_ORJSON:
+        df.to_json(path, orient="records", lines=True, force_ascii=False, date_format="iso")
+        return
+
+    # Колонки извлекаются в списки один раз; строки собираются orjson без pandas-итерации.
+    # Формат времени совпадает с to_json(date_format="iso"): 2024-01-01T00:00:00.000Z
+    columns = [str(column) for column in df.columns]
+    with path.open("wb", buffering=1 << 20) as fp:
+        for start in range(0, len(df), JSONL_CHUNK_ROWS):
+            values = _jsonl_column_values(df.iloc[start : start + JSONL_CHUNK_ROWS])
+            fp.write(b"".join([dumps_line(dict(zip(columns, row))) for row in zip(*values)]))
+
+
+def _jsonl_column_values(df: pd.DataFrame) -> list[list]:
+    """Значения колонок списками для save_jsonl; время — ISO-строки в UTC или None."""
+    values = []
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        if series.dtype.kind == "M":
+            stamps = series.to_numpy()
+            iso = np.char.add(np.datetime_as_string(stamps, unit="ms"), "Z").astype(object)
+            iso[np.isnat(stamps)] = None
+            values.append(iso.tolist())
+        else:
+            values.append(series.tolist())
+    return values
 
 
 def save_parquet(trendbars: TrendbarFrame, path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    trendbars.frame.to_parquet(path, index=False)
+    trendbars.frame.to_parquet(path, index=False, engine="pyarrow", **PARQUET_WRITE_OPTIONS)
 
 
 def append_parquet(trendbars: TrendbarFrame, path: Path) -> None:
+    """
+    Дописывает бары в curated-файл с дедупликацией по utc_time.
+
+    Если все новые бары позже последнего бара файла (диапазон берется из footer),
+    существующие row group'ы переписываются потоково через Arrow, без загрузки
+    истории в pandas, concat и повторной сортировки. Иначе выполняется полное слияние.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
+    frame = trendbars.frame
+    if path.exists() and not frame.empty:
+        time_range = parquet_time_range(path)
+        if time_range is not None and frame["utc_time"].min() > time_range[1]:
+            _append_tail(path, frame.drop_duplicates(subset="utc_time").sort_values("utc_time"))
+            return
     if path.exists():
         existing = pd.read_parquet(path)
         combined = pd.concat([existing, trendbars.frame], ignore_index=True)
         combined = combined.drop_duplicates(subset="utc_time").sort_values("utc_time")
     else:
         combined = trendbars.frame
-    combined.to_parquet(path, index=False)
+    combined.to_parquet(path, index=False, engine="pyarrow", **PARQUET_WRITE_OPTIONS)
+
+
+def _append_tail(path: Path, tail: pd.DataFrame) -> None:
+    """Переписывает файл row group за row group'ом, добавляя tail в конец (замена атомарная)."""
+    options = dict(PARQUET_WRITE_OPTIONS)
+    row_group_size = options.pop("row_group_size")
+    tmp_path = path.with_name(path.name + ".tmp")
+    parquet_file = pq.ParquetFile(path)
+    try:
+        schema = parquet_file.schema_arrow
+        with pq.ParquetWriter(tmp_path, schema, **options) as writer:
+            for index in range(parquet_file.num_row_groups):
+                writer.write_table(parquet_file.read_row_group(index), row_group_size=row_group_size)
+            tail_table = pa.Table.from_pandas(tail, schema=schema, preserve_index=False)
+            writer.write_table(tail_table, row_group_size=row_group_size)
+    finally:
+        parquet_file.close()
+    os.replace(tmp_path, path)
+
+
+def parquet_time_range(path: Path, column: str = "utc_time") -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Возвращает (min, max) временной колонки parquet по статистике row group'ов.
+
+    Читается только footer файла; колонка декодируется лишь если статистика отсутствует.
+    """
+    pf = pq.ParquetFile(path)
+    col_idx = pf.schema_arrow.get_field_index(column)
+    if col_idx < 0 or pf.metadata.num_rows == 0:
+        return None
+
+    mins, maxs = [], []
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(col_idx).statistics
+        if stats is None or not stats.has_min_max:
+            break
+        mins.append(stats.min)
+        maxs.append(stats.max)
+    else:
+        return _as_utc(min(mins)), _as_utc(max(maxs))
+
+    values = pd.to_datetime(pf.read(columns=[column]).column(column).to_pandas(), utc=True)
+    return values.min(), values.max()
+
+
+# {(symbol, period): (min_ts, max_ts, размер файла в байтах)}
+Manifest = Dict[Tuple[str, str], Tuple[pd.Timestamp, pd.Timestamp, int]]
+
+
+def build_manifest(curated_dir: Path) -> Manifest:
+    """
+    Строит манифест curated-каталога за один проход: {(symbol, period): (min_ts, max_ts, bytes)}.
+
+    Для каждого {symbol}_{period}.parquet читается только footer (parquet_time_range).
+    Пустые и нечитаемые файлы в манифест не попадают.
+    """
+    manifest: Manifest = {}
+    if not curated_dir.is_dir():
+        return manifest
+    with os.scandir(curated_dir) as it:
+        for entry in it:
+            if not entry.name.endswith(".parquet") or not entry.is_file(follow_symlinks=False):
+                continue
+            symbol, sep, period = entry.name[: -len(".parquet")].rpartition("_")
+            if not sep:
+                continue
+            try:
+                time_range = parquet_time_range(Path(entry.path))
+            except (OSError, pa.ArrowException):
+                continue
+            if time_range is not None:
+                manifest[(symbol, period)] = (time_range[0], time_range[1], entry.stat(follow_symlinks=False).st_size)
+    return manifest
+
+
+def _as_utc(value: object) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
 
 
-def _period_to_minutes(period: str) -> int:
-    mapping = {"m1": 1, "m5": 5, "m15": 15, "m30": 30, "h1": 60, "h4": 240, "d1": 1440}
+def period_seconds(period: str) -> int:
     try:
-        return mapping[period.lower()]
+        return PERIOD_SECONDS[period.lower()]
     except KeyError as exc:
         raise ValueError(f"Unsupported period '{period}'.") from exc
 
@@ -15,6 +15,12 @@ try:
 except ImportError:
     SCIPY_AVAILABLE = False
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 
 # Глобальные переменные для состояния алгоритма (как в оригинале Patternz)
 _armpit: Optional[float] = None
@@ -146,31 +152,8 @@ def check_nearness(
     )
 
 
-def find_all_tops(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
-    """
-    Находит все пики используя алгоритм скользящего окна.
-    Аналог FindAllTops из оригинального кода (строка 2398).
-    
-    Args:
-        df: DataFrame с данными
-        trade_days: Количество баров, в течение которых пик должен оставаться пиком
-        start_idx: Начальный индекс для поиска
-        end_idx: Конечный индекс для поиска (None = до конца)
-    
-    Returns:
-        Список индексов пиков
-    """
-    if end_idx is None:
-        end_idx = len(df)
-    
-    if end_idx - start_idx < trade_days:
-        return []
-    
-    highs = df["high"].values
-    array_tops: List[int] = []
-    
-    # Инициализация: первый пик - начальный индекс
-    array_tops.append(start_idx)
+def _find_all_tops_loop(highs: np.ndarray, trade_days: int, start_idx: int, end_idx: int) -> np.ndarray:
+    array_tops = [start_idx]
     num = trade_days
     
     for i in range(start_idx + 1, end_idx):
@@ -202,7 +185,7 @@ def find_all_tops(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end
                         array_tops.append(i)
                         break
                     else:
-                        return array_tops
+                        return np.array(array_tops, dtype=np.int64)
                 else:
                     # Удаляем невалидный пик и пробуем снова
                     if len(array_tops) > 1:
@@ -216,34 +199,11 @@ def find_all_tops(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end
                 array_tops[-1] = i
                 break
     
-    return array_tops
+    return np.array(array_tops, dtype=np.int64)
 
 
-def find_all_bottoms(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
-    """
-    Находит все впадины используя алгоритм скользящего окна.
-    Аналог FindAllBottoms из оригинального кода (строка 1894).
-    
-    Args:
-        df: DataFrame с данными
-        trade_days: Количество баров, в течение которых впадина должна оставаться впадиной
-        start_idx: Начальный индекс для поиска
-        end_idx: Конечный индекс для поиска (None = до конца)
-    
-    Returns:
-        Список индексов впадин
-    """
-    if end_idx is None:
-        end_idx = len(df)
-    
-    if end_idx - start_idx < trade_days:
-        return []
-    
-    lows = df["low"].values
-    array_bottoms: List[int] = []
-    
-    # Инициализация: первая впадина - начальный индекс
-    array_bottoms.append(start_idx)
+def _find_all_bottoms_loop(lows: np.ndarray, trade_days: int, start_idx: int, end_idx: int) -> np.ndarray:
+    array_bottoms = [start_idx]
     num = trade_days
     
     for i in range(start_idx + 1, end_idx):
@@ -275,7 +235,7 @@ def find_all_bottoms(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0,
                         array_bottoms.append(i)
                         break
                     else:
-                        return array_bottoms
+                        return np.array(array_bottoms, dtype=np.int64)
                 else:
                     # Удаляем невалидную впадину и пробуем снова
                     if len(array_bottoms) > 1:
@@ -289,7 +249,84 @@ def find_all_bottoms(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0,
                 array_bottoms[-1] = i
                 break
     
-    return array_bottoms
+    return np.array(array_bottoms, dtype=np.int64)
+
+
+if NUMBA_AVAILABLE:
+    # Сигнатуры сканов: (цены float64 C-contiguous, trade_days, start_idx, end_idx) -> позиции
+    # int64; вариант для read-only массивов нужен для to_numpy() при copy-on-write в pandas
+    _SCAN_SIGNATURE = [
+        "i8[:](f8[::1], i8, i8, i8)",
+        "i8[:](Array(float64, 1, 'C', readonly=True), i8, i8, i8)",
+    ]
+
+    # Сканы пиков/впадин проходят по каждому бару окна — компилируем их. Явная
+    # сигнатура компилирует при импорте, а не при первом вызове, и не дает плодить
+    # специализации; cache=True сохраняет результат компиляции между запусками,
+    # так что повторный запуск скрипта загружает готовый машинный код
+    _find_all_tops_impl = njit(_SCAN_SIGNATURE, cache=True)(_find_all_tops_loop)
+    _find_all_bottoms_impl = njit(_SCAN_SIGNATURE, cache=True)(_find_all_bottoms_loop)
+else:
+    _find_all_tops_impl = _find_all_tops_loop
+    _find_all_bottoms_impl = _find_all_bottoms_loop
+
+
+def tops_from_array(highs: np.ndarray, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
+    """find_all_tops по массиву максимумов (без DataFrame)."""
+    if end_idx is None:
+        end_idx = len(highs)
+    
+    if end_idx - start_idx < trade_days:
+        return []
+    
+    highs = np.ascontiguousarray(highs, dtype=np.float64)
+    return _find_all_tops_impl(highs, int(trade_days), int(start_idx), int(end_idx)).tolist()
+
+
+def bottoms_from_array(lows: np.ndarray, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
+    """find_all_bottoms по массиву минимумов (без DataFrame)."""
+    if end_idx is None:
+        end_idx = len(lows)
+    
+    if end_idx - start_idx < trade_days:
+        return []
+    
+    lows = np.ascontiguousarray(lows, dtype=np.float64)
+    return _find_all_bottoms_impl(lows, int(trade_days), int(start_idx), int(end_idx)).tolist()
+
+
+def find_all_tops(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
+    """
+    Находит все пики используя алгоритм скользящего окна.
+    Аналог FindAllTops из оригинального кода (строка 2398).
+    
+    Args:
+        df: DataFrame с данными
+        trade_days: Количество баров, в течение которых пик должен оставаться пиком
+        start_idx: Начальный индекс для поиска
+        end_idx: Конечный индекс для поиска (None = до конца)
+    
+    Returns:
+        Список индексов пиков
+    """
+    return tops_from_array(df["high"].to_numpy(), trade_days, start_idx, end_idx)
+
+
+def find_all_bottoms(df: pd.DataFrame, trade_days: int = 3, start_idx: int = 0, end_idx: Optional[int] = None) -> List[int]:
+    """
+    Находит все впадины используя алгоритм скользящего окна.
+    Аналог FindAllBottoms из оригинального кода (строка 1894).
+    
+    Args:
+        df: DataFrame с данными
+        trade_days: Количество баров, в течение которых впадина должна оставаться впадиной
+        start_idx: Начальный индекс для поиска
+        end_idx: Конечный индекс для поиска (None = до конца)
+    
+    Returns:
+        Список индексов впадин
+    """
+    return bottoms_from_array(df["low"].to_numpy(), trade_days, start_idx, end_idx)
 
 
 def find_top_armpit(
@@ -313,21 +350,27 @@ def find_top_armpit(
     """
     global _armpit
     
-    _armpit = None
-    lows = df["low"].values
+    _armpit = _top_armpit(df["low"].values, index1, index2, bottom_indices)
+    
+    if _armpit is None:
+        return True, None  # Не найдено - возвращаем True (ошибка)
+    
+    return False, _armpit  # Найдено
+
+
+def _top_armpit(lows: np.ndarray, index1: int, index2: int, bottom_indices: List[int]) -> Optional[float]:
+    """Минимальная впадина между index1 и index2 (None, если впадин нет)."""
+    armpit = None
     
     # Ищем максимальную впадину между index1 и index2
     for bottom_idx in bottom_indices:
         if index1 <= bottom_idx <= index2:
-            if _armpit is None:
-                _armpit = float(lows[bottom_idx])
+            if armpit is None:
+                armpit = float(lows[bottom_idx])
             else:
-                _armpit = min(_armpit, float(lows[bottom_idx]))
-    
-    if _armpit is None:
-        return True, None  # Не найдено - возвращаем True (ошибка)
+                armpit = min(armpit, float(lows[bottom_idx]))
     
-    return False, _armpit  # Найдено
+    return armpit
 
 
 def find_bottom_armpit(
@@ -351,21 +394,27 @@ def find_bottom_armpit(
     """
     global _armpit
     
-    _armpit = None
-    highs = df["high"].values
+    _armpit = _bottom_armpit(df["high"].values, index1, index2, top_indices)
+    
+    if _armpit is None:
+        return True, None  # Не найдено - возвращаем True (ошибка)
+    
+    return False, _armpit  # Найдено
+
+
+def _bottom_armpit(highs: np.ndarray, index1: int, index2: int, top_indices: List[int]) -> Optional[float]:
+    """Максимальный пик между index1 и index2 (None, если пиков нет)."""
+    armpit = None
     
     # Ищем минимальный пик между index1 и index2
     for top_idx in top_indices:
         if index1 <= top_idx <= index2:
-            if _armpit is None:
-                _armpit = float(highs[top_idx])
+            if armpit is None:
+                armpit = float(highs[top_idx])
             else:
-                _armpit = max(_armpit, float(highs[top_idx]))
-    
-    if _armpit is None:
-        return True, None  # Не найдено - возвращаем True (ошибка)
+                armpit = max(armpit, float(highs[top_idx]))
     
-    return False, _armpit  # Найдено
+    return armpit
 
 
 def find_hst(
@@ -391,7 +440,18 @@ def find_hst(
     Returns:
         True если паттерн невалиден, False если валиден
     """
-    highs = df["high"].values
+    return _hst_invalid(df["high"].values, ls_index, rs_index, head_index, head_shoulder, strict_patterns)
+
+
+def _hst_invalid(
+    highs: np.ndarray,
+    ls_index: int,
+    rs_index: int,
+    head_index: int,
+    head_shoulder: float,
+    strict_patterns: bool = False,
+) -> bool:
+    """find_hst по массиву максимумов."""
     ls_price = float(highs[ls_index])
     rs_price = float(highs[rs_index])
     head_price = float(highs[head_index])
@@ -448,7 +508,18 @@ def find_hsb(
     Returns:
         True если паттерн невалиден, False если валиден
     """
-    lows = df["low"].values
+    return _hsb_invalid(df["low"].values, ls_index, rs_index, head_index, head_shoulder, strict_patterns)
+
+
+def _hsb_invalid(
+    lows: np.ndarray,
+    ls_index: int,
+    rs_index: int,
+    head_index: int,
+    head_shoulder: float,
+    strict_patterns: bool = False,
+) -> bool:
+    """find_hsb по массиву минимумов."""
     ls_price = float(lows[ls_index])
     rs_price = float(lows[rs_index])
     head_price = float(lows[head_index])
@@ -664,51 +735,32 @@ def detect_head_shoulders_bottom(df: pd.DataFrame, lookback: int = 100, shoulder
     return None
 
 
-def detect_all_head_shoulders_top(
-    df: pd.DataFrame,
-    lookback: int = 100,
+def head_shoulders_top_positions(
+    highs: np.ndarray,
+    lows: np.ndarray,
     strict_patterns: bool = False,
     head_shoulder_pct: float = 0.15,
-) -> List[Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, float]]:
+) -> List[Tuple[int, int, int, float]]:
     """
-    Обнаруживает ВСЕ паттерны Head & Shoulders Top в данных.
-    Реализация по оригинальной логике Patternz (строка 5965).
-    
-    Args:
-        df: DataFrame с данными
-        lookback: Количество последних свечей для анализа
-        strict_patterns: Режим строгих паттернов (использует TradeDays=5 вместо 3)
-        head_shoulder_pct: Процент преимущества головы (0.15 для обычных, 0.25 для строгих)
+    Обнаруживает все паттерны Head & Shoulders Top по массивам максимумов и минимумов.
     
     Returns:
-        List[Tuple] - список всех найденных паттернов:
-        (индекс левого плеча, индекс головы, индекс правого плеча, цена neckline)
+        List[Tuple] - (позиция левого плеча, позиция головы, позиция правого плеча, цена neckline)
     """
-    global _head_index, _armpit
-    
     patterns = []
     
-    if len(df) < lookback:
-        return patterns
-    
-    recent = df.tail(lookback).copy()
-    original_index = recent.index.copy()
-    recent = recent.reset_index(drop=True)
-    
     # Находим пики и впадины используя оригинальный алгоритм
     trade_days = 5 if strict_patterns else 3
-    top_indices = find_all_tops(recent, trade_days=trade_days)
-    bottom_indices = find_all_bottoms(recent, trade_days=2)
+    top_indices = tops_from_array(highs, trade_days=trade_days)
+    bottom_indices = bottoms_from_array(lows, trade_days=2)
     
     if len(top_indices) < 3 or len(bottom_indices) < 2:
         return patterns
     
-    highs = recent["high"].values
-    
     # Основной цикл поиска паттернов (как в оригинале, строка 5984)
     for i in range(1, len(top_indices)):
-        _head_index = top_indices[i]
-        head_price = float(highs[_head_index])
+        head_index = top_indices[i]
+        head_price = float(highs[head_index])
         
         # Ищем левое плечо (j идет назад от головы)
         for j in range(i - 1, -1, -1):
@@ -739,7 +791,7 @@ def detect_all_head_shoulders_top(
                     continue
                 
                 # Проверяем FindHST (симметрия плеч и преимущество головы)
-                if find_hst(recent, ls_idx, rs_idx, _head_index, head_shoulder_pct, strict_patterns):
+                if _hst_invalid(highs, ls_idx, rs_idx, head_index, head_shoulder_pct, strict_patterns):
                     continue
                 
                 # Максимальное расстояние между плечами: 126 баров
@@ -747,38 +799,32 @@ def detect_all_head_shoulders_top(
                     break
                 
                 # Находим neckline между левым плечом и головой
-                error, arm_pit_left = find_top_armpit(recent, ls_idx, _head_index, bottom_indices)
-                if error:
+                arm_pit_left = _top_armpit(lows, ls_idx, head_index, bottom_indices)
+                if arm_pit_left is None:
                     continue
                 
                 # Находим neckline между головой и правым плечом
-                error, arm_pit_right = find_top_armpit(recent, _head_index, rs_idx, bottom_indices)
-                if error:
+                arm_pit_right = _top_armpit(lows, head_index, rs_idx, bottom_indices)
+                if arm_pit_right is None:
                     continue
                 
                 # Берем минимальную впадину (neckline)
                 neckline = min(arm_pit_left, arm_pit_right)
                 
-                # Добавляем паттерн с оригинальными индексами
-                patterns.append((
-                    original_index[ls_idx],
-                    original_index[_head_index],
-                    original_index[rs_idx],
-                    neckline
-                ))
+                patterns.append((ls_idx, head_index, rs_idx, neckline))
     
     return patterns
 
 
-def detect_all_head_shoulders_bottom(
+def detect_all_head_shoulders_top(
     df: pd.DataFrame,
     lookback: int = 100,
     strict_patterns: bool = False,
     head_shoulder_pct: float = 0.15,
 ) -> List[Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, float]]:
     """
-    Обнаруживает ВСЕ паттерны Head & Shoulders Bottom в данных.
-    Реализация по оригинальной логике Patternz (строка 5841).
+    Обнаруживает ВСЕ паттерны Head & Shoulders Top в данных.
+    Реализация по оригинальной логике Patternz (строка 5965).
     
     Args:
         df: DataFrame с данными
@@ -790,31 +836,48 @@ def detect_all_head_shoulders_bottom(
         List[Tuple] - список всех найденных паттернов:
         (индекс левого плеча, индекс головы, индекс правого плеча, цена neckline)
     """
-    global _head_index, _armpit
+    if len(df) < lookback:
+        return []
     
-    patterns = []
+    recent = df.tail(lookback)
+    original_index = recent.index
+    positions = head_shoulders_top_positions(
+        recent["high"].to_numpy(), recent["low"].to_numpy(), strict_patterns, head_shoulder_pct
+    )
     
-    if len(df) < lookback:
-        return patterns
+    # Позиции внутри окна переводятся в оригинальные индексы
+    return [
+        (original_index[ls_idx], original_index[head_idx], original_index[rs_idx], neckline)
+        for ls_idx, head_idx, rs_idx, neckline in positions
+    ]
+
+
+def head_shoulders_bottom_positions(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    strict_patterns: bool = False,
+    head_shoulder_pct: float = 0.15,
+) -> List[Tuple[int, int, int, float]]:
+    """
+    Обнаруживает все паттерны Head & Shoulders Bottom по массивам максимумов и минимумов.
     
-    recent = df.tail(lookback).copy()
-    original_index = recent.index.copy()
-    recent = recent.reset_index(drop=True)
+    Returns:
+        List[Tuple] - (позиция левого плеча, позиция головы, позиция правого плеча, цена neckline)
+    """
+    patterns = []
     
     # Находим впадины и пики используя оригинальный алгоритм
     trade_days = 5 if strict_patterns else 3
-    bottom_indices = find_all_bottoms(recent, trade_days=trade_days)
-    top_indices = find_all_tops(recent, trade_days=2)
+    bottom_indices = bottoms_from_array(lows, trade_days=trade_days)
+    top_indices = tops_from_array(highs, trade_days=2)
     
     if len(bottom_indices) < 3 or len(top_indices) < 2:
         return patterns
     
-    lows = recent["low"].values
-    
     # Основной цикл поиска паттернов (как в оригинале, строка 5860)
     for i in range(1, len(bottom_indices)):
-        _head_index = bottom_indices[i]
-        head_price = float(lows[_head_index])
+        head_index = bottom_indices[i]
+        head_price = float(lows[head_index])
         
         # Ищем левое плечо (j идет назад от головы)
         for j in range(i - 1, -1, -1):
@@ -845,7 +908,7 @@ def detect_all_head_shoulders_bottom(
                     continue
                 
                 # Проверяем FindHSB (симметрия плеч и преимущество головы)
-                if find_hsb(recent, ls_idx, rs_idx, _head_index, head_shoulder_pct, strict_patterns):
+                if _hsb_invalid(lows, ls_idx, rs_idx, head_index, head_shoulder_pct, strict_patterns):
                     continue
                 
                 # Максимальное расстояние между плечами: 126 баров
@@ -853,29 +916,59 @@ def detect_all_head_shoulders_bottom(
                     break
                 
                 # Находим neckline между левым плечом и головой
-                error, arm_pit_left = find_bottom_armpit(recent, ls_idx, _head_index, top_indices)
-                if error:
+                arm_pit_left = _bottom_armpit(highs, ls_idx, head_index, top_indices)
+                if arm_pit_left is None:
                     continue
                 
                 # Находим neckline между головой и правым плечом
-                error, arm_pit_right = find_bottom_armpit(recent, _head_index, rs_idx, top_indices)
-                if error:
+                arm_pit_right = _bottom_armpit(highs, head_index, rs_idx, top_indices)
+                if arm_pit_right is None:
                     continue
                 
                 # Берем максимальный пик (neckline)
                 neckline = max(arm_pit_left, arm_pit_right)
                 
-                # Добавляем паттерн с оригинальными индексами
-                patterns.append((
-                    original_index[ls_idx],
-                    original_index[_head_index],
-                    original_index[rs_idx],
-                    neckline
-                ))
+                patterns.append((ls_idx, head_index, rs_idx, neckline))
     
     return patterns
 
 
+def detect_all_head_shoulders_bottom(
+    df: pd.DataFrame,
+    lookback: int = 100,
+    strict_patterns: bool = False,
+    head_shoulder_pct: float = 0.15,
+) -> List[Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, float]]:
+    """
+    Обнаруживает ВСЕ паттерны Head & Shoulders Bottom в данных.
+    Реализация по оригинальной логике Patternz (строка 5841).
+    
+    Args:
+        df: DataFrame с данными
+        lookback: Количество последних свечей для анализа
+        strict_patterns: Режим строгих паттернов (использует TradeDays=5 вместо 3)
+        head_shoulder_pct: Процент преимущества головы (0.15 для обычных, 0.25 для строгих)
+    
+    Returns:
+        List[Tuple] - список всех найденных паттернов:
+        (индекс левого плеча, индекс головы, индекс правого плеча, цена neckline)
+    """
+    if len(df) < lookback:
+        return []
+    
+    recent = df.tail(lookback)
+    original_index = recent.index
+    positions = head_shoulders_bottom_positions(
+        recent["high"].to_numpy(), recent["low"].to_numpy(), strict_patterns, head_shoulder_pct
+    )
+    
+    # Позиции внутри окна переводятся в оригинальные индексы
+    return [
+        (original_index[ls_idx], original_index[head_idx], original_index[rs_idx], neckline)
+        for ls_idx, head_idx, rs_idx, neckline in positions
+    ]
+
+
 def detect_double_top(df: pd.DataFrame, lookback: int = 50, tolerance: float = 0.02) -> Optional[Tuple[int, int]]:
     """
     Обнаруживает паттерн Double Top (двойная вершина).
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Dict
 
@@ -8,6 +10,12 @@ import pandas as pd
 
 from .schemas import FeatureConfig, FeatureSet
 
+# Кэш индикаторов по содержимому окна: перебор параметров стратегии в оптимизации
+# прогоняет одни и те же окна баров с той же FeatureConfig, и индикаторы каждого
+# окна считаются один раз на процесс
+FEATURE_CACHE_SIZE = 8192
+_feature_cache: OrderedDict[tuple, FeatureSet] = OrderedDict()
+
 
 @dataclass(slots=True)
 class FeatureCalculator:
@@ -160,7 +168,30 @@ class FeatureCalculator:
         return FeatureSet(values=values)
 
 
+def _feature_cache_key(df: pd.DataFrame, config: FeatureConfig) -> tuple:
+    """Ключ кэша: параметры config и хэш колонок high/low/close (только они участвуют в расчете)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for column in ("high", "low", "close"):
+        digest.update(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64)).tobytes())
+    params = tuple(sorted(config.additional_params.items()))
+    return (config.window_short, config.window_long, params, len(df), digest.digest())
+
+
 def compute_features(df: pd.DataFrame, config: FeatureConfig) -> FeatureSet:
-    calculator = FeatureCalculator(config)
-    return calculator.compute(df)
+    """
+    Индикаторы по df (см. FeatureCalculator.compute) с LRU-кэшем на FEATURE_CACHE_SIZE окон.
+
+    Возвращаемый FeatureSet может быть общим для нескольких вызовов и не должен изменяться.
+    """
+    key = _feature_cache_key(df, config)
+    cached = _feature_cache.get(key)
+    if cached is not None:
+        _feature_cache.move_to_end(key)
+        return cached
+
+    features = FeatureCalculator(config).compute(df)
+    _feature_cache[key] = features
+    if len(_feature_cache) > FEATURE_CACHE_SIZE:
+        _feature_cache.popitem(last=False)
+    return features
 
@@ -2,20 +2,42 @@
 Набор прототипов форекс-стратегий.
 """
 
+from importlib import import_module
+
 from .base import Signal, Strategy
-from .momentum_breakout import MomentumBreakoutStrategy
-from .mean_reversion import MeanReversionStrategy
-from .carry_momentum import CarryMomentumStrategy
-from .intraday_liquidity_breakout import IntradayLiquidityBreakoutStrategy
-from .volatility_compression import VolatilityCompressionBreakoutStrategy
-from .pairs_trading import PairsTradingStrategy
-from .news_momentum import NewsMomentumStrategy
-from .combined_momentum import CombinedMomentumStrategy
-from .macd_trend import MACDTrendStrategy
-from .bollinger_reversion import BollingerReversionStrategy
-from .pattern_reversal import PatternReversalStrategy
-from .pattern_breakout import PatternBreakoutStrategy
-from .pattern_head_shoulders import PatternHeadShouldersStrategy
+
+# Модули стратегий импортируются при первом обращении к классу (PEP 562): часть из них
+# тянет тяжелые зависимости (scipy.signal через src.patterns), а скрипту оптимизации
+# и воркерам нужна одна стратегия
+_STRATEGY_MODULES = {
+    "MomentumBreakoutStrategy": ".momentum_breakout",
+    "MeanReversionStrategy": ".mean_reversion",
+    "CarryMomentumStrategy": ".carry_momentum",
+    "IntradayLiquidityBreakoutStrategy": ".intraday_liquidity_breakout",
+    "VolatilityCompressionBreakoutStrategy": ".volatility_compression",
+    "PairsTradingStrategy": ".pairs_trading",
+    "NewsMomentumStrategy": ".news_momentum",
+    "CombinedMomentumStrategy": ".combined_momentum",
+    "MACDTrendStrategy": ".macd_trend",
+    "BollingerReversionStrategy": ".bollinger_reversion",
+    "PatternReversalStrategy": ".pattern_reversal",
+    "PatternBreakoutStrategy": ".pattern_breakout",
+    "PatternHeadShouldersStrategy": ".pattern_head_shoulders",
+}
+
+
+def __getattr__(name: str):
+    module_name = _STRATEGY_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    strategy_class = getattr(import_module(module_name, __name__), name)
+    globals()[name] = strategy_class
+    return strategy_class
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_STRATEGY_MODULES))
+
 
 __all__ = [
     "Signal",
@@ -5,6 +5,10 @@ import sys
 import os
 import io
 
+# Настройка выполняется один раз на процесс: повторные вызовы из других скриптов/модулей
+# не пересоздают TextIOWrapper и не запускают chcp снова
+_CONFIGURED = False
+
 
 def setup_utf8_encoding() -> None:
     """
@@ -15,7 +19,13 @@ def setup_utf8_encoding() -> None:
     2. io.TextIOWrapper как fallback
     3. Установка переменной окружения PYTHONIOENCODING
     4. Установка кодировки консоли через chcp 65001
+
+    Повторные вызовы в том же процессе ничего не делают.
     """
+    global _CONFIGURED
+    if _CONFIGURED:
+        return
+    _CONFIGURED = True
     if sys.platform == "win32":
         # Метод 1: Используем reconfigure() если доступно (Python 3.7+)
         if hasattr(sys.stdout, "reconfigure"):
@@ -0,0 +1,87 @@
+"""Быстрые чтение и запись JSON: orjson, если установлен, иначе стандартный json."""
+from __future__ import annotations
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Разбирает JSON из bytes/str (orjson принимает bytes без декодирования).
+
+    orjson не принимает NaN/Infinity, которые пишет json.dump по умолчанию
+    (например, score = -inf у упавших комбинаций), — такие документы разбирает стандартный json.
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def read_json(path: Path) -> Any:
+    """Читает и разбирает JSON-файл целиком."""
+    return loads(path.read_bytes())
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """Есть ли в объекте NaN/Infinity (float, скаляры и массивы NumPy внутри dict/list/tuple)."""
+    if isinstance(obj, (float, np.floating)):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(value) for value in obj)
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in "fc":
+        return not np.isfinite(obj).all()
+    return False
+
+
+def _numpy_default(obj: Any) -> Any:
+    """Преобразование скаляров и массивов NumPy для стандартного json (как OPT_SERIALIZE_NUMPY у orjson)."""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Сериализует в UTF-8 JSON с отступом 2 (как json.dump(indent=2, ensure_ascii=False)).
+
+    NaN/Infinity всегда записываются литералами, как у json.dump (их читает loads):
+    orjson заменил бы их на null, поэтому документы с неконечными числами пишет
+    стандартный json. Результат не зависит от того, установлен ли orjson.
+    """
+    if HAS_ORJSON and not _has_non_finite(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_numpy_default).encode("utf-8")
+
+
+def write_json(path: Path, obj: Any) -> None:
+    """
+    Записывает JSON-файл атомарно: во временный файл рядом, затем os.replace.
+
+    Читатель видит либо прежнее, либо полностью записанное содержимое, даже если процесс прерван.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(dumps(obj))
+    os.replace(tmp_path, path)
+
+
+def dumps_line(obj: Any) -> bytes:
+    """Сериализует одну запись JSONL (компактно, с завершающим переводом строки)."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
@@ -0,0 +1,28 @@
+"""Регрессионные тесты потокового разбора all_results в extract_and_analyze_results."""
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("ijson")
+
+from scripts import extract_and_analyze_results as extract
+
+
+def test_streaming_falls_back_on_infinity_scores(tmp_path, monkeypatch):
+    # Оптимизатор пишет -Infinity для упавших комбинаций: ijson такой файл не разбирает,
+    # и summarize_results_file должен перейти к чтению файла целиком
+    path = tmp_path / "carry_momentum_EURUSD_m15_all_results.json"
+    path.write_text(
+        '{"best_score": 1.5, "best_params": {"atr_multiplier": 2.0}, "total_combinations": 2, '
+        '"all_results": [{"params": {"atr_multiplier": 2.0}, "score": 1.5}, '
+        '{"params": {"atr_multiplier": 2.5}, "score": -Infinity}]}',
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(extract, "STREAMING_MIN_SIZE", 0)
+    stat = path.stat()
+
+    header, best_from_all, count = extract.summarize_results_file(path, stat.st_size)
+
+    assert header["best_score"] == 1.5
+    assert best_from_all == ({"atr_multiplier": 2.0}, 1.5)
+    assert count == 2
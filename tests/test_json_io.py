@@ -0,0 +1,28 @@
+"""Тесты src.utils.json_io: запись не зависит от того, установлен ли orjson."""
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from src.utils import json_io
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        {"best_score": float("-inf"), "best_params": {"atr_multiplier": 2.0}},
+        {"t_statistic": float("nan"), "scores": [1.5, 2]},
+        {"best_score": 1.5, "instrument": "EURUSD_m15"},
+    ],
+)
+def test_dumps_same_output_without_orjson(obj, monkeypatch):
+    with_orjson = json_io.dumps(obj)
+    monkeypatch.setattr(json_io, "HAS_ORJSON", False)
+    assert json_io.dumps(obj) == with_orjson
+
+
+def test_non_finite_scores_round_trip():
+    data = json_io.loads(json_io.dumps({"best_score": float("-inf"), "p_value": float("nan")}))
+    assert data["best_score"] == float("-inf")
+    assert math.isnan(data["p_value"])